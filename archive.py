@@ -0,0 +1,133 @@
+"""Move old checked-out stays and valet tickets into archive tables in short, resumable batches."""
+import argparse
+import configparser
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from statements import COUNT, declare
+from storage import SqliteBackend, backend_from_config
+
+DEFAULT_RETENTION_DAYS = 365
+DEFAULT_BATCH_SIZE = 500
+
+# predicate takes one parameter, the cutoff; rows matching it are moved.
+ArchivePlan = namedtuple('ArchivePlan', 'name table archive key columns predicate')
+
+PLANS = {
+    'reservations': ArchivePlan(
+        'reservations', 'Reservations', 'ReservationsArchive', 'ReservationID',
+        ('ReservationID', 'RoomNumber', 'Floor', 'LastName', 'FirstName', 'CheckInDate', 'CheckOutDate',
+         'Status', 'CreatedAt'),
+        "Status = 'CheckedOut' AND CheckOutDate < ?"),
+    'valet': ArchivePlan(
+        'valet', 'ValetVehicles', 'ValetVehiclesArchive', 'ValetID',
+        ('ValetID', 'LicensePlate', 'OwnerName', 'ParkingSpot', 'Status', 'CheckInTime', 'CheckOutTime',
+         'CreatedAt'),
+        "Status = 'Checked-Out' AND CheckOutTime < ?"),
+}
+
+
+def _declare(plan):
+    """(next_batch, copy, remove) statements for a plan; the key window is (after_key, last_key]."""
+    columns = ', '.join(plan.columns)
+    window = f"{plan.predicate} AND {plan.key} > ? AND {plan.key} <= ?"
+    return (
+        declare(f'archive.{plan.name}.next_batch',
+                f"SELECT {plan.key} FROM {plan.table} WHERE {plan.predicate} AND {plan.key} > ? ORDER BY {plan.key}",
+                ('cutoff', 'after_key'), limit=DEFAULT_BATCH_SIZE),
+        declare(f'archive.{plan.name}.copy',
+                f"INSERT INTO {plan.archive} ({columns}) SELECT {columns} FROM {plan.table} t WHERE {window} "
+                f"AND NOT EXISTS (SELECT 1 FROM {plan.archive} a WHERE a.{plan.key} = t.{plan.key})",
+                ('cutoff', 'after_key', 'last_key'), COUNT),
+        declare(f'archive.{plan.name}.remove',
+                f"DELETE FROM {plan.table} WHERE {window} "
+                f"AND EXISTS (SELECT 1 FROM {plan.archive} a WHERE a.{plan.key} = {plan.table}.{plan.key})",
+                ('cutoff', 'after_key', 'last_key'), COUNT),
+    )
+
+
+STATEMENTS = {name: _declare(plan) for name, plan in PLANS.items()}
+
+
+def cutoffs(retention_days, today=None):
+    """Per-plan cutoff: stays that checked out, and tickets closed, before retention_days ago."""
+    today = today or date.today()
+    boundary = today - timedelta(days=retention_days)
+    return {'reservations': boundary, 'valet': datetime.combine(boundary, datetime.min.time())}
+
+
+def archive_rows(backend, plan, cutoff, batch_size=DEFAULT_BATCH_SIZE, pause=0.0, max_batches=None):
+    """Copy then delete rows matching plan.predicate, batch_size keys per transaction. Returns a summary dict.
+
+    Each batch commits on its own, so locks are held only for one batch and an interrupted run
+    loses nothing: the next run starts over from the lowest remaining key. Rows already in the
+    archive are not copied twice, and only rows present in the archive are deleted.
+    """
+    next_batch, copy, remove = STATEMENTS[plan.name]
+    started = time.perf_counter()
+    moved = batches = last_key = 0
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        while max_batches is None or batches < max_batches:
+            keys = next_batch.execute(cursor, backend, cutoff, last_key, limit=batch_size).fetchall()
+            if not keys:
+                break
+            upper = keys[-1][0]
+            try:
+                backend.begin(cursor)
+                copy.execute(cursor, backend, cutoff, last_key, upper)
+                moved += max(remove.execute(cursor, backend, cutoff, last_key, upper).rowcount, 0)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            batches += 1
+            last_key = upper
+            logging.debug(f"Archived {plan.table} up to {plan.key} {upper} ({moved} rows so far).")
+            if pause:
+                time.sleep(pause)  # let waiting writers in between batches
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    logging.info(f"Archived {moved} {plan.table} rows in {batches} batch(es) in {elapsed:.2f}s.")
+    return {'table': plan.table, 'moved': moved, 'batches': batches, 'seconds': round(elapsed, 3)}
+
+
+def archive_all(backend, retention_days=DEFAULT_RETENTION_DAYS, batch_size=DEFAULT_BATCH_SIZE, pause=0.0,
+                max_batches=None, only=None):
+    """Run every plan (or those named in only) and return their summaries."""
+    limits = cutoffs(retention_days)
+    return [archive_rows(backend, plan, limits[name], batch_size, pause, max_batches)
+            for name, plan in PLANS.items() if not only or name in only]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old checked-out reservations and valet tickets to the archive tables.")
+    parser.add_argument('--retention-days', type=int, help="keep this many days of history in the active tables")
+    parser.add_argument('--batch-size', type=int, help="rows moved per transaction")
+    parser.add_argument('--pause', type=float, help="seconds to wait between batches")
+    parser.add_argument('--max-batches', type=int, help="stop after this many batches per table; run again to resume")
+    parser.add_argument('--only', choices=list(PLANS), nargs='*', help="archive only these tables")
+    parser.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+    retention_days = args.retention_days
+    if retention_days is None:
+        retention_days = config.getint('archive', 'retention_days', fallback=DEFAULT_RETENTION_DAYS)
+    batch_size = args.batch_size or config.getint('archive', 'batch_size', fallback=DEFAULT_BATCH_SIZE)
+    pause = args.pause if args.pause is not None else config.getfloat('archive', 'pause', fallback=0.0)
+    archive_all(backend, retention_days, batch_size, pause, args.max_batches, args.only)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
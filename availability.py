@@ -0,0 +1,137 @@
+"""Date-range room availability backed by per-room stay lists and per-night occupancy bitmaps."""
+import threading
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def room_numbers(floors, rooms_per_floor):
+    """Room numbers in the 'floor + 3-digit code' format used by the front desk."""
+    return [f"{floor}{room:03d}" for floor in range(1, floors + 1) for room in range(1, rooms_per_floor + 1)]
+
+
+class AvailabilityIndex:
+    """In-memory index of booked nights answering "is room X free" and "which rooms are free".
+
+    Every room gets a bit position. Each night maps to an int whose set bits are the rooms
+    occupied that night, so the free rooms for a range are one OR per night. Per-room sorted
+    stay lists answer single-room checks with a bisect. Stays are half-open: [check_in, check_out).
+    Reservations without dates block their room indefinitely, as the old one-booking-per-room rule did.
+    """
+
+    def __init__(self, rooms=()):
+        self._lock = threading.RLock()
+        self._rooms = []          # bit position -> room number
+        self._room_bits = {}      # room number -> bit position
+        self._stays = {}          # room number -> sorted [(check_in, check_out, reservation_id)]
+        self._undated = {}        # room number -> {reservation_id}
+        self._reservations = {}   # reservation_id -> (room, check_in, check_out)
+        self._nights = {}         # date ordinal -> bitmask of occupied rooms
+        self._blocked = 0         # bitmask of rooms held by undated reservations
+        for room in rooms:
+            self.add_room(room)
+
+    def add_room(self, room):
+        with self._lock:
+            if room not in self._room_bits:
+                self._room_bits[room] = len(self._rooms)
+                self._rooms.append(room)
+                self._stays[room] = []
+            return self._room_bits[room]
+
+    def load(self, rows):
+        """Bulk-load (ReservationID, RoomNumber, CheckInDate, CheckOutDate) rows."""
+        with self._lock:
+            for reservation_id, room, check_in, check_out in rows:
+                self.add(reservation_id, room, check_in, check_out)
+
+    def add(self, reservation_id, room, check_in, check_out):
+        with self._lock:
+            if reservation_id in self._reservations:
+                self.remove(reservation_id)
+            check_in, check_out = _day(check_in), _day(check_out)
+            bit = 1 << self.add_room(room)
+            self._reservations[reservation_id] = (room, check_in, check_out)
+            if check_in is None or check_out is None:
+                self._undated.setdefault(room, set()).add(reservation_id)
+                self._blocked |= bit
+                return
+            insort(self._stays[room], (check_in, check_out, reservation_id))
+            for night in range(check_in.toordinal(), check_out.toordinal()):
+                self._nights[night] = self._nights.get(night, 0) | bit
+
+    def remove(self, reservation_id):
+        with self._lock:
+            entry = self._reservations.pop(reservation_id, None)
+            if entry is None:
+                return
+            room, check_in, check_out = entry
+            bit = 1 << self._room_bits[room]
+            if check_in is None or check_out is None:
+                undated = self._undated[room]
+                undated.discard(reservation_id)
+                if not undated:
+                    self._blocked &= ~bit
+                return
+            stays = self._stays[room]
+            stays.remove((check_in, check_out, reservation_id))
+            for night in range(check_in.toordinal(), check_out.toordinal()):
+                # Legacy data may hold overlapping stays; keep the bit if another one covers this night.
+                if not self._covered(stays, night):
+                    mask = self._nights.get(night, 0) & ~bit
+                    if mask:
+                        self._nights[night] = mask
+                    else:
+                        self._nights.pop(night, None)
+
+    @staticmethod
+    def _covered(stays, night):
+        day = date.fromordinal(night)
+        return any(start <= day < end for start, end, _ in stays[:bisect_left(stays, (day + timedelta(days=1),))])
+
+    def update(self, reservation_id, room, check_in, check_out):
+        self.add(reservation_id, room, check_in, check_out)
+
+    def is_free(self, room, check_in, check_out, ignore=None):
+        """True when no stay other than `ignore` overlaps [check_in, check_out) in this room."""
+        check_in, check_out = _day(check_in), _day(check_out)
+        with self._lock:
+            if self._undated.get(room, set()) - {ignore}:
+                return False
+            stays = self._stays.get(room, [])
+            # Only stays starting before check_out can overlap; walk back from there.
+            for start, end, reservation_id in reversed(stays[:bisect_left(stays, (check_out,))]):
+                if end > check_in and reservation_id != ignore:
+                    return False
+            return True
+
+    def free_rooms(self, check_in, check_out):
+        """Room numbers with no stay overlapping [check_in, check_out), in room order."""
+        check_in, check_out = _day(check_in), _day(check_out)
+        with self._lock:
+            occupied = self._blocked
+            nights = self._nights
+            for night in range(check_in.toordinal(), check_out.toordinal()):
+                occupied |= nights.get(night, 0)
+            return [room for position, room in enumerate(self._rooms) if not occupied >> position & 1]
+
+    def occupancy(self, night):
+        """Number of rooms occupied on a given night."""
+        with self._lock:
+            return bin(self._nights.get(_day(night).toordinal(), 0) | self._blocked).count('1')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rooms': len(self._rooms),
+                'reservations': len(self._reservations),
+                'nights_indexed': len(self._nights),
+                'undated_reservations': sum(len(ids) for ids in self._undated.values()),
+            }
@@ -0,0 +1,363 @@
+"""Benchmark the hotel workloads: p50/p95/p99 latency and DB round trips per operation."""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import billing
+import datagen
+import pricing
+from migrations import prepare_database
+from orders import OrderCart
+from storage import SqliteBackend
+
+
+class CountingBackend:
+    """Wraps a storage backend and counts statements sent and rows fetched."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.round_trips = 0
+        self.rows = 0
+
+    def connect(self):
+        return _CountingConnection(self, self.backend.connect())
+
+    def bootstrap_schema(self, *args, **kwargs):
+        return self.backend.bootstrap_schema(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+class _CountingConnection:
+    def __init__(self, counter, raw):
+        self._counter = counter
+        self._raw = raw
+
+    def cursor(self):
+        return _CountingCursor(self._counter, self._raw.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class _CountingCursor:
+    def __init__(self, counter, raw):
+        self._counter = counter
+        self._raw = raw
+
+    def execute(self, *args):
+        self._counter.round_trips += 1
+        self._raw.execute(*args)
+        return self
+
+    def executemany(self, *args):
+        self._counter.round_trips += 1
+        self._raw.executemany(*args)
+        return self
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None:
+            self._counter.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._raw.fetchmany(*args)
+        self._counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._counter.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._raw:
+            self._counter.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class _ErrorCounter(logging.Handler):
+    """Captures errors that the application logs instead of raising."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+        self.first = None
+
+    def emit(self, record):
+        self.count += 1
+        if self.first is None:
+            self.first = record.getMessage()
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return None
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return sorted_samples[int(rank) - 1]
+
+
+def load_probes(connect, limit=1000):
+    """Sample real last names and room numbers to look up during the run."""
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT LastName, RoomNumber FROM Reservations")
+        reservations = cursor.fetchmany(limit)
+        cursor.fetchall()
+    finally:
+        conn.close()
+    return {
+        'last_names': [row[0] for row in reservations] or ['Smith'],
+        'rooms': [row[1] for row in reservations] or ['1001'],
+    }
+
+
+def _random_stay(rng, horizon_days=365):
+    check_in = date.today() + timedelta(days=rng.randint(0, horizon_days))
+    return check_in, check_in + timedelta(days=rng.randint(1, 7))
+
+
+def workloads(app, probes, rng):
+    """Operation name -> (callable, is_full_scan). Interactive functions are timed via their query path."""
+    return {
+        'view_reservations.first_page': (lambda: app.fetch_reservation_page(), False),
+        'view_reservations.stream_all': (lambda: sum(1 for _ in app.iter_reservations(page_size=1000)), True),
+        'search_reservations.room': (lambda: app.find_reservations(room_number=rng.choice(probes['rooms'])), False),
+        'search_reservations.last_name': (lambda: app.find_reservations(last_name=rng.choice(probes['last_names'])), False),
+        'validate_room': (lambda: app.find_reservations_by_last_name(rng.choice(probes['last_names'])), False),
+        'guest_search.prefix': (lambda: app.search_guests(rng.choice(probes['last_names'])[:3]), False),
+        'guest_search.typo': (lambda: app.search_guests(_typo(rng, rng.choice(probes['last_names']))), False),
+        'display_items.cold': (lambda: (app.catalog_cache.invalidate(), app.display_items()), False),
+        'display_items.warm': (app.display_items, False),
+        # whole menu priced through the cached compiled rules for a random hour and occupancy
+        'pricing.menu': (lambda: app.pricing_engine.menu(_random_moment(rng), rng.uniform(0, 100)), False),
+        'pricing.compile': (lambda: pricing.CompiledRules(app.pricing_engine.compiled().rules), False),
+        'availability.is_free': (lambda: app.get_availability().is_free(
+            rng.choice(probes['rooms']), *_random_stay(rng)), False),
+        'availability.free_rooms': (lambda: app.get_availability().free_rooms(*_random_stay(rng)), False),
+        'manage_discount_codes': (lambda: (app.last_discount_code(), app.list_discount_codes()), True),
+        'order_item.place': (lambda: app.order_store.place(_random_cart(app, probes, rng)), False),
+        'billing.folios': (lambda: sum(len(folio.render_text())
+                                       for folio in billing.iter_folios(app.get_backend(), app.TAX_RATE)), True),
+    }
+
+
+def _random_moment(rng):
+    return datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=rng.randrange(7 * 24))
+
+
+def _typo(rng, name):
+    """The name with two neighbouring letters swapped, as a guest might mistype it."""
+    if len(name) < 3:
+        return name
+    i = rng.randrange(len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def _random_cart(app, probes, rng, lines=3):
+    cart = OrderCart(rng.choice(probes['rooms']))
+    for item_id, name, price in rng.sample(app.pricing_engine.menu(), lines):
+        cart.add(item_id, name, price, rng.randint(1, 3), app.generate_code())
+    return cart
+
+
+def run_operation(func, counter, errors, iterations, warmup):
+    for _ in range(warmup):
+        try:
+            func()
+        except Exception:
+            pass
+    errors.count, errors.first = 0, None
+    counter.round_trips = counter.rows = 0
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            errors.count += 1
+            errors.first = errors.first or str(e)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    result = {
+        'iterations': iterations,
+        'errors': errors.count,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(sum(samples) / len(samples), 3),
+        'max_ms': round(samples[-1], 3),
+        'round_trips_per_op': round(counter.round_trips / iterations, 2),
+        'rows_per_op': round(counter.rows / iterations, 2),
+    }
+    if errors.first:
+        result['first_error'] = errors.first
+    return result
+
+
+def run(backend, iterations=200, scan_iterations=10, warmup=3, seed=42, only=None):
+    """Time every workload against backend and return the report as a dict."""
+    import main as app
+
+    counter = CountingBackend(backend)
+    app.set_backend(counter)
+    rng = random.Random(seed)
+    probes = load_probes(counter.connect)
+
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    errors = _ErrorCounter()
+    root.handlers = [errors]  # keep per-row terminal output out of the timings
+    root.setLevel(logging.ERROR)
+    operations = {}
+    try:
+        for name, (func, full_scan) in workloads(app, probes, rng).items():
+            if only and name not in only:
+                continue
+            count = scan_iterations if full_scan else iterations
+            operations[name] = run_operation(func, counter, errors, max(count, 1), warmup)
+    finally:
+        root.handlers = saved_handlers
+        root.setLevel(saved_level)
+        app.close_pool()
+    return {
+        'meta': {
+            'backend': backend.name,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'iterations': iterations,
+            'scan_iterations': scan_iterations,
+        },
+        'operations': operations,
+    }
+
+
+# cli.py invocations timed by --startup; DB commands get --sqlite appended when one is given.
+STARTUP_COMMANDS = [
+    (['--help'], False),
+    (['reservations', 'add', '--help'], False),
+    (['items', 'list'], True),
+    (['audit', 'run', '--help'], False),
+]
+
+
+def parse_importtime(stderr):
+    """(total ms, [(module, cumulative ms), ...]) for the top-level imports in `-X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit() or name[1:2] == ' ':
+            continue  # header line, or a module imported by another module
+        modules.append((name.strip(), int(cumulative) / 1000))
+    return sum(ms for _, ms in modules), sorted(modules, key=lambda item: -item[1])
+
+
+def run_startup(commands=STARTUP_COMMANDS, repeat=5, sqlite=None):
+    """Start cli.py repeat times per command under -X importtime; median wall and import times in ms."""
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+    results = {}
+    for argv, needs_db in commands:
+        argv = argv + (['--sqlite', sqlite] if needs_db and sqlite else [])
+        walls, imports = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            process = subprocess.run([sys.executable, '-X', 'importtime', cli] + argv, capture_output=True, text=True)
+            walls.append((time.perf_counter() - started) * 1000)
+            import_ms, modules = parse_importtime(process.stderr)
+            imports.append(import_ms)
+        results[' '.join(argv)] = {
+            'wall_ms': round(statistics.median(walls), 3),
+            'import_ms': round(statistics.median(imports), 3),
+            'top_level_imports': len(modules),
+            'slowest_imports': [[name, round(ms, 3)] for name, ms in modules[:5]],
+            'exit_code': process.returncode,
+        }
+    return results
+
+
+def format_startup(results):
+    lines = [f"{'command':40} {'wall ms':>9} {'import ms':>10} {'modules':>8}  slowest"]
+    for command, r in results.items():
+        slowest = ", ".join(name for name, _ in r['slowest_imports'][:3])
+        lines.append(f"{command[:40]:40} {r['wall_ms']:>9.1f} {r['import_ms']:>10.1f} {r['top_level_imports']:>8}  {slowest}")
+    return "\n".join(lines)
+
+
+def format_report(report):
+    lines = [f"{'operation':32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'trips':>6} {'rows':>9} {'errors':>6}"]
+    for name, r in report['operations'].items():
+        lines.append(f"{name:32} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+                     f"{r['round_trips_per_op']:>6} {r['rows_per_op']:>9} {r['errors']:>6}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hotel workloads and write a JSON report.")
+    parser.add_argument('--sqlite', metavar='PATH', help="benchmark this SQLite file (default: the configured backend)")
+    parser.add_argument('--generate', action='store_true', help="create and migrate the schema, then fill it with synthetic data")
+    parser.add_argument('--scale', type=int, default=10000, help="reservations to generate with --generate")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--scan-iterations', type=int, default=10, help="iterations for full-table operations")
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', nargs='*', metavar='OPERATION', help="run only these operations")
+    parser.add_argument('--output', default='bench_report.json', help="where to write the JSON report")
+    parser.add_argument('--startup', action='store_true',
+                        help="time cli.py start-up under -X importtime instead of the database workloads "
+                             "(--iterations runs per command)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        report = {
+            'meta': {'started_at': datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(), 'platform': platform.platform(),
+                     'iterations': args.iterations},
+            'startup': run_startup(repeat=max(args.iterations, 1), sqlite=args.sqlite),
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(format_startup(report['startup']))
+        print(f"Report written to {os.path.abspath(args.output)}")
+        return 0
+
+    if args.sqlite:
+        backend = SqliteBackend(args.sqlite)
+    else:
+        import main as app
+        backend = app.get_backend()
+    if args.generate:
+        prepare_database(backend)
+        datagen.generate(backend, datagen.default_sizes(args.scale), seed=args.seed, reset=True)
+
+    report = run(backend, iterations=args.iterations, scan_iterations=args.scan_iterations,
+                 warmup=args.warmup, seed=args.seed, only=args.only)
+    report['meta']['scale'] = args.scale if args.generate else None
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    print(f"Report written to {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Guest folios priced in Decimal end to end, rendered one at a time or in bulk for every checked-out stay."""
+import argparse
+import configparser
+import json
+import logging
+import os
+import time
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from storage import SqliteBackend, backend_from_config
+
+CENT = Decimal('0.01')
+FORMATS = ('text', 'json')
+DEFAULT_BATCH_SIZE = 1000
+
+
+def to_decimal(value):
+    """Decimal for a price, percentage or rate; floats go through str() so 0.1 stays 0.1."""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value).strip())
+
+
+def money(value):
+    """Round to cents, half up, the way the receipts and the DECIMAL(10,2) columns expect."""
+    return to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def dollars(amount):
+    """'$12.50', or '-$4.61' for credits."""
+    return f"-${-amount:.2f}" if amount < 0 else f"${amount:.2f}"
+
+
+def percent_of(amount, percentage):
+    return money(to_decimal(amount) * to_decimal(percentage) / 100)
+
+
+class Folio:
+    """Charges and discounts for one stay; subtotal, tax and total are Decimal and rounded to cents."""
+
+    def __init__(self, tax_rate=0, reservation_id=None, room_number=None, last_name=None, first_name=None,
+                 check_in=None, check_out=None):
+        self.tax_rate = to_decimal(tax_rate)
+        self.reservation_id = reservation_id
+        self.room_number = room_number
+        self.last_name = last_name
+        self.first_name = first_name
+        self.check_in = check_in
+        self.check_out = check_out
+        self.lines = []  # (description, quantity, unit_price, amount)
+
+    def charge(self, description, unit_price, quantity=1):
+        unit_price = money(unit_price)
+        self.lines.append((description, quantity, unit_price, unit_price * quantity))
+
+    def discount(self, description, base, percentage):
+        """Credit percentage of base (e.g. one order's subtotal) as a negative line."""
+        amount = percent_of(base, percentage)
+        if amount:
+            self.lines.append((description, 1, -amount, -amount))
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def subtotal(self):
+        return sum((amount for _, _, _, amount in self.lines), Decimal('0.00'))
+
+    @property
+    def tax(self):
+        return money(self.subtotal * self.tax_rate)
+
+    @property
+    def total(self):
+        return self.subtotal + self.tax
+
+    def render_text(self):
+        parts = ["----- Receipt -----"]
+        if self.reservation_id is not None:
+            parts.append(f"Folio {self.reservation_id} - Room {self.room_number}")
+            parts.append(f"Guest: {self.first_name or ''} {self.last_name or ''}".rstrip())
+            parts.append(f"Stay: {self.check_in} to {self.check_out}")
+        for description, quantity, _, amount in self.lines:
+            label = f"{description} x{quantity}" if quantity != 1 else description
+            parts.append(f"{label}: {dollars(amount)}")
+        parts.append(f"Subtotal: {dollars(self.subtotal)}")
+        parts.append(f"Tax (Tax Rate: {(self.tax_rate * 100).normalize():f}%): {dollars(self.tax)}")
+        parts.append(f"Total Amount: {dollars(self.total)}")
+        parts.append("-------------------")
+        return "\n".join(parts) + "\n"
+
+    def to_dict(self):
+        """JSON-ready dict; amounts are strings so no cent is lost to float."""
+        return {
+            'reservation_id': self.reservation_id,
+            'room_number': self.room_number,
+            'last_name': self.last_name,
+            'first_name': self.first_name,
+            'check_in': str(self.check_in) if self.check_in is not None else None,
+            'check_out': str(self.check_out) if self.check_out is not None else None,
+            'lines': [{'description': description, 'quantity': quantity,
+                       'unit_price': str(unit_price), 'amount': str(amount)}
+                      for description, quantity, unit_price, amount in self.lines],
+            'subtotal': str(self.subtotal),
+            'tax_rate': str(self.tax_rate),
+            'tax': str(self.tax),
+            'total': str(self.total),
+        }
+
+
+def folio_query(backend, checkout_date=None):
+    """One statement for every checked-out stay with the room-service lines ordered during it."""
+    ordered = backend.as_date('o.CreatedAt')
+    query = (
+        "SELECT r.ReservationID, r.RoomNumber, r.LastName, r.FirstName, r.CheckInDate, r.CheckOutDate, "
+        "o.OrderID, o.DiscountCode, o.DiscountPercentage, t.ItemID, i.Name, t.Quantity, "
+        "COALESCE(t.UnitPrice, i.Price) "
+        "FROM Reservations r "
+        "LEFT JOIN Orders o ON o.RoomNumber = r.RoomNumber AND o.CreatedAt >= r.CheckInDate "
+        f"AND {ordered} <= r.CheckOutDate "
+        # On a changeover day both stays cover the date, so the order's last name decides:
+        # the departing stay takes only its own, the arriving one everything else.
+        f"AND ({ordered} < r.CheckOutDate OR LOWER(o.LastName) = LOWER(r.LastName)) "
+        f"AND ({ordered} > r.CheckInDate OR o.LastName IS NULL OR LOWER(o.LastName) = LOWER(r.LastName)) "
+        "LEFT JOIN Transactions t ON t.OrderID = o.OrderID "
+        "LEFT JOIN Items i ON i.ItemID = t.ItemID "
+        "WHERE r.Status = 'CheckedOut'")
+    params = ()
+    if checkout_date is not None:
+        query += " AND r.CheckOutDate = ?"
+        params = (checkout_date,)
+    return query + " ORDER BY r.ReservationID, o.OrderID, t.TransactionID", params
+
+
+def iter_folios(backend, tax_rate=0, checkout_date=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield a Folio per checked-out reservation, built from one streamed result set."""
+    query, params = folio_query(backend, checkout_date)
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        folio = order = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for (reservation_id, room_number, last_name, first_name, check_in, check_out,
+                 order_id, discount_code, discount_percentage, item_id, name, quantity, unit_price) in rows:
+                if folio is None or folio.reservation_id != reservation_id:
+                    if folio is not None:
+                        _close_order(folio, order)
+                        yield folio
+                    folio = Folio(tax_rate, reservation_id, room_number, last_name, first_name, check_in, check_out)
+                    order = None
+                if order_id is None:
+                    continue
+                if order is None or order[0] != order_id:
+                    _close_order(folio, order)
+                    order = [order_id, discount_code, discount_percentage, Decimal('0.00')]
+                if item_id is not None:
+                    folio.charge(name or f"Item {item_id}", unit_price or 0, quantity)
+                    order[3] += folio.lines[-1][3]
+        if folio is not None:
+            _close_order(folio, order)
+            yield folio
+    finally:
+        conn.close()
+
+
+def _close_order(folio, order):
+    if order is not None and order[2]:
+        folio.discount(f"Order {order[0]} discount {order[1]} ({order[2]:g}%)", order[3], order[2])
+
+
+def write_folios(backend, out_dir, fmt='text', tax_rate=0, checkout_date=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Write one folio-<ReservationID>.txt/.json file per checked-out stay. Returns a summary dict."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported folio format {fmt}; choose from {', '.join(FORMATS)}.")
+    os.makedirs(out_dir, exist_ok=True)
+    extension = 'txt' if fmt == 'text' else 'json'
+    started = time.perf_counter()
+    written, billed = 0, Decimal('0.00')
+    for folio in iter_folios(backend, tax_rate, checkout_date, batch_size):
+        path = os.path.join(out_dir, f"folio-{folio.reservation_id}.{extension}")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(folio.render_text() if fmt == 'text' else json.dumps(folio.to_dict(), indent=2))
+        written += 1
+        billed += folio.total
+    elapsed = time.perf_counter() - started
+    logging.info(f"Wrote {written} folios to {out_dir} in {elapsed:.2f}s "
+                 f"({written / elapsed if elapsed else 0:.1f} folios/s), ${billed:.2f} billed.")
+    return {'folios': written, 'billed': str(billed), 'seconds': round(elapsed, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate folios for checked-out stays.")
+    parser.add_argument('command', choices=['folios'])
+    parser.add_argument('out_dir', help="directory to write folio-<ReservationID> files to")
+    parser.add_argument('--format', choices=FORMATS, default='text')
+    parser.add_argument('--checkout-date', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="only stays that checked out on this date (default: all checked-out stays)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows fetched per round trip")
+    parser.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+    tax_rate = to_decimal(config.get('hotel', 'tax', fallback='0').strip() or 0)
+    try:
+        write_folios(backend, args.out_dir, args.format, tax_rate, args.checkout_date, args.batch_size)
+        return 0
+    except (OSError, ValueError) as e:
+        logging.error(f"Error: {e}")
+        return 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
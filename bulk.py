@@ -0,0 +1,340 @@
+"""Bulk import and export of Reservations, Items and Discounts as CSV or JSON Lines."""
+import argparse
+import configparser
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from availability import AvailabilityIndex
+from storage import SqliteBackend, backend_from_config
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _text(value):
+    return str(value).strip()
+
+
+def _int(value):
+    return int(str(value).strip())
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}") from None
+
+
+def _date(value):
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+def _datetime(value):
+    return datetime.fromisoformat(str(value).strip())
+
+
+# table -> [(column, converter, required)]; columns missing from the live schema are skipped.
+TABLES = {
+    'Reservations': [
+        ('RoomNumber', _text, True),
+        ('Floor', _int, False),
+        ('LastName', _text, True),
+        ('FirstName', _text, False),
+        ('CheckInDate', _date, False),
+        ('CheckOutDate', _date, False),
+        ('Status', _text, False),
+        ('CreatedAt', _datetime, False),
+    ],
+    'Items': [
+        ('Name', _text, True),
+        ('ItemName', _text, False),
+        ('Quantity', _int, False),
+        ('Price', _decimal, True),
+        ('PricingRule', _text, False),
+        ('Category', _text, False),
+        ('InventoryID', _int, False),
+        ('Description', _text, False),
+        ('CreatedAt', _datetime, False),
+    ],
+    'Discounts': [
+        ('Code', _text, True),
+        ('DiscountPercentage', _decimal, True),
+        ('CreatedAt', _datetime, False),
+    ],
+}
+# Identity columns are exported for reference but never imported.
+EXPORT_KEYS = {'Reservations': 'ReservationID', 'Items': 'ItemID', 'Discounts': 'Code'}
+
+
+def _defaults(table, row):
+    """Fill the values a column DEFAULT would have supplied, since the INSERT names every column."""
+    row.setdefault('CreatedAt', datetime.now())
+    if table == 'Reservations':
+        row.setdefault('Status', 'Active')
+        if 'Floor' not in row:
+            row['Floor'] = int(row['RoomNumber'][:-3])
+        if (row.get('CheckInDate') is None) != (row.get('CheckOutDate') is None):
+            raise ValueError("CheckInDate and CheckOutDate must both be set or both be empty")
+        if row.get('CheckInDate') and row['CheckOutDate'] <= row['CheckInDate']:
+            raise ValueError("CheckOutDate must be after CheckInDate")
+    elif table == 'Items':
+        row.setdefault('ItemName', row['Name'])
+        row.setdefault('Quantity', 0)
+        if row['Price'] < 0:
+            raise ValueError("Price must not be negative")
+        if len(row.get('PricingRule') or '') > 20:
+            raise ValueError("PricingRule must be at most 20 characters")
+    elif table == 'Discounts':
+        if not 0 < row['DiscountPercentage'] <= 100:
+            raise ValueError("DiscountPercentage must be between 0 and 100")
+    return row
+
+
+def convert_row(table, raw):
+    """Validate one input record and return {column: value}; raises ValueError with the reason."""
+    row = {}
+    for column, converter, required in TABLES[table]:
+        value = raw.get(column)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if required:
+                raise ValueError(f"{column} is required")
+            continue
+        try:
+            row[column] = converter(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{column}: {e}") from None
+    return _defaults(table, row)
+
+
+def detect_format(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    fmt = 'jsonl' if fmt in ('json', 'ndjson') else fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"Cannot tell the format of {path}; pass --format {' or '.join(FORMATS)}.")
+    return fmt
+
+
+def read_records(path, fmt):
+    """Yield (line_number, record) pairs; malformed JSON lines are yielded as (line_number, error)."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {e}")
+                continue
+            yield line_number, record
+
+
+class RejectWriter:
+    """Writes bad input records, with their line number and reason, next to the input file."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        self._file = self._csv = None
+
+    def write(self, line_number, record, reason):
+        self.count += 1
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+        if not isinstance(record, dict):
+            record = {}
+        entry = dict(record, _line=line_number, _error=reason)
+        if self.fmt == 'jsonl':
+            self._file.write(json.dumps(entry, default=str) + '\n')
+            return
+        if self._csv is None:
+            self._csv = csv.DictWriter(self._file, fieldnames=list(entry), extrasaction='ignore')
+            self._csv.writeheader()
+        self._csv.writerow(entry)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _load_availability(cursor):
+    cursor.execute("SELECT ReservationID, RoomNumber, CheckInDate, CheckOutDate FROM Reservations")
+    index = AvailabilityIndex()
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            return index
+        index.load(rows)
+
+
+def import_file(backend, table, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, reject_path=None, check_overlap=True):
+    """Stream a file into table in executemany batches, one transaction per batch.
+
+    Rows that fail validation, overlap an existing stay (Reservations) or are refused by the
+    database go to the reject file. Returns a summary dict.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unsupported table {table}; choose from {', '.join(TABLES)}.")
+    fmt = detect_format(path, fmt)
+    base, ext = os.path.splitext(path)
+    rejects = RejectWriter(reject_path or f"{base}.rejects{ext or '.' + fmt}", fmt)
+    conn = backend.connect()
+    started = time.perf_counter()
+    read = inserted = batches = 0
+    try:
+        cursor = conn.cursor()
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = True
+        existing = set(backend.table_columns(cursor, table))
+        columns = [column for column, _, _ in TABLES[table] if column in existing]
+        statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        availability = _load_availability(cursor) if table == 'Reservations' and check_overlap else None
+        pending_ids = itertools.count(-1, -1)  # placeholders so accepted rows block later overlapping rows
+
+        records = read_records(path, fmt)
+        while True:
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for line_number, record in chunk:
+                read += 1
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    row = convert_row(table, record)
+                    if availability is not None and row.get('CheckInDate'):
+                        if not availability.is_free(row['RoomNumber'], row['CheckInDate'], row['CheckOutDate']):
+                            raise ValueError(f"room {row['RoomNumber']} is already booked for these dates")
+                        availability.add(next(pending_ids), row['RoomNumber'], row['CheckInDate'], row['CheckOutDate'])
+                except ValueError as e:
+                    rejects.write(line_number, record, str(e))
+                    continue
+                batch.append((line_number, record, tuple(row.get(column) for column in columns)))
+            if batch:
+                inserted += _insert_batch(backend, conn, cursor, statement, batch, rejects)
+                batches += 1
+    finally:
+        conn.close()
+        rejects.close()
+    elapsed = time.perf_counter() - started
+    summary = {
+        'table': table,
+        'read': read,
+        'inserted': inserted,
+        'rejected': rejects.count,
+        'batches': batches,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(inserted / elapsed, 1) if elapsed else None,
+        'rejects_file': rejects.path if rejects.count else None,
+    }
+    logging.info(f"Imported {inserted} of {read} {table} rows in {elapsed:.2f}s "
+                 f"({summary['rows_per_second']} rows/s, {rejects.count} rejected).")
+    if rejects.count:
+        logging.info(f"Rejected rows written to {rejects.path}")
+    return summary
+
+
+def _insert_batch(backend, conn, cursor, statement, batch, rejects):
+    """Insert one batch in a single transaction; if the database refuses it, retry row by row."""
+    try:
+        backend.begin(cursor)
+        cursor.executemany(statement, [values for _, _, values in batch])
+        conn.commit()
+        return len(batch)
+    except Exception:
+        conn.rollback()
+    inserted = 0
+    backend.begin(cursor)
+    for line_number, record, values in batch:
+        try:
+            cursor.execute(statement, values)
+            inserted += 1
+        except Exception as e:
+            rejects.write(line_number, record, f"database error: {e}")
+    conn.commit()
+    return inserted
+
+
+def export_table(backend, table, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream every row of table to path in primary key order. Returns a summary dict."""
+    if table not in TABLES:
+        raise ValueError(f"Unsupported table {table}; choose from {', '.join(TABLES)}.")
+    fmt = detect_format(path, fmt)
+    conn = backend.connect()
+    started = time.perf_counter()
+    exported = 0
+    try:
+        cursor = conn.cursor()
+        existing = backend.table_columns(cursor, table)
+        key = EXPORT_KEYS[table]
+        columns = [key] + [column for column, _, _ in TABLES[table] if column in existing and column != key]
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {key}")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f) if fmt == 'csv' else None
+            if writer:
+                writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if writer:
+                    writer.writerows(['' if value is None else value for value in row] for row in rows)
+                else:
+                    f.writelines(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+                exported += len(rows)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    logging.info(f"Exported {exported} {table} rows to {path} in {elapsed:.2f}s "
+                 f"({exported / elapsed if elapsed else 0:.1f} rows/s).")
+    return {'table': table, 'exported': exported, 'seconds': round(elapsed, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import or export Reservations, Items and Discounts.")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('table', choices=list(TABLES))
+    parser.add_argument('path', help="CSV or JSON Lines file (.csv, .jsonl)")
+    parser.add_argument('--format', choices=FORMATS, help="override the format implied by the file extension")
+    parser.add_argument('--batch-size', type=int, help="rows per executemany batch and transaction")
+    parser.add_argument('--rejects', metavar='PATH', help="where to write rejected rows (default: <input>.rejects.<ext>)")
+    parser.add_argument('--allow-overlap', action='store_true',
+                        help="import reservations even when they overlap existing stays (e.g. history from an old PMS)")
+    parser.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+    batch_size = args.batch_size or config.getint('bulk', 'batch_size', fallback=DEFAULT_BATCH_SIZE)
+    try:
+        if args.command == 'import':
+            summary = import_file(backend, args.table, args.path, args.format, batch_size,
+                                  args.rejects, check_overlap=not args.allow_overlap)
+            return 1 if summary['rejected'] else 0
+        export_table(backend, args.table, args.path, args.format, batch_size)
+        return 0
+    except (OSError, ValueError) as e:
+        logging.error(f"Error: {e}")
+        return 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
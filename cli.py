@@ -0,0 +1,258 @@
+"""Non-interactive subcommands for cron jobs and scripts, e.g. `python cli.py valet checkin ABC-1234 "Jane Doe"`.
+
+Only argparse is imported up front. Each command imports main (and with it the database layer)
+or the job module it needs when it runs, so --help and usage errors start in a few milliseconds.
+Run without a command to open the interactive menu.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+from datetime import date
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.ini')
+
+LIST_FIELDS = ('ReservationID', 'RoomNumber', 'Floor', 'LastName', 'FirstName', 'Status')
+SEARCH_FIELDS = ('ReservationID', 'RoomNumber', 'Floor', 'LastName', 'FirstName', 'CheckInDate', 'CheckOutDate',
+                 'Status')
+
+
+class CommandError(Exception):
+    """A command could not do what was asked; the message is printed and the exit status is 1."""
+
+
+def _app(args):
+    """The application module, pointed at --sqlite when given, with the event log started."""
+    import events
+    import main as app
+    if args.sqlite:
+        from storage import SqliteBackend
+        app.set_backend(SqliteBackend(args.sqlite))
+    app.pacer.mode = 'off'  # no simulated kiosk delays in scripts
+    events.start_from_config(app.config)
+    return app
+
+
+def _backend(args):
+    """Storage backend for jobs that do not need main: --sqlite, or the one in config.ini."""
+    import configparser
+    from storage import SqliteBackend, backend_from_config
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    return config, SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+
+
+def _output(args, payload, lines):
+    if args.json:
+        print(json.dumps(payload, default=str))
+    else:
+        print("\n".join(lines) if lines else "No results.")
+
+
+def _records(rows, fields):
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+def _table(records, fields):
+    return [", ".join(f"{field}: {record[field]}" for field in fields) for record in records]
+
+
+def reservations_list(args):
+    app = _app(args)
+    rows = itertools.islice(app.iter_reservations(page_size=min(args.limit, 1000), status=args.status,
+                                                  floor=args.floor), args.limit)
+    records = _records(rows, LIST_FIELDS)
+    _output(args, records, _table(records, LIST_FIELDS))
+
+
+def reservations_search(args):
+    app = _app(args)
+    rows = app.find_reservations(room_number=args.room, last_name=args.last_name,
+                                 include_archive=args.include_archive)
+    records = _records(rows, SEARCH_FIELDS)
+    _output(args, records, _table(records, SEARCH_FIELDS))
+
+
+def reservations_add(args):
+    app = _app(args)
+    reservation_id = app.book_reservation(args.room, args.last_name, args.first_name, args.check_in, args.check_out)
+    if reservation_id is None:
+        raise CommandError(f"Room {args.room} is not available from {args.check_in} to {args.check_out}.")
+    _output(args, {'reservation_id': reservation_id, 'room_number': args.room},
+            [f"Reservation {reservation_id} booked for room {args.room}."])
+
+
+def items_list(args):
+    from billing import money
+    app = _app(args)
+    menu = app.pricing_engine.menu()
+    _output(args, [{'item_id': item_id, 'name': name, 'price': str(money(price))} for item_id, name, price in menu],
+            [f"{item_id}. {name} ${price:.2f}" for item_id, name, price in menu])
+
+
+def _order_line(value):
+    item_id, _, quantity = value.partition(':')
+    try:
+        return int(item_id), int(quantity or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected ITEM_ID or ITEM_ID:QUANTITY, got {value!r}") from None
+
+
+def items_price(args):
+    from billing import money
+    app = _app(args)
+    priced, total = app.price_order(args.lines)
+    discount_percentage = None
+    if args.discount:
+        discount_percentage = app.lookup_discount(args.discount)
+        if discount_percentage is None:
+            raise CommandError(f"Invalid discount code {args.discount}.")
+        total = app.discounted_total(total, discount_percentage)
+    tax = money(total * app.TAX_RATE)
+    payload = {
+        'lines': [{'item_id': item_id, 'quantity': quantity, 'unit_price': str(price)}
+                  for item_id, quantity, price, _ in priced],
+        'discount_percentage': discount_percentage,
+        'total': str(total),
+        'tax': str(tax),
+        'total_with_tax': str(total + tax),
+    }
+    lines = [f"Item {item_id} x{quantity}: ${price * quantity:.2f}" for item_id, quantity, price, _ in priced]
+    if discount_percentage is not None:
+        lines.append(f"Discount {args.discount}: {discount_percentage}%")
+    lines += [f"Total: ${total:.2f}", f"Tax: ${tax:.2f}", f"Total with tax: ${total + tax:.2f}"]
+    _output(args, payload, lines)
+
+
+def valet_checkin(args):
+    from valet import ValetConflict
+    app = _app(args)
+    try:
+        spot = app.valet.check_in(args.plate, args.owner, args.spot, args.zone)
+    except ValetConflict as e:
+        raise CommandError(str(e)) from None
+    _output(args, {'license_plate': args.plate, 'parking_spot': spot, 'status': 'Checked-In'},
+            [f"Vehicle {args.plate} parked at {spot}."])
+
+
+def valet_checkout(args):
+    app = _app(args)
+    if not app.valet_check_out(args.plate, args.owner):
+        raise CommandError(f"No parked vehicle {args.plate} found for {args.owner}.")
+    _output(args, {'license_plate': args.plate, 'status': 'Checked-Out'},
+            [f"Vehicle {args.plate} checked out for {args.owner}."])
+
+
+def discounts_apply(args):
+    app = _app(args)
+    discount_percentage = app.lookup_discount(args.code)
+    if discount_percentage is None:
+        raise CommandError(f"Invalid discount code {args.code}.")
+    total = app.discounted_total(args.total, discount_percentage)
+    _output(args, {'discount_percentage': discount_percentage, 'total': str(total)},
+            [f"{args.code}: {discount_percentage}% off, new total ${total:.2f}"])
+
+
+def audit_run(args):
+    import night_audit
+    config, backend = _backend(args)
+    total_rooms = (config.getint('availability', 'floors', fallback=0)
+                   * config.getint('availability', 'rooms_per_floor', fallback=0))
+    rollup = night_audit.run_night_audit(
+        backend, args.date, total_rooms,
+        config.getint('audit', 'valet_stale_hours', fallback=night_audit.DEFAULT_VALET_STALE_HOURS))
+    _output(args, rollup, [night_audit.format_rollups([rollup])])
+
+
+def _money_arg(value):
+    from billing import money
+    try:
+        return money(value)
+    except ArithmeticError:
+        raise argparse.ArgumentTypeError(f"not an amount: {value!r}") from None
+
+
+def _command(actions, name, handler, help_text, parents):
+    command = actions.add_parser(name, help=help_text, parents=parents)
+    command.set_defaults(handler=handler)
+    return command
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Hotel management commands. Run without a command for the interactive menu.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    common.add_argument('--json', action='store_true', help="print the result as JSON")
+    groups = parser.add_subparsers(dest='group', metavar='COMMAND')
+
+    def group(name, help_text):
+        actions = groups.add_parser(name, help=help_text).add_subparsers(dest='action', metavar='ACTION', required=True)
+        return lambda action, handler, help_text: _command(actions, action, handler, help_text, [common])
+
+    reservations = group('reservations', "list, search and book reservations")
+    listing = reservations('list', reservations_list, "list reservations in room order")
+    listing.add_argument('--status', help="e.g. Active or CheckedOut")
+    listing.add_argument('--floor', type=int)
+    listing.add_argument('--limit', type=int, default=100)
+    search = reservations('search', reservations_search, "find reservations by room or last name")
+    key = search.add_mutually_exclusive_group(required=True)
+    key.add_argument('--room')
+    key.add_argument('--last-name')
+    search.add_argument('--include-archive', action='store_true', help="also search archived stays")
+    add = reservations('add', reservations_add, "book a room if it is free for the dates")
+    add.add_argument('room')
+    add.add_argument('last_name')
+    add.add_argument('first_name')
+    add.add_argument('check_in', type=date.fromisoformat, help="YYYY-MM-DD")
+    add.add_argument('check_out', type=date.fromisoformat, help="YYYY-MM-DD")
+
+    items = group('items', "menu and order pricing")
+    items('list', items_list, "print the priced menu")
+    price = items('price', items_price, "price an order without placing it")
+    price.add_argument('lines', nargs='+', type=_order_line, metavar='ITEM_ID[:QUANTITY]')
+    price.add_argument('--discount', metavar='CODE')
+
+    valet = group('valet', "valet check-in and check-out")
+    checkin = valet('checkin', valet_checkin, "park a vehicle; the nearest free spot is assigned unless --spot is given")
+    checkin.add_argument('plate')
+    checkin.add_argument('owner')
+    checkin.add_argument('--spot')
+    checkin.add_argument('--zone')
+    checkout = valet('checkout', valet_checkout, "return a parked vehicle to its owner")
+    checkout.add_argument('plate')
+    checkout.add_argument('owner')
+
+    discounts = group('discounts', "discount codes")
+    apply = discounts('apply', discounts_apply, "apply a code to an amount")
+    apply.add_argument('code')
+    apply.add_argument('total', type=_money_arg)
+
+    audit = group('audit', "end-of-day jobs")
+    run = audit('run', audit_run, "run the night audit for a business date")
+    run.add_argument('--date', type=date.fromisoformat, metavar='YYYY-MM-DD', help="default: today")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.group is None:
+        import main as app
+        app.main()
+        return 0
+    try:
+        args.handler(args)
+        return 0
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if 'main' in sys.modules:
+            sys.modules['main'].close_pool()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,285 @@
+"""Seeded synthetic data for the hotel tables, from a handful of rows up to millions."""
+import argparse
+import configparser
+import itertools
+import logging
+import os
+import random
+import string
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from migrations import prepare_database
+from storage import SqliteBackend, backend_from_config
+
+COMMON_LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Tremblay", "Gagnon", "Roy", "Côté", "Bouchard", "Gauthier", "Morin", "Lavoie", "Fortin", "Gagné",
+]
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Olivia", "Liam", "Emma", "Noah", "Amelia", "Oliver", "Sophia", "Elijah", "Chloé", "Zoë",
+    "Mateo", "Lucía", "Wei", "Mei", "Aarav", "Priya", "Hiroshi", "Yuki", "Fatima", "Omar",
+]
+# Rare surnames are stitched together so large properties get a long tail of distinct guests.
+_SURNAME_HEADS = ["Ash", "Black", "Brook", "Clay", "Dal", "Fair", "Glen", "Hart", "Kings", "Mar",
+                  "North", "Oak", "Pem", "Rad", "Sher", "Stan", "Thorn", "Wal", "Wes", "York"]
+_SURNAME_TAILS = ["bury", "croft", "ford", "ham", "ley", "man", "more", "ridge", "son", "ton",
+                  "wick", "wood", "worth", "ville", "field", "stead", "cott", "den", "well", "by"]
+
+MENU = [
+    ("Club Sandwich", "Food", 14.50), ("Caesar Salad", "Food", 12.00), ("Margherita Pizza", "Food", 18.00),
+    ("Cheeseburger", "Food", 16.00), ("Pasta Carbonara", "Food", 19.50), ("Continental Breakfast", "Food", 22.00),
+    ("Fruit Platter", "Food", 11.00), ("Chocolate Cake", "Dessert", 9.00), ("Ice Cream", "Dessert", 7.50),
+    ("Espresso", "Beverage", 4.00), ("Cappuccino", "Beverage", 5.00), ("Orange Juice", "Beverage", 6.00),
+    ("Bottled Water", "Beverage", 3.50), ("House Wine", "Bar", 12.00), ("Craft Beer", "Bar", 9.00),
+    ("Champagne", "Bar", 95.00), ("Laundry Service", "Service", 25.00), ("Spa Session", "Service", 120.00),
+    ("Airport Shuttle", "Service", 45.00), ("Late Checkout", "Service", 40.00),
+]
+ROLES = [("staff", 70), ("manager", 15), ("admin", 5), ("valet", 7), ("it support", 3)]
+PRICING_RULES = [(None, 60), ("Peak", 25), ("OffPeak", 15)]
+# (Name, Category, PricingRule, DaysOfWeek, StartHour, EndHour, MinOccupancy, MaxOccupancy, Multiplier);
+# the Peak and OffPeak tag rules are seeded by the pricing_rules migration.
+SAMPLE_PRICING_RULES = [
+    ("Breakfast rush", "Food", None, None, 6, 10, None, None, "1.10"),
+    ("Happy hour", "Bar", None, None, 17, 19, None, None, "0.80"),
+    ("Late night", None, None, None, 22, 6, None, None, "1.15"),
+    ("Weekend brunch", "Food", None, "56", 9, 13, None, None, "1.05"),
+    ("Weekend services", "Service", None, "456", None, None, None, None, "1.10"),
+    ("High occupancy", None, None, None, None, None, "85", None, "1.10"),
+    ("Sold out", "Service", None, None, None, None, "95", None, "1.25"),
+    ("Quiet nights", None, None, None, None, None, None, "40", "0.95"),
+]
+DISCOUNT_PERCENTAGES = [(5, 25), (10, 35), (15, 20), (20, 10), (25, 6), (50, 4)]
+VALET_ZONES = "ABCD"
+
+
+def surname_pool():
+    """Deterministic surname list ordered from most to least common."""
+    return COMMON_LAST_NAMES + [head + tail for head, tail in itertools.product(_SURNAME_HEADS, _SURNAME_TAILS)]
+
+
+def _zipf_weights(n, exponent=1.0):
+    return [1.0 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return lambda: rng.choices(values, weights)[0]
+
+
+def default_sizes(scale):
+    """Row counts for every table derived from the number of reservations."""
+    return {
+        'Reservations': scale,
+        'Users': max(scale // 200, 10),
+        'Items': min(max(scale // 1000, len(MENU)), 500),
+        'Discounts': max(scale // 100, 20),
+        'ValetVehicles': scale // 2,
+        'PricingRules': len(SAMPLE_PRICING_RULES),
+    }
+
+
+def reservation_rows(rng, count, rooms_per_floor=40, floors=None, history_days=3 * 365, today=None):
+    """Stays spread over the past few years plus two months of future bookings."""
+    today = today or date.today()
+    floors = floors or max(2, min(50, count // (rooms_per_floor * 50) + 2))
+    surnames = surname_pool()
+    surname_weights = list(itertools.accumulate(_zipf_weights(len(surnames), 0.9)))
+    for _ in range(count):
+        floor = rng.randint(1, floors)
+        room_number = f"{floor}{rng.randint(1, rooms_per_floor):03d}"
+        nights = min(1 + int(rng.expovariate(1 / 2.5)), 21)
+        check_in = today - timedelta(days=rng.randint(-60, history_days))
+        check_out = check_in + timedelta(days=nights)
+        yield {
+            'RoomNumber': room_number,
+            'Floor': floor,
+            'LastName': rng.choices(surnames, cum_weights=surname_weights)[0],
+            'FirstName': rng.choice(FIRST_NAMES),
+            'CheckInDate': check_in,
+            'CheckOutDate': check_out,
+            'Status': 'CheckedOut' if check_out < today else 'Active',
+        }
+
+
+def user_rows(rng, count):
+    role = _weighted(rng, ROLES)
+    surnames = surname_pool()
+    yield {'Username': 'master', 'Password': _password(rng), 'PasswordHash': '', 'Role': 'admin',
+           'FailedAttempts': 0}
+    for n in range(1, count):
+        secret = _password(rng)
+        yield {
+            'Username': f"{rng.choice(FIRST_NAMES)[0].lower()}{rng.choice(surnames).lower()}{n}",
+            'Password': secret,
+            'PasswordHash': secret,
+            'Role': role(),
+            'FailedAttempts': 0,
+        }
+
+
+def _password(rng):
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=12))
+
+
+def item_rows(rng, count):
+    rule = _weighted(rng, PRICING_RULES)
+    for n in range(count):
+        name, category, base = MENU[n % len(MENU)]
+        if n >= len(MENU):
+            name = f"{name} #{n // len(MENU) + 1}"
+        price = Decimal(str(round(base * rng.lognormvariate(0, 0.15), 2)))
+        yield {
+            'Name': name,
+            'ItemName': name,
+            'Quantity': rng.randint(0, 200),
+            'Price': price,
+            'PricingRule': rule(),
+            'Category': category,
+            'Description': f"{category} item",
+        }
+
+
+def discount_rows(rng, count, today=None):
+    now = datetime.combine(today or date.today(), datetime.min.time())
+    percentage = _weighted(rng, DISCOUNT_PERCENTAGES)
+    seen = set()
+    while len(seen) < count:
+        code = ''.join(rng.choices(string.ascii_uppercase + string.digits, k=8))
+        if code in seen:
+            continue
+        seen.add(code)
+        yield {
+            'Code': code,
+            'DiscountPercentage': Decimal(percentage()),
+            'CreatedAt': now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60)),
+        }
+
+
+def valet_rows(rng, count, active_ratio=0.05, today=None):
+    now = datetime.combine(today or date.today(), datetime.min.time())
+    surnames = surname_pool()
+    for _ in range(count):
+        plate = (''.join(rng.choices(string.ascii_uppercase, k=3)) + '-'
+                 + ''.join(rng.choices(string.digits, k=4)))
+        check_in = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        active = rng.random() < active_ratio
+        yield {
+            'LicensePlate': plate,
+            'OwnerName': f"{rng.choice(FIRST_NAMES)} {rng.choice(surnames)}",
+            'ParkingSpot': f"{rng.choice(VALET_ZONES)}{rng.randint(1, 120)}",
+            'Status': 'Checked-In' if active else 'Checked-Out',
+            'CheckInTime': check_in,
+            'CheckOutTime': None if active else check_in + timedelta(hours=rng.randint(1, 96)),
+        }
+
+
+def pricing_rule_rows(rng, count):
+    """The sample time-of-day, weekday, category and occupancy rules, repeated if more are asked for."""
+    for n in range(count):
+        name, category, tag, days, start_hour, end_hour, min_occupancy, max_occupancy, multiplier = \
+            SAMPLE_PRICING_RULES[n % len(SAMPLE_PRICING_RULES)]
+        yield {
+            'Name': name,
+            'Category': category,
+            'PricingRule': tag,
+            'DaysOfWeek': days,
+            'StartHour': start_hour,
+            'EndHour': end_hour,
+            'MinOccupancy': None if min_occupancy is None else Decimal(min_occupancy),
+            'MaxOccupancy': None if max_occupancy is None else Decimal(max_occupancy),
+            'Multiplier': Decimal(multiplier),
+            'Active': 1,
+        }
+
+
+GENERATORS = {
+    'Users': user_rows,
+    'Reservations': reservation_rows,
+    'Items': item_rows,
+    'Discounts': discount_rows,
+    'ValetVehicles': valet_rows,
+    'PricingRules': pricing_rule_rows,
+}
+
+
+def insert_rows(backend, conn, table, rows, batch_size=5000):
+    """Insert generated rows in executemany batches, one commit per batch."""
+    cursor = conn.cursor()
+    existing = set(backend.table_columns(cursor, table))
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+    inserted = 0
+    columns = statement = None
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        if columns is None:
+            # Only fill the columns this schema version actually has.
+            columns = [name for name in batch[0] if name in existing]
+            statement = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                         f"VALUES ({', '.join('?' * len(columns))})")
+        cursor.executemany(statement, [tuple(row[name] for name in columns) for row in batch])
+        conn.commit()
+        inserted += len(batch)
+    return inserted
+
+
+def generate(backend, sizes, seed=42, batch_size=5000, reset=False):
+    """Fill each table in sizes with seeded rows and return {table: rows_inserted}."""
+    rng = random.Random(seed)
+    conn = backend.connect()
+    counts = {}
+    try:
+        if reset:
+            cursor = conn.cursor()
+            for table in sizes:
+                cursor.execute(f"DELETE FROM {table}")
+            conn.commit()
+        for table, count in sizes.items():
+            started = time.perf_counter()
+            counts[table] = insert_rows(backend, conn, table, GENERATORS[table](rng, count), batch_size)
+            elapsed = time.perf_counter() - started
+            logging.info(f"{table}: {counts[table]} rows in {elapsed:.2f}s")
+    finally:
+        conn.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the hotel database with seeded synthetic data.")
+    parser.add_argument('--scale', type=int, default=10000, help="number of reservations; other tables scale from it")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--sqlite', metavar='PATH', help="write to this SQLite file instead of the configured backend")
+    parser.add_argument('--reset', action='store_true', help="delete existing rows first")
+    for table in GENERATORS:
+        parser.add_argument(f"--{table.lower()}", type=int, metavar='N', help=f"override the {table} row count")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.sqlite:
+        backend = SqliteBackend(args.sqlite)
+    else:
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        backend = backend_from_config(config)
+    prepare_database(backend)
+    sizes = default_sizes(args.scale)
+    for table in GENERATORS:
+        override = getattr(args, table.lower())
+        if override is not None:
+            sizes[table] = override
+    generate(backend, sizes, seed=args.seed, batch_size=args.batch_size, reset=args.reset)
+
+
+if __name__ == '__main__':
+    main()
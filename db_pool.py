@@ -0,0 +1,228 @@
+"""Process-wide database connection pool."""
+import logging
+import threading
+import time
+from collections import deque
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection becomes free before the checkout timeout."""
+
+
+class PooledConnection:
+    """Connection handed out by the pool. close() gives it back instead of hanging up."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def statement_handles(self):
+        """Cursors kept for this physical connection across checkouts, keyed by statement name."""
+        return self._pool.handles_for(self._raw)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Callers that drop a connection without closing it must not leak a pool slot.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool with min/max size, health checks on checkout and idle eviction."""
+
+    def __init__(self, factory, min_size=1, max_size=10, idle_timeout=300,
+                 health_check_interval=30, checkout_timeout=10):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque()  # (connection, last_used) pairs, most recently used on the right
+        self._handles = {}    # id(connection) -> {statement name: cursor}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._counters = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'health_check_failures': 0,
+            'evicted': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def open(self):
+        """Dial min_size connections up front so the first requests skip the handshake."""
+        with self._cond:
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                raw = self._factory()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._counters['created'] += 1
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        """Borrow a connection, dialing a new one only when none are idle and the pool has room."""
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            self._counters['checkouts'] += 1
+        while True:
+            raw, last_used = self._checkout(deadline)
+            if raw is None:
+                try:
+                    raw = self._factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._counters['created'] += 1
+                return PooledConnection(self, raw)
+            if self._is_healthy(raw, last_used):
+                with self._cond:
+                    self._counters['reused'] += 1
+                return PooledConnection(self, raw)
+            with self._cond:
+                self._counters['health_check_failures'] += 1
+            self._discard(raw)
+
+    def _checkout(self, deadline):
+        """Return an idle (connection, last_used) pair, or (None, None) after reserving a slot to dial."""
+        with self._cond:
+            if self._closed:
+                raise PoolExhausted("Connection pool is closed.")
+            waited = False
+            while True:
+                self._evict_idle_locked()
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolExhausted(f"No connection available after {self.checkout_timeout}s (max_size={self.max_size}).")
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+    def _is_healthy(self, raw, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            logging.debug(f"Pooled connection failed health check: {e}")
+            return False
+
+    def release(self, raw):
+        """Return a connection to the pool, rolling back anything left uncommitted."""
+        try:
+            raw.rollback()
+        except Exception as e:
+            logging.debug(f"Discarding pooled connection after failed rollback: {e}")
+            self._discard(raw)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(raw)
+                return
+            self._idle.append((raw, time.monotonic()))
+            self._evict_idle_locked()
+            self._cond.notify()
+
+    def _discard(self, raw):
+        self._close_quietly(raw)
+        with self._cond:
+            self._size -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+
+    def _evict_idle_locked(self):
+        """Close connections idle longer than idle_timeout, never dropping below min_size."""
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        # The oldest connections sit on the left because checkout pops from the right.
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            raw, _ = self._idle.popleft()
+            self._size -= 1
+            self._counters['evicted'] += 1
+            self._close_quietly(raw)
+
+    def evict_idle(self):
+        with self._cond:
+            self._evict_idle_locked()
+
+    def handles_for(self, raw):
+        with self._cond:
+            return self._handles.setdefault(id(raw), {})
+
+    def _close_quietly(self, raw):
+        self._handles.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        """Snapshot of pool occupancy and lifetime counters."""
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'statement_handles': sum(len(handles) for handles in self._handles.values()),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+            return stats
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed as they come back."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                raw, _ = self._idle.popleft()
+                self._size -= 1
+                self._close_quietly(raw)
+            self._cond.notify_all()
@@ -0,0 +1,192 @@
+"""Discount codes held in an in-memory hash index with write-through updates."""
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+from billing import to_decimal
+from statements import COUNT, ROW, SCALAR, declare
+
+MAX_CODE_LENGTH = 50  # Discounts.Code is VARCHAR(50)
+
+LOAD_CODES = declare('discounts.all', "SELECT Code, DiscountPercentage, CreatedAt FROM Discounts")
+GET_CODE = declare('discounts.get', "SELECT DiscountPercentage, CreatedAt FROM Discounts WHERE Code = ?", ('code',), ROW)
+LAST_CODE = declare('discounts.last', "SELECT Code FROM Discounts ORDER BY CreatedAt DESC, Code DESC", shape=SCALAR,
+               limit=1)
+INSERT_CODE = declare('discounts.insert',
+                      "INSERT INTO Discounts (Code, DiscountPercentage, CreatedAt) VALUES (?, ?, ?)",
+                      ('code', 'percentage', 'created_at'), COUNT)
+UPDATE_CODE = declare('discounts.update', "UPDATE Discounts SET DiscountPercentage = ? WHERE Code = ?",
+                 ('percentage', 'code'), COUNT)
+DELETE_CODE = declare('discounts.delete', "DELETE FROM Discounts WHERE Code = ?", ('code',), COUNT)
+
+
+class NegativeFilter:
+    """Bloom-style bit set of codes already confirmed not to exist.
+
+    A miss costs one query the first time and none afterwards, whatever the number of
+    attempts. False positives only ever reject a code created by another terminal since the
+    last refresh, so the filter is cleared on every refresh and whenever a code is added here.
+    """
+
+    def __init__(self, bits=1 << 16, hashes=4, capacity=5000):
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self._array = bytearray(self.bits // 8)
+        self.count = 0
+
+    def _positions(self, code):
+        digest = hashlib.blake2b(code.encode('utf-8'), digest_size=8 * self.hashes).digest()
+        return [int.from_bytes(digest[i * 8:(i + 1) * 8], 'little') % self.bits for i in range(self.hashes)]
+
+    def add(self, code):
+        if self.count >= self.capacity:
+            self.clear()  # keep the false-positive rate bounded
+        for position in self._positions(code):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, code):
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(code))
+
+
+class DiscountService:
+    """Answers code lookups from memory; writes go to the database first, then to the index.
+
+    The whole table is loaded on first use and reloaded every refresh_interval seconds so
+    codes added by other terminals or bulk imports show up.
+    """
+
+    def __init__(self, connection_factory, backend_factory, refresh_interval=300):
+        self._connect = connection_factory
+        self._backend = backend_factory
+        self.refresh_interval = refresh_interval
+        self._codes = None  # code -> (percentage, created_at)
+        self._loaded_at = 0.0
+        self._negative = NegativeFilter()
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.filtered = self.queries = 0
+
+    def _index(self):
+        with self._lock:
+            if self._codes is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+                self._load()
+            return self._codes
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            cursor = LOAD_CODES.execute(conn.cursor(), self._backend())
+            self.queries += 1
+            self._codes = {code: (to_decimal(percentage), created_at)
+                           for code, percentage, created_at in cursor.fetchall()}
+        finally:
+            conn.close()
+        self._loaded_at = time.monotonic()
+        self._negative.clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._codes = None
+            self._negative.clear()
+
+    def lookup(self, code):
+        """DiscountPercentage for code, or None when it does not exist."""
+        if not code or len(code) > MAX_CODE_LENGTH:
+            return None
+        with self._lock:
+            entry = self._index().get(code)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            if code in self._negative:
+                self.filtered += 1
+                return None
+            self.misses += 1
+        # Not in the index: it may have been created elsewhere since the last refresh.
+        conn = self._connect()
+        try:
+            row = GET_CODE.execute(conn.cursor(), self._backend(), code).fetchone()
+        finally:
+            conn.close()
+        with self._lock:
+            self.queries += 1
+            if row is None:
+                self._negative.add(code)
+                return None
+            percentage = to_decimal(row[0])
+            self._index()[code] = (percentage, row[1])
+            return percentage
+
+    def codes(self):
+        """[(Code, DiscountPercentage), ...] oldest first."""
+        with self._lock:
+            items = sorted(self._index().items(), key=lambda item: (item[1][1] is None, item[1][1] or 0, item[0]))
+            return [(code, percentage) for code, (percentage, _) in items]
+
+    def last_code(self):
+        """The most recently created code, read through IX_Discounts_CreatedAt."""
+        conn = self._connect()
+        try:
+            row = LAST_CODE.execute(conn.cursor(), self._backend()).fetchone()
+        finally:
+            conn.close()
+        self.queries += 1
+        return row[0] if row else None
+
+    def add(self, code, percentage):
+        percentage, created_at = to_decimal(percentage), datetime.now()
+        conn = self._connect()
+        try:
+            INSERT_CODE.execute(conn.cursor(), self._backend(), code, percentage, created_at)
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._index()[code] = (percentage, created_at)
+            self._negative.clear()  # the new code may share bits with a rejected one
+
+    def update(self, code, percentage):
+        """Change a code's percentage. Returns False when the code does not exist."""
+        percentage = to_decimal(percentage)
+        conn = self._connect()
+        try:
+            updated = UPDATE_CODE.execute(conn.cursor(), self._backend(), percentage, code).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            index = self._index()
+            if updated:
+                index[code] = (percentage, index.get(code, (None, None))[1])
+            else:
+                index.pop(code, None)
+        return updated > 0
+
+    def delete(self, code):
+        """Remove a code. Returns False when the code did not exist."""
+        conn = self._connect()
+        try:
+            deleted = DELETE_CODE.execute(conn.cursor(), self._backend(), code).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._index().pop(code, None)
+            self._negative.add(code)
+        return deleted > 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'codes': len(self._codes or {}),
+                'hits': self.hits,
+                'misses': self.misses,
+                'filtered': self.filtered,
+                'queries': self.queries,
+                'negative_entries': self._negative.count,
+            }
@@ -0,0 +1,99 @@
+"""Structured operational events written as JSON lines by a background thread.
+
+Callers only put a record on a queue, so a slow disk never holds up a front-desk transaction.
+Terminal output keeps going through the root logger; events go to a separate rotating file.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime
+
+EVENT_LOGGER = 'hotel.events'
+
+_logger = logging.getLogger(EVENT_LOGGER)
+_logger.propagate = False  # keep events off the terminal
+_listener = None
+_error_handler = None
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, event name and its fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event': getattr(record, 'event', 'log'),
+            'thread': record.threadName,
+        }
+        if entry['event'] == 'log':
+            entry['message'] = record.getMessage()
+            entry['logger'] = record.name
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, default=str)
+
+
+class _ErrorQueueHandler(logging.handlers.QueueHandler):
+    """Queues a copy of each application error logged through the root logger as an 'error' event."""
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.event = 'error'
+        record.fields = {'message': record.getMessage(), 'logger': record.name}
+        return record
+
+
+def start(path, max_bytes=10 * 1024 * 1024, backup_count=5, capture_errors=True):
+    """Start the background writer. Events emitted before start() are dropped."""
+    global _listener, _error_handler
+    if _listener is not None:
+        return _listener
+    records = queue.SimpleQueue()
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+    file_handler.setFormatter(JsonLineFormatter())
+    _listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=False)
+    _listener.start()
+    _logger.addHandler(logging.handlers.QueueHandler(records))
+    _logger.setLevel(logging.INFO)
+    if capture_errors:
+        # Errors still print on the terminal; a copy goes to the event file as well.
+        _error_handler = _ErrorQueueHandler(records)
+        _error_handler.setLevel(logging.ERROR)
+        logging.getLogger().addHandler(_error_handler)
+    atexit.register(stop)
+    return _listener
+
+
+def stop():
+    """Flush queued events and stop the background writer."""
+    global _listener, _error_handler
+    if _listener is None:
+        return
+    for handler in list(_logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            _logger.removeHandler(handler)
+    if _error_handler is not None:
+        logging.getLogger().removeHandler(_error_handler)
+        _error_handler = None
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def emit(event, level=logging.INFO, **fields):
+    """Record an operational event such as emit('reservation.added', room='1203', reservation_id=42)."""
+    if _listener is not None:
+        _logger.log(level, event, extra={'event': event, 'fields': fields})
+
+
+def start_from_config(config, section='events'):
+    """Start the writer as configured in [events]; enabled by default."""
+    if not config.getboolean(section, 'enabled', fallback=True):
+        return None
+    return start(config.get(section, 'path', fallback='hotel_events.jsonl'),
+                 max_bytes=config.getint(section, 'max_bytes', fallback=10 * 1024 * 1024),
+                 backup_count=config.getint(section, 'backup_count', fallback=5))
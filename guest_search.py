@@ -0,0 +1,156 @@
+"""In-memory guest name index with case/accent folding, prefix and typo-tolerant matching."""
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+GuestMatch = namedtuple('GuestMatch', 'reservation_id room_number last_name first_name distance')
+
+EXACT, PREFIX = 0, 1  # distance reported for exact and prefix matches; typos report 1 + edits
+
+
+def fold(text):
+    """'  Müller-O'Brien ' -> 'mullerobrien': accents, case, spaces and punctuation removed."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if ch.isalnum()).casefold()
+
+
+def _trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_edits(name):
+    return 0 if len(name) < 3 else 1 if len(name) <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps count once), or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = ca != cb
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class GuestIndex:
+    """Active reservations by folded last name.
+
+    A sorted list of distinct names answers prefix queries with one bisect; a trigram
+    index narrows typo matching to names sharing enough trigrams with the query before
+    any edit distance is computed. Writes update all three structures in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._guests = {}    # reservation_id -> (room_number, last_name, first_name, folded)
+        self._by_name = {}   # folded last name -> sorted [(room_number, reservation_id)]
+        self._names = []     # sorted folded last names
+        self._grams = {}     # trigram -> {folded last name}
+
+    def load(self, rows):
+        """Bulk-load (ReservationID, RoomNumber, LastName, FirstName) rows."""
+        with self._lock:
+            for reservation_id, room_number, last_name, first_name in rows:
+                self.add(reservation_id, room_number, last_name, first_name)
+
+    def add(self, reservation_id, room_number, last_name, first_name):
+        with self._lock:
+            if reservation_id in self._guests:
+                self.remove(reservation_id)
+            name = fold(last_name)
+            self._guests[reservation_id] = (room_number, last_name, first_name, name)
+            holders = self._by_name.get(name)
+            if holders is None:
+                holders = self._by_name[name] = []
+                insort(self._names, name)
+                for gram in _trigrams(name):
+                    self._grams.setdefault(gram, set()).add(name)
+            insort(holders, (room_number, reservation_id))
+
+    update = add
+
+    def remove(self, reservation_id):
+        with self._lock:
+            entry = self._guests.pop(reservation_id, None)
+            if entry is None:
+                return
+            room_number, _, _, name = entry
+            holders = self._by_name[name]
+            del holders[bisect_left(holders, (room_number, reservation_id))]
+            if holders:
+                return
+            del self._by_name[name]
+            del self._names[bisect_left(self._names, name)]
+            for gram in _trigrams(name):
+                names = self._grams[gram]
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+
+    def __len__(self):
+        return len(self._guests)
+
+    def _matches(self, name, distance, limit=None):
+        for room_number, reservation_id in self._by_name[name][:limit]:
+            _, last_name, first_name, _ = self._guests[reservation_id]
+            yield GuestMatch(reservation_id, room_number, last_name, first_name, distance)
+
+    def exact(self, last_name):
+        """Reservations whose last name folds to the same text."""
+        with self._lock:
+            name = fold(last_name)
+            if name not in self._by_name:
+                return []
+            return list(self._matches(name, EXACT))
+
+    def search(self, query, limit=10):
+        """Ranked matches: exact name, then names starting with the query, then names within a few typos."""
+        query = fold(query)
+        if not query:
+            return []
+        with self._lock:
+            ranked = {}
+            if query in self._by_name:
+                ranked[query] = EXACT
+            position = bisect_left(self._names, query)
+            while position < len(self._names) and len(ranked) < limit and self._names[position].startswith(query):
+                ranked.setdefault(self._names[position], PREFIX)
+                position += 1
+            if query not in self._by_name:
+                ranked.update((name, PREFIX + edits) for name, edits in self._near(query) if name not in ranked)
+            matches = []
+            for name in sorted(ranked, key=lambda name: (ranked[name], name)):
+                matches.extend(self._matches(name, ranked[name], limit - len(matches)))
+                if len(matches) >= limit:
+                    break
+            return matches
+
+    def _near(self, query):
+        limit = _max_edits(query)
+        if not limit:
+            return []
+        grams = _trigrams(query)
+        # One edit changes at most four trigrams (an adjacent swap touches four), so closer
+        # names share at least this many.
+        needed = max(1, len(grams) - 4 * limit)
+        shared = {}
+        for gram in grams:
+            for name in self._grams.get(gram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        near = []
+        for name, count in shared.items():
+            if count >= needed:
+                edits = edit_distance(query, name, limit)
+                if edits <= limit:
+                    near.append((name, edits))
+        return near
@@ -0,0 +1,320 @@
+"""Stock for room-service orders: atomic conditional decrements and low-stock alerts on threshold crossings."""
+import argparse
+import configparser
+import logging
+import os
+import threading
+import time
+
+import events
+from statements import COUNT, declare
+from storage import SqliteBackend, backend_from_config
+
+DEFAULT_LOW_STOCK_THRESHOLD = 5
+
+
+class OutOfStock(ValueError):
+    """Not enough stock for one or more order lines; the order must be rolled back."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages  # [(inventory_id, name, requested, available)]
+        super().__init__("Not enough stock: " + ", ".join(
+            f"{name or f'inventory item {inventory_id}'} ({requested} requested, {available or 0} left)"
+            for inventory_id, name, requested, available in shortages))
+
+
+def _decrement_sql(count):
+    units = "CASE ItemID " + " ".join(["WHEN ? THEN ?"] * count) + " END"
+    return (f"UPDATE Inventory SET Quantity = Quantity - {units} "
+            f"WHERE ItemID IN ({', '.join('?' * count)}) AND Quantity >= {units}")
+
+
+# One UPDATE taking count (InventoryID, units) pairs off stock, each only where enough is left.
+# Parameters are the pairs flattened, the IDs, then the pairs again. The statement returns
+# (ItemID, Quantity) for every row it decremented; a row without enough stock is left alone
+# and simply missing from the result.
+DECREMENT = declare('inventory.decrement', _decrement_sql, ('pairs', 'inventory_ids', 'pairs'),
+                    returning='ItemID, Quantity')
+LEVELS = declare('inventory.levels', lambda count: "SELECT ItemID, Name, Quantity FROM Inventory "
+                 f"WHERE ItemID IN ({', '.join('?' * count)})", ('inventory_ids',))
+SOURCES = declare('inventory.sources', "SELECT ItemID, InventoryID FROM Items WHERE InventoryID IS NOT NULL")
+THRESHOLDS = declare('inventory.thresholds', "SELECT ItemID, Name, Quantity, LowStockThreshold FROM Inventory")
+STATUS = declare('inventory.status',
+                 "SELECT ItemID, Name, Quantity, LowStockThreshold, Location FROM Inventory ORDER BY ItemID")
+RESTOCK = declare('inventory.restock',
+                  "UPDATE Inventory SET Quantity = Quantity + ? WHERE ItemID = ? AND Quantity + ? >= 0",
+                  ('quantity', 'inventory_id', 'quantity'), COUNT)
+SET_THRESHOLD = declare('inventory.set_threshold', "UPDATE Inventory SET LowStockThreshold = ? WHERE ItemID = ?",
+                        ('threshold', 'inventory_id'), COUNT)
+LINK_ITEM = declare('inventory.link_item', "UPDATE Items SET InventoryID = ? WHERE ItemID = ?",
+                    ('inventory_id', 'item_id'), COUNT)
+
+
+class StockWatermarks:
+    """Last known quantity of each inventory item and which ones are at or below their threshold.
+
+    update() reports an item only when it crosses its threshold on the way down, so staff get
+    one alert per dip instead of one per order; going back above the threshold re-arms it.
+    """
+
+    def __init__(self, default_threshold=DEFAULT_LOW_STOCK_THRESHOLD):
+        self.default_threshold = default_threshold
+        self._items = {}  # inventory_id -> [name, threshold, quantity]
+        self._low = set()
+
+    def track(self, inventory_id, name, quantity, threshold=None):
+        """Start watching an item. One that is already low counts as alerted."""
+        threshold = self.default_threshold if threshold is None else threshold
+        self._items[inventory_id] = [name, threshold, quantity]
+        if quantity <= threshold:
+            self._low.add(inventory_id)
+        else:
+            self._low.discard(inventory_id)
+
+    def update(self, inventory_id, quantity):
+        """Record a new quantity. Returns (name, quantity, threshold) if the item just went low, else None."""
+        item = self._items.get(inventory_id)
+        if item is None:
+            return None
+        item[2] = quantity
+        name, threshold, _ = item
+        if quantity > threshold:
+            self._low.discard(inventory_id)
+            return None
+        if inventory_id in self._low:
+            return None
+        self._low.add(inventory_id)
+        return name, quantity, threshold
+
+    def low(self):
+        """[(inventory_id, name, quantity, threshold), ...] for the items at or below their threshold."""
+        low = []
+        for inventory_id in sorted(self._low):
+            name, threshold, quantity = self._items[inventory_id]
+            low.append((inventory_id, name, quantity, threshold))
+        return low
+
+    def __len__(self):
+        return len(self._items)
+
+
+class InventoryService:
+    """Takes order lines off stock in one atomic statement and alerts staff when an item runs low.
+
+    Each menu item draws one unit per item ordered from the Inventory row named by its
+    Items.InventoryID; items without one (services, say) are not stock-tracked. The item
+    mapping and the watermarks are loaded on first use and every refresh_interval seconds.
+    alert is called with a message for each item that crosses its low-stock threshold.
+    """
+
+    def __init__(self, connection_factory, backend_factory, alert=None,
+                 default_threshold=DEFAULT_LOW_STOCK_THRESHOLD, refresh_interval=300):
+        self._connect = connection_factory
+        self._backend = backend_factory
+        self.alert = alert
+        self.default_threshold = default_threshold
+        self.refresh_interval = refresh_interval
+        self._sources = None  # menu ItemID -> InventoryID
+        self._watermarks = None
+        self._loaded_at = 0.0
+        self._lock = threading.RLock()
+        self.decrements = self.shortages = self.alerts = 0
+
+    def _state(self):
+        with self._lock:
+            if self._sources is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+                self.rebuild()
+            return self._sources
+
+    def rebuild(self):
+        """Reload the item mapping and the stock levels."""
+        watermarks = StockWatermarks(self.default_threshold)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            backend = self._backend()
+            sources = dict(SOURCES.execute(cursor, backend).fetchall())
+            for inventory_id, name, quantity, threshold in THRESHOLDS.execute(cursor, backend).fetchall():
+                watermarks.track(inventory_id, name, quantity, threshold)
+        finally:
+            conn.close()
+        with self._lock:
+            self._sources, self._watermarks = sources, watermarks
+            self._loaded_at = time.monotonic()
+        return len(sources)
+
+    def invalidate(self):
+        with self._lock:
+            self._sources = self._watermarks = None
+
+    def requirements(self, lines):
+        """{inventory_id: units} needed for (menu_item_id, quantity) lines; untracked items are left out."""
+        sources = self._state()
+        needs = {}
+        for item_id, quantity in lines:
+            inventory_id = sources.get(item_id)
+            if inventory_id is not None:
+                needs[inventory_id] = needs.get(inventory_id, 0) + quantity
+        return needs
+
+    def reserve(self, cursor, needs):
+        """Decrement every {inventory_id: units} need with one conditional UPDATE on the caller's transaction.
+
+        Returns {inventory_id: quantity_left}. Raises OutOfStock when any item is short, in which
+        case the caller must roll back: the items that did have enough were already decremented.
+        """
+        if not needs:
+            return {}
+        pairs = sorted(needs.items())  # same row order for every order, so concurrent orders do not deadlock
+        flat = [value for pair in pairs for value in pair]
+        ids = [inventory_id for inventory_id, _ in pairs]
+        DECREMENT.execute(cursor, self._backend(), *(flat + ids + flat), count=len(pairs))
+        left = dict(cursor.fetchall())
+        if len(left) < len(pairs):
+            short = [inventory_id for inventory_id in ids if inventory_id not in left]
+            found = self._levels(cursor, short)
+            shortages = []
+            for inventory_id in short:
+                name, quantity = found.get(inventory_id, (None, None))
+                shortages.append((inventory_id, name, needs[inventory_id], quantity))
+            with self._lock:
+                self.shortages += 1
+            raise OutOfStock(shortages)
+        with self._lock:
+            self.decrements += 1
+        return left
+
+    def _levels(self, cursor, ids):
+        LEVELS.execute(cursor, self._backend(), *ids, count=len(ids))
+        return {inventory_id: (name, quantity) for inventory_id, name, quantity in cursor.fetchall()}
+
+    def check(self, needs):
+        """Raise OutOfStock if any {inventory_id: units} need is more than is on hand right now.
+
+        Takes nothing off stock and holds no locks, so another order can still get there first;
+        reserve() stays the real guard. Use it to turn a guest away before taking payment.
+        """
+        if not needs:
+            return
+        ids = sorted(needs)
+        conn = self._connect()
+        try:
+            found = self._levels(conn.cursor(), ids)
+        finally:
+            conn.rollback()
+            conn.close()
+        shortages = []
+        for inventory_id in ids:
+            name, quantity = found.get(inventory_id, (None, None))
+            if (quantity or 0) < needs[inventory_id]:
+                shortages.append((inventory_id, name, needs[inventory_id], quantity))
+        if shortages:
+            raise OutOfStock(shortages)
+
+    def decrement(self, lines):
+        """Take (menu_item_id, quantity) lines off stock in a transaction of their own. Returns {inventory_id: left}."""
+        needs = self.requirements(lines)
+        if not needs:
+            return {}
+        conn = self._connect()
+        try:
+            left = self.reserve(conn.cursor(), needs)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self.observe(left)
+        return left
+
+    def observe(self, quantities):
+        """Feed committed {inventory_id: quantity} levels to the watermarks and alert for items that just went low."""
+        crossed = []
+        with self._lock:
+            if self._watermarks is None:
+                return
+            for inventory_id, quantity in quantities.items():
+                hit = self._watermarks.update(inventory_id, quantity)
+                if hit is not None:
+                    crossed.append((inventory_id, *hit))
+            self.alerts += len(crossed)
+        for inventory_id, name, quantity, threshold in crossed:
+            message = f"Low stock: {name} is down to {quantity} (threshold {threshold})."
+            events.emit('inventory.low_stock', inventory_id=inventory_id, name=name, quantity=quantity,
+                        threshold=threshold)
+            if self.alert is not None:
+                self.alert(message)
+            else:
+                logging.warning(message)
+
+    def low_stock(self):
+        with self._lock:
+            self._state()
+            return self._watermarks.low()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked_items': len(self._sources or {}),
+                'inventory_items': len(self._watermarks or ()),
+                'low': len(self._watermarks.low()) if self._watermarks is not None else 0,
+                'decrements': self.decrements,
+                'shortages': self.shortages,
+                'alerts': self.alerts,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show stock levels, restock, and link menu items to inventory.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="every inventory item, low ones marked")
+    restock = commands.add_parser('restock', help="add units to an item without overwriting concurrent orders")
+    restock.add_argument('inventory_id', type=int)
+    restock.add_argument('quantity', type=int)
+    threshold = commands.add_parser('threshold', help="set an item's low-stock threshold")
+    threshold.add_argument('inventory_id', type=int)
+    threshold.add_argument('threshold', type=int)
+    link = commands.add_parser('link', help="make a menu item draw one unit of an inventory item per order")
+    link.add_argument('item_id', type=int)
+    link.add_argument('inventory_id', type=int, nargs='?', help="omit to stop tracking the menu item")
+    for command in commands.choices.values():
+        command.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+        command.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+    default_threshold = config.getint('inventory', 'low_stock_threshold', fallback=DEFAULT_LOW_STOCK_THRESHOLD)
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        if args.command == 'status':
+            rows = STATUS.execute(cursor, backend).fetchall()
+            for inventory_id, name, quantity, low_threshold, location in rows:
+                low_threshold = default_threshold if low_threshold is None else low_threshold
+                flag = "  LOW" if quantity <= low_threshold else ""
+                print(f"{inventory_id}. {name}: {quantity} (threshold {low_threshold}) {location or ''}{flag}")
+            if not rows:
+                print("No inventory items.")
+            return 0
+        if args.command == 'restock':
+            changed = RESTOCK.execute(cursor, backend, args.quantity, args.inventory_id, args.quantity).rowcount
+        elif args.command == 'threshold':
+            changed = SET_THRESHOLD.execute(cursor, backend, args.threshold, args.inventory_id).rowcount
+        else:
+            changed = LINK_ITEM.execute(cursor, backend, args.inventory_id, args.item_id).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if not changed:
+        logging.error("Error: no such item, or the restock would leave a negative quantity.")
+        return 1
+    logging.info("Done. Running terminals pick the change up within [inventory] refresh_interval seconds.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,179 @@
+"""Login failure counters and lockout deadlines kept in memory and flushed to Users on change."""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from statements import COUNT, declare
+
+SAVE_STATE = declare('lockout.save', "UPDATE Users SET FailedAttempts = ?, LockoutTime = ? WHERE Username = ?",
+                     ('failed_attempts', 'lockout_time', 'username'), COUNT)
+
+
+class _State:
+    __slots__ = ('failed_attempts', 'lockout_until', 'dirty', 'touched', 'synced_attempts', 'synced_lockout')
+
+    def __init__(self, failed_attempts, lockout_until):
+        self.failed_attempts = failed_attempts or 0
+        self.lockout_until = lockout_until
+        self.dirty = False
+        self.touched = time.monotonic()
+        # What the Users row held when last read or written.
+        self.synced_attempts = self.failed_attempts
+        self.synced_lockout = lockout_until
+
+
+class LockoutTracker:
+    """Per-user lockout state in front of Users.FailedAttempts and Users.LockoutTime.
+
+    A successful login by a user with nothing to reset, here or in the Users row, costs no
+    write at all. Failures, lockouts and unlocks are written immediately so every terminal
+    counts toward the same threshold; the resets done when a lockout runs out are batched by
+    flush(). Every Users read is merged in with seed(), so failures and lockouts recorded by
+    another terminal apply here at once. Entries idle for ttl seconds are flushed and dropped.
+    """
+
+    def __init__(self, connection_factory, backend_factory, threshold=3, duration_minutes=5, ttl=900):
+        self._connect = connection_factory
+        self._backend = backend_factory
+        self.threshold = threshold
+        self.duration = timedelta(minutes=duration_minutes)
+        self.ttl = ttl
+        self._states = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher = None
+        self.writes = 0
+        self.skipped_writes = 0
+
+    def seed(self, username, failed_attempts, lockout_time, now=None):
+        """Merge the values just read from Users into the cached state and return the failure count.
+
+        Failures added to the row since it was last seen are added to ours, and a lockout still
+        running in the row applies here even if this process never saw it happen.
+        """
+        now = now or datetime.now()
+        failed_attempts = failed_attempts or 0
+        with self._lock:
+            state = self._states.get(username)
+            if state is None:
+                state = self._states[username] = _State(failed_attempts, lockout_time)
+            else:
+                # Our unwritten changes (e.g. a reset) on top of the row as it is now.
+                state.failed_attempts = max(0, failed_attempts + state.failed_attempts - state.synced_attempts)
+                if lockout_time is not None and lockout_time > now and (
+                        state.lockout_until is None or lockout_time > state.lockout_until):
+                    state.lockout_until = lockout_time
+                state.synced_attempts = failed_attempts
+                state.synced_lockout = lockout_time
+            state.touched = time.monotonic()
+            return state.failed_attempts
+
+    def locked_until(self, username, now=None):
+        """The lockout deadline if the user is locked out right now, else None."""
+        now = now or datetime.now()
+        with self._lock:
+            state = self._states.get(username)
+            if state is None or state.lockout_until is None:
+                return None
+            if state.lockout_until > now:
+                return state.lockout_until
+            # The lockout has run out: start counting from zero again.
+            state.failed_attempts = 0
+            state.lockout_until = None
+            state.dirty = True
+            return None
+
+    def record_success(self, username):
+        with self._lock:
+            state = self._states.setdefault(username, _State(0, None))
+            state.touched = time.monotonic()
+            if (state.failed_attempts == 0 and state.lockout_until is None and not state.dirty
+                    and state.synced_attempts == 0 and state.synced_lockout is None):
+                self.skipped_writes += 1
+                return
+            state.failed_attempts = 0
+            state.lockout_until = None
+            state.dirty = True
+            self._write([(username, state)])
+
+    def record_failure(self, username, now=None):
+        """Count a failed attempt. Returns (attempts, lockout_until or None)."""
+        now = now or datetime.now()
+        with self._lock:
+            state = self._states.setdefault(username, _State(0, None))
+            state.touched = time.monotonic()
+            state.failed_attempts += 1
+            state.dirty = True
+            if state.failed_attempts >= self.threshold:
+                state.lockout_until = now + self.duration
+            self._write([(username, state)])
+            return state.failed_attempts, state.lockout_until
+
+    def unlock(self, username):
+        with self._lock:
+            state = self._states.setdefault(username, _State(0, None))
+            state.failed_attempts = 0
+            state.lockout_until = None
+            state.dirty = True
+            self._write([(username, state)])
+
+    def flush(self):
+        """Write every changed entry in one batch and drop entries idle for longer than ttl."""
+        with self._lock:
+            written = self._write([(username, state) for username, state in self._states.items() if state.dirty])
+            cutoff = time.monotonic() - self.ttl
+            for username in [username for username, state in self._states.items() if state.touched < cutoff]:
+                del self._states[username]
+            return written
+
+    def _write(self, entries):
+        if not entries:
+            return 0
+        conn = self._connect()
+        try:
+            SAVE_STATE.executemany(conn.cursor(), self._backend(),
+                                   [(state.failed_attempts, state.lockout_until, username) for username, state in entries])
+            conn.commit()
+        finally:
+            conn.close()
+        for _, state in entries:
+            state.dirty = False
+            state.synced_attempts = state.failed_attempts
+            state.synced_lockout = state.lockout_until
+        self.writes += 1
+        return len(entries)
+
+    def start(self, interval=30):
+        """Flush every interval seconds on a daemon thread."""
+        if self._flusher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    # Dirty entries stay dirty and are retried on the next tick.
+                    logging.error(f"Error flushing lockout state: {e}")
+
+        self._stop.clear()
+        self._flusher = threading.Thread(target=loop, name='lockout-flush', daemon=True)
+        self._flusher.start()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still pending."""
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+        return self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached_users': len(self._states),
+                'pending': sum(1 for state in self._states.values() if state.dirty),
+                'writes': self.writes,
+                'skipped_writes': self.skipped_writes,
+            }
@@ -1,30 +1,52 @@
-from decimal import Decimal
 # Imports and Configuration
 import logging
 import os
 import sys
-import time
-import pyodbc
 import random
 import string
 import getpass
-from datetime import datetime, timedelta
+from datetime import datetime
 import configparser
 import ipaddress
+import threading
+from db_pool import ConnectionPool
+from pricing import PricingEngine
+from catalog_cache import CatalogCache
+from storage import backend_from_config
+from availability import AvailabilityIndex, room_numbers
+from pacing import Pacer
+from orders import OrderCart, OrderStore
+from inventory import DEFAULT_LOW_STOCK_THRESHOLD, InventoryService, OutOfStock
+import events
+from metrics import ErrorCounter, MetricsRegistry, format_snapshot
+from lockout import LockoutTracker
+from discounts import DiscountService
+from valet import ValetConflict, ValetService, parse_layout
+from guest_search import EXACT, GuestIndex
+from statements import StatementRunner, format_stats, page_statement_name
+from billing import Folio, money, percent_of, to_decimal
 
 # Database connection settings
 config = configparser.ConfigParser()
 config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
 config.read(config_path)
 
-server = config.get('database', 'server', fallback='' )
-database = config.get('database', 'database', fallback='')
-username = config.get('database', 'username', fallback='')
-password = config.get('database', 'password', fallback='')
 HOTEL_NAME = config.get('hotel', 'name', fallback='')
-TAX_RATE = config.getfloat('hotel', 'tax', fallback=0)
+TAX_RATE = to_decimal(config.get('hotel', 'tax', fallback='0').strip() or 0)
 LOCKOUT_THRESHOLD = config.getint('hotel', 'lockout_threshold', fallback=3)
 LOCKOUT_DURATION = config.getint('hotel', 'lockout_duration', fallback=5)
+POOL_MIN_SIZE = config.getint('pool', 'min_size', fallback=1)
+POOL_MAX_SIZE = config.getint('pool', 'max_size', fallback=10)
+POOL_IDLE_TIMEOUT = config.getint('pool', 'idle_timeout', fallback=300)
+POOL_HEALTH_CHECK_INTERVAL = config.getint('pool', 'health_check_interval', fallback=30)
+POOL_CHECKOUT_TIMEOUT = config.getint('pool', 'checkout_timeout', fallback=10)
+CATALOG_CACHE_TTL = config.getint('cache', 'ttl', fallback=60)
+CATALOG_CACHE_MAX_ENTRIES = config.getint('cache', 'max_entries', fallback=1024)
+RESERVATION_PAGE_SIZE = config.getint('reservations', 'page_size', fallback=25)
+HOTEL_FLOORS = config.getint('availability', 'floors', fallback=0)
+ROOMS_PER_FLOOR = config.getint('availability', 'rooms_per_floor', fallback=0)
+LOW_STOCK_THRESHOLD = config.getint('inventory', 'low_stock_threshold', fallback=DEFAULT_LOW_STOCK_THRESHOLD)
+LOW_STOCK_ALERT_ROLE = config.get('inventory', 'alert_role', fallback='Management')
 # Set up logging
 #logging.basicConfig(filename='hotel_management.log', level=logging.DEBUG, format='%(asctime)s:%(levelname)s:%(message)s')
 class CustomFormatter(logging.Formatter):
@@ -46,50 +68,136 @@ for handler in logger.handlers:
 ## =========================
 # Database Connection & Utilities
 ## =========================
+_backend = None
+_pool = None
+_pool_lock = threading.Lock()
+_availability = None
+_availability_lock = threading.Lock()
+_guest_index = None
+# Latency, DB round trips, rows and errors per operation; cheap enough to leave on.
+metrics_registry = MetricsRegistry(enabled=config.getboolean('metrics', 'enabled', fallback=True))
+METRICS_PATH = config.get('metrics', 'prometheus_path', fallback='hotel_metrics.prom')
+METRICS_INTERVAL = config.getint('metrics', 'write_interval', fallback=15)
+logging.getLogger().addHandler(ErrorCounter(metrics_registry))
+
+def get_backend():
+    """Return the storage backend selected in config.ini."""
+    global _backend
+    if _backend is None:
+        _backend = backend_from_config(config)
+    return _backend
+
+def set_backend(backend):
+    """Switch to another storage backend, e.g. SQLite for local runs and benchmarks."""
+    global _backend, _availability, _guest_index
+    close_pool()
+    _backend = backend
+    _availability = None
+    _guest_index = None
+    catalog_cache.invalidate()
+    discounts.invalidate()
+    valet.invalidate()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(
+                get_backend().connect,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                idle_timeout=POOL_IDLE_TIMEOUT,
+                health_check_interval=POOL_HEALTH_CHECK_INTERVAL,
+                checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+            )
+            pool.open()
+            _pool = pool
+        return _pool
+
+def close_pool():
+    """Log pool statistics and close every idle connection."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            logging.debug(f"Connection pool stats: {_pool.stats()}")
+            _pool.close()
+            _pool = None
+
 def create_connection():
+    """Borrow a connection from the pool. Calling close() on it returns it to the pool."""
     try:
-        connection_string = (
-            'DRIVER={ODBC Driver 17 for SQL Server};'
-            'SERVER=' + server + ';'
-            'DATABASE=' + database + ';'
-            'UID=' + username + ';'
-            'PWD=' + password
-        )
-        connection = pyodbc.connect(connection_string)
+        connection = get_pool().acquire()
         logging.debug("Connection successful!")
-        return connection
+        return metrics_registry.track(connection)
     except Exception as e:
         logging.info("Connection Failed.")
         logging.error(f"{e}")
         logging.info("Exiting program.")
         sys.exit(1)
 
+statements = StatementRunner(get_backend)
+
+def run_statement(name, *params, limit=None):
+    """Run one catalog statement on a connection of its own, committing it if it writes."""
+    conn = create_connection()
+    try:
+        result = statements.run(conn, name, *params, limit=limit)
+        if statements.catalog[name].writes:
+            conn.commit()
+        return result
+    finally:
+        conn.close()
+
+catalog_cache = CatalogCache(ttl=CATALOG_CACHE_TTL, max_entries=CATALOG_CACHE_MAX_ENTRIES)
+pricing_engine = PricingEngine(create_connection, get_backend, cache=catalog_cache,
+                               occupancy=lambda: current_occupancy())
+# Simulated kiosk delays; set [pacing] mode = off for scripted and batch runs.
+pacer = Pacer.from_config(config)
+inventory = InventoryService(create_connection, get_backend,
+                             alert=lambda message: notify_staff(LOW_STOCK_ALERT_ROLE, message),
+                             default_threshold=LOW_STOCK_THRESHOLD,
+                             refresh_interval=config.getint('inventory', 'refresh_interval', fallback=300))
+order_store = OrderStore(create_connection, get_backend, inventory=inventory)
+lockouts = LockoutTracker(create_connection, get_backend, LOCKOUT_THRESHOLD, LOCKOUT_DURATION,
+                          ttl=config.getint('hotel', 'lockout_cache_ttl', fallback=900))
+LOCKOUT_FLUSH_INTERVAL = config.getint('hotel', 'lockout_flush_interval', fallback=30)
+discounts = DiscountService(create_connection, get_backend,
+                            refresh_interval=config.getint('discounts', 'refresh_interval', fallback=300))
+valet = ValetService(create_connection, get_backend,
+                     parse_layout(config.get('valet', 'zones', fallback='A:120, B:120, C:120, D:120')),
+                     refresh_interval=config.getint('valet', 'refresh_interval', fallback=60))
+metrics_registry.register_gauge('hotel_pool_connections', "Database connections by state.",
+                                lambda: {k: v for k, v in _pool.stats().items() if k in ('size', 'idle', 'in_use')} if _pool else {})
+metrics_registry.register_gauge('hotel_catalog_cache_hit_ratio', "Item catalog cache hit ratio.",
+                                lambda: catalog_cache.stats()['hit_ratio'])
+metrics_registry.register_gauge('hotel_pacing_wait_seconds', "Seconds spent in simulated delays this session.",
+                                lambda: pacer.stats()['waited_seconds'])
+metrics_registry.register_gauge('hotel_discount_lookups', "Discount code lookups by outcome.",
+                                lambda: {k: v for k, v in discounts.stats().items() if k in ('hits', 'misses', 'filtered')})
+metrics_registry.register_gauge('hotel_inventory_low_items', "Inventory items at or below their low-stock threshold.",
+                                lambda: inventory.stats()['low'])
+metrics_registry.register_gauge('hotel_valet_free_spots', "Free valet parking spots by zone.",
+                                lambda: valet.stats()['free'])
+
 def generate_code():
     """Generate a random 5-character alphanumeric code."""
     return ''.join(random.choices(string.ascii_letters + string.digits, k=5))
 
+@metrics_registry.instrument()
 def display_items():
-
-    conn = create_connection()
-    if conn is None:
-        return
+    """Show the priced menu and return it as {item_id: (name, price)}."""
+    menu = {}
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT ItemID, Name FROM Items")  # Select only needed columns
-        rows = cursor.fetchall()
-        logging.info("Service/Item Price")
-        for row in rows:
-            item_id = row[0]  # Assuming ItemID is the first column
-            name = row[1]    # Assuming Name is the second column
-            price = get_dynamic_price(item_id)  # Get the price dynamically
-            if price is not None:
-                logging.info(f"{item_id}. {name} ${price:.2f}")  # Format price to 2 decimal places
-            else:
-                SystemExit("Item not found or price could not be retrieved.")
+        rows = pricing_engine.menu()  # every item priced through the compiled rules in one pass
+        lines = ["Service/Item Price"]
+        for item_id, name, price in rows:
+            menu[item_id] = (name, price)
+            lines.append(f"{item_id}. {name} ${price:.2f}")  # Format price to 2 decimal places
+        logging.info("\n".join(lines))
     except Exception as e:
         logging.error(f"Error displaying items: {e}")
-    finally:
-        conn.close()
+    return menu
 '''def get_item_choice():
     while True:
         try:
@@ -135,33 +243,40 @@ def get_another_item():
         else:
             logging.info("Invalid input. Please enter 'Yes' or 'No'.")
 
+@metrics_registry.instrument()
+def find_reservations_by_last_name(last_name):
+    """Return GuestMatch entries for every active reservation under a last name, ignoring case and accents."""
+    return get_guest_index().exact(last_name)
+
+@metrics_registry.instrument()
+def search_guests(query, limit=10):
+    """Return ranked GuestMatch entries: exact last name, then prefix, then close misspellings."""
+    return get_guest_index().search(query, limit)
+
 def validate_room():
     while True:
         try:
             last_name = input("Please enter your last name: ").strip()
             room_number = input("Please enter your room number (floor + 3-digit code): ").strip()
 
-            conn = create_connection()
-            if conn is None:
-                return None, None
-            cursor = conn.cursor()
-            cursor.execute("SELECT RoomNumber, FirstName FROM Reservations WHERE LastName = ?", (last_name,))
-            reservations = cursor.fetchall()
-            ()
+            reservations = find_reservations_by_last_name(last_name) or search_guests(last_name)
 
             if reservations:
-                logging.info("Available reservations with the same last name:")
+                if reservations[0].distance == EXACT:
+                    logging.info("Available reservations with the same last name:")
+                else:
+                    logging.info(f"No reservations under '{last_name}'. Did you mean:")
                 for idx, reservation in enumerate(reservations, 1):
-                    logging.info(f"{idx}. Room Number: {reservation.RoomNumber}, First Name: {reservation.FirstName}")
+                    logging.info(f"{idx}. Room Number: {reservation.room_number}, Last Name: {reservation.last_name}, First Name: {reservation.first_name}")
 
                 try:
                     choice = int(input("Please select the reservation number: "))
                     if 1 <= choice <= len(reservations):
                         selected_reservation = reservations[choice - 1]
-                        if selected_reservation.RoomNumber == room_number:
+                        if selected_reservation.room_number == room_number:
                             logging.info("Please wait while we validate your room number and last name.")
-                            time.sleep(2)  # Simulate a delay for validation
-                            return room_number, selected_reservation.FirstName
+                            pacer.pause('validate_room')
+                            return room_number, selected_reservation.first_name
                         else:
                             logging.info("Room number does not match the selected reservation. Please try again.")
                     else:
@@ -172,103 +287,214 @@ def validate_room():
                 logging.info("No reservations found with that last name. Please try again.")
         except Exception as e:
             logging.error(f"Error validating room: {e}")
-        finally:
-            conn.close()
 
 
+def get_availability():
+    """Return the room availability index, loading it from active reservations on first use."""
+    global _availability
+    with _availability_lock:
+        if _availability is None:
+            index = AvailabilityIndex(room_numbers(HOTEL_FLOORS, ROOMS_PER_FLOOR))
+            conn = create_connection()
+            try:
+                cursor = statements.run(conn, 'reservations.active_stays')
+                while True:
+                    rows = cursor.fetchmany(5000)
+                    if not rows:
+                        break
+                    index.load(rows)
+            finally:
+                conn.close()
+            _availability = index
+        return _availability
+
+def current_occupancy():
+    """Percent of rooms occupied tonight, for occupancy-based pricing; None when no rooms are configured."""
+    total_rooms = HOTEL_FLOORS * ROOMS_PER_FLOOR
+    if not total_rooms:
+        return None
+    return 100 * get_availability().occupancy(datetime.now()) / total_rooms
+
+def get_guest_index():
+    """Return the guest name index, loading it from active reservations on first use."""
+    global _guest_index
+    with _availability_lock:
+        if _guest_index is None:
+            index = GuestIndex()
+            conn = create_connection()
+            try:
+                cursor = statements.run(conn, 'reservations.active_guests')
+                while True:
+                    rows = cursor.fetchmany(5000)
+                    if not rows:
+                        break
+                    index.load(rows)
+            finally:
+                conn.close()
+            _guest_index = index
+        return _guest_index
+
+def reload_availability():
+    """Drop the availability and guest indexes so the next lookup reloads them (e.g. after another terminal's write)."""
+    global _availability, _guest_index
+    with _availability_lock:
+        _availability = None
+        _guest_index = None
+
+def get_stay_dates(keep=None):
+    """Prompt for check-in and check-out dates. Blank keeps `keep` when editing."""
+    try:
+        check_in = input("Enter check-in date (YYYY-MM-DD)" + (" (leave blank to keep current)" if keep else "") + ": ").strip()
+        check_out = input("Enter check-out date (YYYY-MM-DD)" + (" (leave blank to keep current)" if keep else "") + ": ").strip()
+        check_in = datetime.strptime(check_in, "%Y-%m-%d").date() if check_in else (keep[0] if keep else None)
+        check_out = datetime.strptime(check_out, "%Y-%m-%d").date() if check_out else (keep[1] if keep else None)
+    except ValueError:
+        logging.info("Invalid date. Please use the YYYY-MM-DD format.")
+        return None, None
+    if check_in is None or check_out is None or check_out <= check_in:
+        logging.info("Check-out date must be after the check-in date.")
+        return None, None
+    return check_in, check_out
+
+def show_free_rooms(check_in, check_out, limit=20):
+    rooms = get_availability().free_rooms(check_in, check_out)
+    if rooms:
+        more = f" (and {len(rooms) - limit} more)" if len(rooms) > limit else ""
+        logging.info(f"Rooms free from {check_in} to {check_out}: {', '.join(rooms[:limit])}{more}")
+    else:
+        logging.info(f"No rooms are free from {check_in} to {check_out}.")
+
+def choose_reservation(room_number):
+    """Let the user pick one of a room's active reservations. Returns the row or None."""
+    reservations = run_statement('reservations.active_in_room', room_number)
+    if not reservations:
+        logging.info("No reservation found with that room number.")
+        return None
+    if len(reservations) == 1:
+        return reservations[0]
+    for idx, reservation in enumerate(reservations, 1):
+        logging.info(f"{idx}. {reservation.LastName}, {reservation.FirstName}: {reservation.CheckInDate} to {reservation.CheckOutDate}")
+    try:
+        choice = int(input("Please select the reservation number: "))
+        if 1 <= choice <= len(reservations):
+            return reservations[choice - 1]
+    except ValueError:
+        pass
+    logging.info("Invalid selection.")
+    return None
+
+@metrics_registry.instrument()
+def book_reservation(room_number, last_name, first_name, check_in, check_out):
+    """Insert a reservation if the room is free for [check_in, check_out). Returns its ReservationID or None."""
+    if check_out <= check_in:
+        raise ValueError("Check-out date must be after the check-in date.")
+    floor = int(room_number[:-3])  # Extract the floor from the first digit
+    availability = get_availability()
+    if not availability.is_free(room_number, check_in, check_out):
+        events.emit('reservation.conflict', room=room_number, check_in=check_in, check_out=check_out)
+        return None
+    # is_free only knows this process's bookings. The insert re-checks for an overlapping stay in the
+    # same statement, under locks held until commit, so other terminals and service threads cannot
+    # book the same nights in between.
+    inserted = run_statement('reservations.book', room_number, floor, last_name, first_name, check_in, check_out,
+                             room_number, 0, check_out, check_in)
+    if not inserted:
+        reload_availability()
+        events.emit('reservation.conflict', room=room_number, check_in=check_in, check_out=check_out)
+        return None
+    availability.add(inserted[0], room_number, check_in, check_out)
+    get_guest_index().add(inserted[0], room_number, last_name, first_name)
+    events.emit('reservation.added', reservation_id=inserted[0], room=room_number, last_name=last_name,
+                check_in=check_in, check_out=check_out)
+    return inserted[0]
+
 def add_reservation():
     try:
         room_number = input("Enter room number (floor + 3-digit code): ").strip()
         floor = int(room_number[:-3])  # Extract the floor from the first digit
         last_name = input("Enter last name: ").strip()
         first_name = input("Enter first name: ").strip()
-        conn = create_connection()
-        if conn is None:
+        check_in, check_out = get_stay_dates()
+        if check_in is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("IF NOT EXISTS (SELECT * FROM Reservations WHERE RoomNumber = ?) "
-                       "INSERT INTO Reservations (RoomNumber, Floor, LastName, FirstName) VALUES (?, ?, ?, ?)",
-                       (room_number, room_number, floor, last_name, first_name))
-        conn.commit()
-        logging.info(f"Reservation for room {room_number} on floor {floor} added successfully. Please use view reservations to verify if successful.")
+        if book_reservation(room_number, last_name, first_name, check_in, check_out):
+            logging.info(f"Reservation for room {room_number} on floor {floor} from {check_in} to {check_out} added successfully.")
+        else:
+            logging.info(f"Room {room_number} is not available from {check_in} to {check_out}.")
+            show_free_rooms(check_in, check_out)
     except Exception as e:
         logging.error(f"Error adding reservation: {e}")
-    finally:
-        conn.close()
 
 
 def delete_reservation():
     try:
         room_number = input("Enter room number (floor + 3-digit code) to delete: ").strip()
-        conn = create_connection()
-        if conn is None:
+        reservation = choose_reservation(room_number)
+        if reservation is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Reservations WHERE RoomNumber = ?", (room_number,))
-        conn.commit()
+        with metrics_registry.operation('delete_reservation'):
+            run_statement('reservations.delete', reservation.ReservationID)
+            get_availability().remove(reservation.ReservationID)
+            get_guest_index().remove(reservation.ReservationID)
+        events.emit('reservation.deleted', reservation_id=reservation.ReservationID, room=room_number)
         logging.info(f"Reservation for room {room_number} deleted successfully.")
     except Exception as e:
         logging.error(f"Error deleting reservation: {e}")
-    finally:
-        conn.close()
 
 def edit_reservation():
-    """Edit an existing reservation, including the room number and floor."""
-    conn = create_connection()
-    if conn is None:
-        return
-
+    """Edit an existing reservation, including the room number, floor and dates."""
     try:
-        cursor = conn.cursor()
         old_room_number = input("Enter the current room number (floor + 3-digit code) of the reservation to edit: ").strip()
+        reservation = choose_reservation(old_room_number)
+        if reservation is None:
+            return
 
-        cursor.execute("SELECT * FROM Reservations WHERE RoomNumber = ?", (old_room_number,))
-        reservation = cursor.fetchone()
+        logging.info(f"Current reservation details: Room Number: {reservation.RoomNumber}, Floor: {reservation.Floor}, Last Name: {reservation.LastName}, First Name: {reservation.FirstName}, Dates: {reservation.CheckInDate} to {reservation.CheckOutDate}")
 
-        if reservation:
-            logging.info(f"Current reservation details: Room Number: {reservation.RoomNumber}, Floor: {reservation.Floor}, Last Name: {reservation.LastName}, First Name: {reservation.FirstName}")
+        new_room_number = input("Enter new room number (floor + 3-digit code) (leave blank to keep current): ").strip()
+        new_last_name = input("Enter new last name (leave blank to keep current): ").strip()
+        new_first_name = input("Enter new first name (leave blank to keep current): ").strip()
+        current_dates = (reservation.CheckInDate, reservation.CheckOutDate)
+        new_check_in, new_check_out = get_stay_dates(keep=current_dates if all(current_dates) else None)
+        if new_check_in is None:
+            return
 
-            new_room_number = input("Enter new room number (floor + 3-digit code) (leave blank to keep current): ").strip()
-            new_last_name = input("Enter new last name (leave blank to keep current): ").strip()
-            new_first_name = input("Enter new first name (leave blank to keep current): ").strip()
+        if new_room_number == "":
+            new_room_number = old_room_number
+        if new_last_name == "":
+            new_last_name = reservation.LastName
+        if new_first_name == "":
+            new_first_name = reservation.FirstName
 
-            if new_room_number == "":
-                new_room_number = old_room_number
-            if new_last_name == "":
-                new_last_name = reservation.LastName
-            if new_first_name == "":
-                new_first_name = reservation.FirstName
+        # Calculate new floor from new room number
+        if len(new_room_number) > 3:
+            new_floor = int(new_room_number[:-3])
+        else:
+            logging.info("Invalid room number format. Using old floor.")
+            new_floor = reservation.Floor
+
+        # Check that the new room is free for the new dates, ignoring this reservation itself
+        availability = get_availability()
+        if not availability.is_free(new_room_number, new_check_in, new_check_out, ignore=reservation.ReservationID):
+            logging.info(f"Room number {new_room_number} is already occupied for those dates.")
+            show_free_rooms(new_check_in, new_check_out)
+            return
 
-            # Calculate new floor from new room number
-            if len(new_room_number) > 3:
-                new_floor = new_room_number[:-3] 
-            else:
-                logging.info("Invalid room number format. Using old floor.")
-                new_floor = old_room_number[:-3]
-            
-
-            # Check if the new room number is already in use
-            if new_room_number != old_room_number:
-                cursor.execute("SELECT * FROM Reservations WHERE RoomNumber = ?", (new_room_number,))
-                existing_reservation = cursor.fetchone()
-                if existing_reservation:
-                    logging.info(f"Room number {new_room_number} is already occupied.")
-                    return
-
-            # Update the reservation
-            cursor.execute("""
-                UPDATE Reservations
-                SET RoomNumber = ?, LastName = ?, FirstName = ?, Floor = ?
-                WHERE RoomNumber = ?""",
-                (new_room_number, new_last_name, new_first_name, new_floor, old_room_number))
-            conn.commit()
-            logging.info(f"Reservation for room {old_room_number} updated successfully. \n New details: Room Number: {new_room_number}, Floor: {new_floor}, Last Name: {new_last_name}, First Name: {new_first_name}")
+        with metrics_registry.operation('edit_reservation'):
+            updated = run_statement('reservations.move', new_room_number, new_last_name, new_first_name, new_floor,
+                                    new_check_in, new_check_out, reservation.ReservationID,
+                                    new_room_number, reservation.ReservationID, new_check_out, new_check_in)
+        if updated:
+            availability.update(reservation.ReservationID, new_room_number, new_check_in, new_check_out)
+            get_guest_index().update(reservation.ReservationID, new_room_number, new_last_name, new_first_name)
+            events.emit('reservation.updated', reservation_id=reservation.ReservationID, old_room=old_room_number,
+                        room=new_room_number, check_in=new_check_in, check_out=new_check_out)
+            logging.info(f"Reservation for room {old_room_number} updated successfully. \n New details: Room Number: {new_room_number}, Floor: {new_floor}, Last Name: {new_last_name}, First Name: {new_first_name}, Dates: {new_check_in} to {new_check_out}")
         else:
-            logging.info("No reservation found with that room number.")
+            reload_availability()
+            logging.info(f"Room number {new_room_number} was just booked for those dates from another terminal.")
     except Exception as e:
         logging.error(f"Error editing reservation: {e}")
-    finally:
-        conn.close()
 
 def edit_user():
     """Edit an existing user."""
@@ -279,9 +505,7 @@ def edit_user():
         if conn is None:
             return
 
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users WHERE Username = ?", (username,))
-        user = cursor.fetchone()
+        user = statements.run(conn, 'users.get', username)
 
         if user:
             logging.info(f"Current user details: Username: {user.Username}")
@@ -294,11 +518,7 @@ def edit_user():
             if new_password == "":
                 new_password = user.Password
 
-            cursor.execute("""
-                UPDATE Users
-                SET Username = ?, Password = ?
-                WHERE Username = ?""",
-                (new_username, new_password, username))
+            statements.run(conn, 'users.update', new_username, new_password, username)
             conn.commit()
             logging.info(f"User '{username}' updated successfully.")
         else:
@@ -317,9 +537,10 @@ def add_item():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Items (ItemID, Name, Price) VALUES (?, ?, ?)", (item_id, item_name, item_price))
+        statements.run(conn, 'items.insert', item_id, item_name, item_price)
         conn.commit()
+        catalog_cache.invalidate()
+        events.emit('item.added', item_id=item_id, name=item_name, price=item_price)
         logging.info(f"Item '{item_name}' added successfully with ID {item_id}.")
     except Exception as e:
         logging.error(f"Error adding item: {e}")
@@ -332,9 +553,10 @@ def delete_item():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Items WHERE ItemID = ?", (item_id,))
+        statements.run(conn, 'items.delete', item_id)
         conn.commit()
+        catalog_cache.invalidate()
+        events.emit('item.deleted', item_id=item_id)
         logging.info(f"Item with ID {item_id} deleted successfully.")
     except Exception as e:
         logging.error(f"Error deleting item: {e}")
@@ -346,8 +568,7 @@ def record_transaction(item_id, quantity):
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Transactions (ItemID, Quantity) VALUES (?, ?)", (item_id, quantity))
+        statements.run(conn, 'transactions.insert', item_id, quantity)
         conn.commit()
         logging.info(f"Recorded transaction for Item ID {item_id} with Quantity {quantity}.")
     except Exception as e:
@@ -385,9 +606,9 @@ def simulate_authority_conversation():
     ]
 
     for line in conversation:
-        time.sleep(4)
+        pacer.pause('security.between_lines')
         if not "User: [Type your response here]" in line:
-                 time.sleep(2)
+                 pacer.pause('security.typing')
                  logging.info(line)
           # Simulate time between messages for realism
 
@@ -411,61 +632,57 @@ def admin_login():
             if conn is None:
                 return False, None
 
-            cursor = conn.cursor()
-            cursor.execute("SELECT Password, FailedAttempts, LockoutTime, Role FROM Users WHERE Username = ?", (username,))
-            user = cursor.fetchone()
+            with metrics_registry.operation('admin_login'):
+                user = statements.run(conn, 'users.login', username)
 
             if not user:
                 logging.info("Username not found.")
                 continue
 
             db_password, failed_attempts, lockout_time, role = user
+            lockouts.seed(username, failed_attempts, lockout_time)
 
             # Check if the user is currently locked out
-            if lockout_time and lockout_time > datetime.now():
+            lockout_time = lockouts.locked_until(username)
+            if lockout_time:
+                events.emit('login.locked', logging.WARNING, username=username, until=lockout_time)
                 logging.info(f"Account is locked until {lockout_time}. Please try again later.")
                 continue
 
             # Validate the entered password
             if password == db_password:
                 logging.info("Login successful!")
-                # Reset failed attempts and lockout time
-                cursor.execute("UPDATE Users SET FailedAttempts = 0, LockoutTime = NULL WHERE Username = ?", (username,))
-                conn.commit()
+                events.emit('login.succeeded', username=username, role=role)
+                # Reset failed attempts and lockout time (no write when there is nothing to reset)
+                lockouts.record_success(username)
                 return True, role, False  # Return role and reauthentication status
             else:
-                failed_attempts += 1
+                failed_attempts, lockout_time = lockouts.record_failure(username)
+                events.emit('login.failed', logging.WARNING, username=username, attempts=failed_attempts)
                 logging.info(f"Invalid credentials. Attempt {failed_attempts}/{LOCKOUT_THRESHOLD}.")
 
                 # Display a warning message after the second failed attempt
                 if failed_attempts == LOCKOUT_THRESHOLD - 1:
                     logging.info("Warning: One more failed attempt will lock you out.")
 
-                # Lock out the user after exceeding the threshold
-                if failed_attempts >= LOCKOUT_THRESHOLD:
-                    lockout_time = datetime.now() + timedelta(minutes=LOCKOUT_DURATION)
-                    cursor.execute("UPDATE Users SET FailedAttempts = ?, LockoutTime = ? WHERE Username = ?", (failed_attempts, lockout_time, username))
-                    conn.commit()
+                # Lock out the user after exceeding the threshold (written through immediately)
+                if lockout_time:
+                    events.emit('login.lockout', logging.WARNING, username=username, until=lockout_time)
                     logging.info("Maximum login attempts exceeded. Account locked.")
                     unlockpassword = input("Please call the manager to come over. Would you like to unlock this account? (Y/N) ")
                     if unlockpassword.upper()=="Y":
                         check=input("Please enter the master password: ")
-                        cursor.execute("SELECT Password FROM Users WHERE Username = ?", ('master'))
-                        masterpwd_tuple = cursor.fetchone()
-                        masterpwd=masterpwd_tuple[0]
+                        masterpwd = statements.run(conn, 'users.password', 'master')
                         if masterpwd == check:
-                            cursor.execute("UPDATE Users SET FailedAttempts = 0, LockoutTime = NULL WHERE Username = ?", (username))
-                            conn.commit()
+                            lockouts.unlock(username)
                             logging.info("Account unlocked successfully!")
+                            events.emit('login.unlocked', username=username)
                             return False, role, True  # Return role and reauthentication status
                         else:
                             simulate_authority_conversation()
                     else:
                         simulate_authority_conversation()
                     return False, None
-                else:
-                    cursor.execute("UPDATE Users SET FailedAttempts = ? WHERE Username = ?", (failed_attempts, username))
-                    conn.commit()
 
         except Exception as e:
             logging.error(f"Error during login: {e}")
@@ -494,9 +711,9 @@ def add_user():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("IF NOT EXISTS (SELECT * FROM Users WHERE Username = ?) INSERT INTO Users (Username, Password, Role) VALUES (?, ?, ?)", (new_username, new_username, new_password, role))
+        statements.run(conn, 'users.insert', new_username, new_password, role, new_username)
         conn.commit()
+        events.emit('user.added', username=new_username, role=role)
         logging.info(f"User '{new_username}' added successfully.")
     except Exception as e:
         logging.error(f"Error adding user: {e}")
@@ -509,9 +726,9 @@ def delete_user():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Users WHERE Username = ?", (del_username,))
+        statements.run(conn, 'users.delete', del_username)
         conn.commit()
+        events.emit('user.deleted', username=del_username)
         logging.info(f"User '{del_username}' deleted successfully.")
     except Exception as e:
         logging.error(f"Error deleting user: {e}")
@@ -520,39 +737,21 @@ def delete_user():
 
 def get_dynamic_price(item_id):
     try:
-        conn = create_connection()
-        if conn is None:
-            return None
-        cursor = conn.cursor()
-        cursor.execute("SELECT Price, PricingRule FROM Items WHERE ItemID = ?", (item_id,))
-        result = cursor.fetchone()
-
-        if result:
-            base_price, pricing_rule = result
-            base_price = float(base_price)  # Convert Decimal to float
-            if pricing_rule == 'Peak':
-                return base_price * 1.20
-            elif pricing_rule == 'OffPeak':
-                return base_price * 0.90
-            else:
-                return base_price
-        else:
+        price = pricing_engine.price_many([item_id]).get(item_id)
+        if price is None:
             logging.info("Item not found.")
-            return None
+        return price
     except Exception as e:
         logging.error(f"Error retrieving dynamic price: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_item_choice():
     while True:
         try:
-            display_items()
+            menu = display_items()
             choice = int(input("Which service/item do you want? "))
-            price = get_dynamic_price(choice)
-            if price is not None:
-                return choice, price
+            if choice in menu:
+                return choice, menu[choice][0], menu[choice][1]  # Already priced by display_items
             else:
                 logging.info("Invalid choice. Please try again.")
         except ValueError:
@@ -560,22 +759,63 @@ def get_item_choice():
         except Exception as e:
             logging.error(f"Error getting item choice: {e}")
 
+@metrics_registry.instrument()
+def fetch_reservation_page(page_size=RESERVATION_PAGE_SIZE, status=None, floor=None, after=None):
+    """Return one page of reservations ordered by (RoomNumber, ReservationID) and the key to resume after.
+
+    Keyset pagination: `after` is the (RoomNumber, ReservationID) of the last row already
+    seen, so each page is an index seek instead of an ever-growing OFFSET scan.
+    """
+    params = []
+    if status:
+        params.append(status)
+    if floor is not None:
+        params.append(floor)
+    if after is not None:
+        params.extend([after[0], after[0], after[1]])
+    name = page_statement_name(bool(status), floor is not None, after is not None)
+    rows = run_statement(name, *params, limit=page_size)
+    next_key = (rows[-1].RoomNumber, rows[-1].ReservationID) if len(rows) == page_size else None
+    return rows, next_key
+
+def iter_reservations(page_size=RESERVATION_PAGE_SIZE, status=None, floor=None):
+    """Stream every matching reservation page by page, holding a connection only while a page loads."""
+    after = None
+    while True:
+        rows, after = fetch_reservation_page(page_size, status, floor, after)
+        yield from rows
+        if after is None:
+            return
+
 def view_reservations():
-    """Display all reservations including the floor."""
-    conn = create_connection()
-    if conn is None:
-        return
+    """Display reservations including the floor, one page at a time."""
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT RoomNumber, Floor, LastName, FirstName FROM Reservations")
-        rows = cursor.fetchall()
+        status = input("Filter by status (e.g. Active, CheckedOut; leave blank for all): ").strip() or None
+        floor = input("Filter by floor (leave blank for all): ").strip()
+        floor = int(floor) if floor else None
+        page_number = 1
+        after = None
         logging.info("Reservations")
-        for row in rows:
-            logging.info(f"Room Number: {row.RoomNumber}, Floor: {row.Floor}, Last Name: {row.LastName}, First Name: {row.FirstName}")
+        while True:
+            rows, after = fetch_reservation_page(RESERVATION_PAGE_SIZE, status, floor, after)
+            if not rows and page_number == 1:
+                logging.info("No reservations found.")
+                return
+            logging.info("\n".join(
+                f"Room Number: {row.RoomNumber}, Floor: {row.Floor}, Last Name: {row.LastName}, "
+                f"First Name: {row.FirstName}, Status: {row.Status}"
+                for row in rows))
+            if after is None:
+                logging.info("End of reservations.")
+                return
+            more = input(f"Page {page_number}. Press Enter for the next page or 'q' to stop: ").strip().lower()
+            if more == 'q':
+                return
+            page_number += 1
+    except ValueError:
+        logging.info("Invalid floor. Please enter a number.")
     except Exception as e:
         logging.error(f"Error displaying reservations: {e}")
-    finally:
-        conn.close()
 
 def update_item():
     try:
@@ -587,33 +827,65 @@ def update_item():
         if conn is None:
             return
 
-        cursor = conn.cursor()
-        cursor.execute("UPDATE Items SET Name = ?, Price = ? WHERE ItemID = ?", (new_name, new_price, item_id))
+        statements.run(conn, 'items.update', new_name, new_price, item_id)
         conn.commit()
+        catalog_cache.invalidate()
+        events.emit('item.updated', item_id=item_id, name=new_name, price=new_price)
         logging.info(f"Item with ID {item_id} updated successfully.")
     except Exception as e:
         logging.error(f"Error updating item: {e}")
     finally:
         conn.close()
 
+@metrics_registry.instrument()
+def find_reservations(room_number=None, last_name=None, include_archive=False):
+    """Return full reservation rows matching a room number or a last name, optionally with archived stays."""
+    if room_number is not None:
+        reservations = run_statement('reservations.by_room', room_number)
+    else:
+        reservations = run_statement('reservations.by_last_name', last_name)
+    if include_archive:
+        reservations = list(reservations) + find_archived_reservations(room_number, last_name)
+    return reservations
+
+@metrics_registry.instrument()
+def find_archived_reservations(room_number=None, last_name=None):
+    """Stays moved to ReservationsArchive by archive.py."""
+    if room_number is not None:
+        return list(run_statement('archive.reservations.by_room', room_number))
+    return list(run_statement('archive.reservations.by_last_name', last_name))
+
 def search_reservations():
     try:
-        conn = create_connection()
-        if conn is None:
-            return
         search_type = input("Search by room number (RN)/last name(LN): ").strip().lower()
-        cursor = conn.cursor()
+        if search_type not in ('rn', 'ln'):
+            logging.info("Invalid search type.")
+            return
         if search_type == 'rn':
             search_value = input(f"Enter the room number: ").strip()
-            cursor.execute("SELECT * FROM Reservations WHERE RoomNumber = ?", (search_value,))
-        elif search_type == 'ln':
-            search_value = input(f"Enter the last name: ").strip()
-            cursor.execute("SELECT * FROM Reservations WHERE LastName = ?", (search_value,))
         else:
-            logging.info("Invalid search type.")
-            return
+            search_value = input(f"Enter the last name (or the start of it): ").strip()
+        include_archive = input("Include archived stays? (Y/N): ").strip().lower() == 'y'
+        if search_type == 'rn':
+            reservations = find_reservations(room_number=search_value, include_archive=include_archive)
+        else:
+            matches = search_guests(search_value, limit=25)
+            if matches:
+                if matches[0].distance != EXACT:
+                    logging.info(f"No active reservations under '{search_value}'. Closest matches:")
+                else:
+                    logging.info("Search Results:")
+                for match in matches:
+                    logging.info(f"Room Number: {match.room_number}, Last Name: {match.last_name}, First Name: {match.first_name}")
+                archived = find_archived_reservations(last_name=search_value) if include_archive else []
+                if archived:
+                    logging.info("Archived stays:")
+                for reservation in archived:
+                    logging.info(f"Room Number: {reservation.RoomNumber}, Last Name: {reservation.LastName}, First Name: {reservation.FirstName}, Checked out: {reservation.CheckOutDate}")
+                return
+            # Checked-out stays are not indexed; fall back to the table for them.
+            reservations = find_reservations(last_name=search_value, include_archive=include_archive)
 
-        reservations = cursor.fetchall()
         if reservations:
             logging.info("Search Results:")
             for reservation in reservations:
@@ -622,97 +894,112 @@ def search_reservations():
             logging.info("No reservations found.")
     except Exception as e:
         logging.error(f"Error searching reservations: {e}")
-    finally:
-        conn.close()
+
+def _user_listing(rows, show_passwords=False):
+    """The Users and Roles listing as one message; the master account is never shown."""
+    lines = ["Users and Roles"]
+    for row in rows:
+        if row.Username.lower() == 'master':
+            lines.append("An account was skipped for security reasons.")
+        elif show_passwords:
+            lines.append(f"Username: {row.Username}, Password: {row.Password}, Role: {row.Role}")
+        else:
+            lines.append(f"Username: {row.Username}, Role: {row.Role}")
+    return "\n".join(lines)
 
 def view_users():
     try:
         
         conn = create_connection()
-        cursor = conn.cursor()
         if conn is None:
             return
         passwords = input("Would you like to see the passwords? (Y/N): ").strip().upper()
         if passwords == 'Y':
             mpwd= getpass.getpass("Please enter the master password: ").strip()
-            conn = create_connection()
-            if conn is None:
-                logging.info("Database connection failed.")
-                return
-            cursor.execute("SELECT Password FROM Users WHERE Username = ?", ('master'))
-            rows = cursor.fetchone()
-            if mpwd == rows[0]:
+            if mpwd == statements.run(conn, 'users.password', 'master'):
                 logging.info("Master password is correct. Displaying passwords.")
-                cursor = conn.cursor()
-                cursor.execute("SELECT Username, Password, Role FROM Users")
-                rows = cursor.fetchall()
-                logging.info("Users and Roles")
-                for row in rows:
-                    if row.Username.lower() == 'master':
-                        logging.info("An account was skipped for security reasons.")
-                        continue
-                    logging.info(f"Username: {row.Username}, Password: {row.Password}, Role: {row.Role}")
+                with metrics_registry.operation('view_users'):
+                    rows = statements.run(conn, 'users.list')
+                logging.info(_user_listing(rows, show_passwords=True))
                 return
             else:
                 logging.info("Incorrect master password. Cannot display passwords.")
         
-        cursor = conn.cursor()
-        cursor.execute("SELECT Username, Password, Role FROM Users")
-        rows = cursor.fetchall()
-        logging.info("Users and Roles")
-        for row in rows:
-            if row.Username.lower() == 'master':
-                logging.info("An account was skipped for security reasons.")
-                continue
-            logging.info(f"Username: {row.Username}, Role: {row.Role}")
+        with metrics_registry.operation('view_users'):
+            rows = statements.run(conn, 'users.list')
+        logging.info(_user_listing(rows))
 
     except Exception as e:
         logging.error(f"Error displaying users: {e}")
     finally:
         conn.close()
 
-def apply_discount(total_amount):
-    try:
-        discount_code = input("Enter discount code: ").strip()
+@metrics_registry.instrument()
+def lookup_discount(code):
+    """Return the DiscountPercentage for a code, or None when the code does not exist."""
+    return discounts.lookup(code)
 
-        conn = create_connection()
-        if conn is None:
-            return
+def discounted_total(total_amount, discount_percentage):
+    total_amount = money(total_amount)
+    return total_amount - percent_of(total_amount, discount_percentage)
 
-        cursor = conn.cursor()
-        cursor.execute("SELECT DiscountPercentage FROM Discounts WHERE Code = ?", (discount_code,))
-        result = cursor.fetchone()
+def apply_discount(cart):
+    """Ask for a discount code and apply it to the cart. Returns True when a code was applied."""
+    try:
+        discount_code = input("Enter discount code: ").strip()
+        discount_percentage = lookup_discount(discount_code)
 
-        if result:
-            discount_percentage = result[0]
-            discount_amount = (total_amount * float(discount_percentage)) / 100
-            total_with_discount = total_amount - discount_amount
-            logging.info(f"Discount applied! New total amount: ${total_with_discount:.2f}")
-            return total_with_discount
+        if discount_percentage is not None:
+            cart.apply_discount(discount_code, discount_percentage)
+            logging.info(f"Discount applied! New total amount: ${cart.total:.2f}")
+            return True
         else:
             logging.info("Invalid discount code.")
-            return total_amount
+            return False
     except Exception as e:
         logging.error(f"Error applying discount: {e}")
-    finally:
-        conn.close()
+        return False
 
+@metrics_registry.instrument()
 def view_items():
     """Display all items."""
-    conn = create_connection()
-    if conn is None:
-        return
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT ItemID, Name, Price, PricingRule FROM Items")
-        rows = cursor.fetchall()
-        logging.info("Items")
-        for row in rows:
-            logging.info(f"Item ID: {row.ItemID}, Name: {row.Name}, Price: ${row.Price:.2f}, Pricing Rule: {row.PricingRule}")
+        rows = catalog_cache.get_or_load('items', _load_items)
+        logging.info("\n".join(["Items"] + [
+            f"Item ID: {row.ItemID}, Name: {row.Name}, Price: ${row.Price:.2f}, Pricing Rule: {row.PricingRule}, "
+            f"Category: {row.Category}"
+            for row in rows]))
     except Exception as e:
         logging.error(f"Error displaying items: {e}")
-    finally:
-        conn.close()
+
+def _load_items():
+    return run_statement('items.menu')
+
+def show_performance():
+    """Admin screen: per-operation latency, DB round trips and errors since start-up."""
+    while True:
+        logging.info("\nPerformance")
+        logging.info(format_snapshot(metrics_registry.snapshot()))
+        if _pool is not None:
+            pool = _pool.stats()
+            logging.info(f"Connection pool: {pool['in_use']} in use, {pool['idle']} idle, "
+                         f"{pool['checkouts']} checkouts, {pool['waits']} waits")
+        logging.info(f"Catalog cache hit ratio: {catalog_cache.stats()['hit_ratio']:.0%}")
+        logging.info(f"Order writes: {order_store.metrics.stats()}")
+        logging.info(f"Inventory: {inventory.stats()}")
+        logging.info(format_stats(statements.stats()))
+        choice = input("R to refresh, W to write the Prometheus file, X to reset, Enter to return: ").strip().lower()
+        if choice == 'w':
+            try:
+                metrics_registry.write_prometheus(METRICS_PATH)
+                logging.info(f"Metrics written to {METRICS_PATH}.")
+            except OSError as e:
+                logging.error(f"Error writing metrics: {e}")
+        elif choice == 'x':
+            metrics_registry.reset()
+            statements.reset()
+        elif choice != 'r':
+            return
 
 def admin_panel():
 
@@ -762,7 +1049,8 @@ def admin_panel():
             logging.info("13. View Discount Codes")
 
             logging.info("---- Other ----")
-            logging.info("14. Exit Admin Panel")
+            logging.info("14. Performance")
+            logging.info("15. Exit Admin Panel")
 
         elif role == 'admin':
             logging.info("---- Reservations ----")
@@ -793,7 +1081,8 @@ def admin_panel():
             logging.info("17. Manage Discount Codes")
 
             logging.info("---- Other ----")
-            logging.info("18. Exit Admin Panel")
+            logging.info("18. Performance")
+            logging.info("19. Exit Admin Panel")
         elif role == 'valet':
             logging.info("1. Vehicle Management")
             logging.info("2. Exit Valet Panel")
@@ -849,24 +1138,12 @@ def admin_panel():
                 view_users()
             elif choice == '13':
                 try:
-                    conn = create_connection()
-                    if conn is None:
-                        logging.info("Database connection failed.")
-                        continue
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT Code, DiscountPercentage FROM Discounts")
-                    discounts = cursor.fetchall()
-                    if discounts:
-                        logging.info("Current Discount Codes:")
-                        for discount in discounts:
-                            logging.info(f"Code: {discount.Code}, Percentage: {discount.DiscountPercentage}%")
-                    else:
-                        logging.info("No discount codes found.")
+                    show_discount_codes()
                 except Exception as e:
                     logging.error(f"Error viewing discount codes: {e}")
-                finally:
-                    conn.close()
             elif choice == '14':
+                show_performance()
+            elif choice == '15':
                 break
             else:
                 logging.info("Invalid choice. Please try again.")
@@ -907,6 +1184,8 @@ def admin_panel():
             elif choice == '17':
                 manage_discount_codes()
             elif choice == '18':
+                show_performance()
+            elif choice == '19':
                 break
             else:
                 logging.info("Invalid choice. Please try again.")
@@ -937,12 +1216,14 @@ def add_inventory_item():
         name = input("Enter inventory item name: ").strip()
         quantity = int(input("Enter quantity: ").strip())
         location = input("Enter location: ").strip()
+        threshold = input(f"Enter low-stock threshold (leave blank for {LOW_STOCK_THRESHOLD}): ").strip()
+        threshold = int(threshold) if threshold else None
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Inventory (Name, Quantity, Location) VALUES (?, ?, ?)", (name, quantity, location))
+        statements.run(conn, 'inventory.insert', name, quantity, location, threshold)
         conn.commit()
+        inventory.invalidate()
         logging.info(f"Inventory item '{name}' added successfully.")
     except Exception as e:
         logging.error(f"Error adding inventory item: {e}")
@@ -956,13 +1237,12 @@ def edit_inventory_item():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Inventory WHERE ItemID = ?", (item_id,))
-        item = cursor.fetchone()
+        item = statements.run(conn, 'inventory.get', item_id)
         if item:
             new_name = input("Enter new name (leave blank to keep current): ").strip()
             new_quantity = input("Enter new quantity (leave blank to keep current): ").strip()
             new_location = input("Enter new location (leave blank to keep current): ").strip()
+            new_threshold = input("Enter new low-stock threshold (leave blank to keep current): ").strip()
             if new_name == "":
                 new_name = item.Name
             if new_quantity == "":
@@ -971,8 +1251,18 @@ def edit_inventory_item():
                 new_quantity = int(new_quantity)
             if new_location == "":
                 new_location = item.Location
-            cursor.execute("UPDATE Inventory SET Name = ?, Quantity = ?, Location = ? WHERE ItemID = ?", (new_name, new_quantity, new_location, item_id))
+            new_threshold = item.LowStockThreshold if new_threshold == "" else int(new_threshold)
+            # Only if no order took stock since it was read; otherwise the new quantity would undo it.
+            updated = statements.run(conn, 'inventory.update', new_name, new_quantity, new_location, new_threshold,
+                                     item_id, item.Quantity)
             conn.commit()
+            if not updated:
+                logging.info("The quantity changed while you were editing (an order was placed). Please try again.")
+                return
+            if new_threshold == item.LowStockThreshold:
+                inventory.observe({item_id: new_quantity})
+            else:
+                inventory.invalidate()
             logging.info(f"Inventory item '{item_id}' updated successfully.")
         else:
             logging.info("Inventory item not found.")
@@ -988,15 +1278,16 @@ def delete_inventory_item():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Inventory WHERE ItemID = ?", (item_id,))
+        statements.run(conn, 'inventory.delete', item_id)
         conn.commit()
+        inventory.invalidate()
         logging.info(f"Inventory item '{item_id}' deleted successfully.")
     except Exception as e:
         logging.error(f"Error deleting inventory item: {e}")
     finally:
         conn.close()
 
+@metrics_registry.instrument()
 def view_inventory():
 
     """View all inventory items."""
@@ -1004,12 +1295,13 @@ def view_inventory():
         conn = create_connection()
         if conn is None:
             return
-        cursor = conn.cursor()
-        cursor.execute("SELECT ItemID, Name, Quantity, Location FROM Inventory")
-        rows = cursor.fetchall()
-        logging.info("Inventory Items:")
+        rows = statements.run(conn, 'inventory.list')
+        lines = ["Inventory Items:"]
         for row in rows:
-            logging.info(f"ID: {row.ItemID}, Name: {row.Name}, Quantity: {row.Quantity}, Location: {row.Location}")
+            threshold = LOW_STOCK_THRESHOLD if row.LowStockThreshold is None else row.LowStockThreshold
+            low = " (LOW)" if row.Quantity <= threshold else ""
+            lines.append(f"ID: {row.ItemID}, Name: {row.Name}, Quantity: {row.Quantity}{low}, Location: {row.Location}")
+        logging.info("\n".join(lines))
     except Exception as e:
         logging.error(f"Error viewing inventory: {e}")
     finally:
@@ -1026,9 +1318,7 @@ def send_notification_to_customer():
             if conn is None:
                 logging.info("Database connection failed.")
                 return
-            cursor = conn.cursor()
-            cursor.execute("SELECT RoomNumber FROM Reservations WHERE RoomNumber = ?", (room_number,))
-            result = cursor.fetchone()
+            result = statements.run(conn, 'reservations.room_occupied', room_number)
             conn.close()
             if result:
                 break
@@ -1066,18 +1356,37 @@ def send_alert_to_staff():
             except ValueError:
                 logging.info("Invalid input. Please enter a number.")
         message = input("Enter alert message: ").strip()
-        # Simulate sending alert (could be extended to email/SMS)
-        logging.info(f"Alert sent to {selected_role} staff: {message}")
+        notify_staff(selected_role, message)
     except Exception as e:
         logging.error(f"Error sending alert: {e}")
+
+def notify_staff(role, message):
+    """Send an alert to one staff role (simulated); also used for low-stock alerts."""
+    # Simulate sending alert (could be extended to email/SMS)
+    logging.info(f"Alert sent to {role} staff: {message}")
+    events.emit('staff.alerted', role=role, message=message)
+@metrics_registry.instrument()
+def list_discount_codes():
+    """Return every (Code, DiscountPercentage) pair."""
+    return discounts.codes()
+
+@metrics_registry.instrument()
+def last_discount_code():
+    """Return the most recently created discount code, or None when there are none."""
+    return discounts.last_code()
+
+@metrics_registry.instrument()
+def show_discount_codes():
+    codes = list_discount_codes()
+    if codes:
+        logging.info("\n".join(["Current Discount Codes:"] +
+                               [f"Code: {code}, Percentage: {percentage}%" for code, percentage in codes]))
+    else:
+        logging.info("No discount codes found.")
+
 def manage_discount_codes():
     """Provides a sub-menu for discount code management."""
-    conn = create_connection()
-    if conn is None:
-        logging.info("Database connection failed.")
-        return
     try:
-        cursor = conn.cursor()
         while True:
             logging.info("\nDiscount Code Management:")
             logging.info("1. Add Discount Code")
@@ -1087,76 +1396,56 @@ def manage_discount_codes():
             logging.info("5. Exit Discount Management")
             choice = input("Enter your choice: ").strip()
             if choice == "1":
-                cursor.execute("SELECT Code FROM Discounts")
-                last_code = cursor.fetchall()
-                logging.info(f"Last discount code: {(last_code[-1])[0] if last_code else 'None'}")
+                logging.info(f"Last discount code: {last_discount_code() or 'None'}")
                 code = input("Enter new discount code: ").strip()
+                if lookup_discount(code) is not None:
+                    logging.info(f"Discount code '{code}' already exists.")
+                    continue
                 try:
                     discount_percentage = float(input("Enter discount percentage: ").strip())
                 except ValueError:
                     logging.info("Invalid discount percentage.")
                     continue
-                cursor.execute(
-                    "INSERT INTO Discounts (Code, DiscountPercentage) VALUES (?, ?)",
-                    (code, discount_percentage)
-                )
-                conn.commit()
+                with metrics_registry.operation('discounts.add'):
+                    discounts.add(code, discount_percentage)
+                events.emit('discount.added', code=code, percentage=discount_percentage)
                 logging.info(f"Discount code '{code}' added successfully.")
             elif choice == "2":
-                cursor.execute("SELECT Code, DiscountPercentage FROM Discounts")
-                discounts = cursor.fetchall()
-                if discounts:
-                    logging.info("Current Discount Codes:")
-                    for discount in discounts:
-                        logging.info(f"Code: {discount.Code}, Percentage: {discount.DiscountPercentage}%")
-                else:
-                    logging.info("No discount codes found.")
+                show_discount_codes()
                 code = input("Enter discount code to update: ").strip()
-                cursor.execute("SELECT * FROM Discounts WHERE Code = ?", (code,))
-                if cursor.fetchone():
+                if lookup_discount(code) is not None:
                     try:
                         new_percentage = float(input("Enter new discount percentage: ").strip())
                     except ValueError:
                         logging.info("Invalid percentage.")
                         continue
-                    cursor.execute(
-                        "UPDATE Discounts SET DiscountPercentage = ? WHERE Code = ?",
-                        (new_percentage, code)
-                    )
-                    conn.commit()
-                    logging.info(f"Discount code '{code}' updated successfully.")
+                    with metrics_registry.operation('discounts.update'):
+                        updated = discounts.update(code, new_percentage)
+                    if updated:
+                        events.emit('discount.updated', code=code, percentage=new_percentage)
+                        logging.info(f"Discount code '{code}' updated successfully.")
+                    else:
+                        logging.info("Discount code not found.")
                 else:
                     logging.info("Discount code not found.")
             elif choice == "3":
-                cursor.execute("SELECT Code, DiscountPercentage FROM Discounts")
-                discounts = cursor.fetchall()
-                if discounts:
-                    logging.info("Current Discount Codes:")
-                    for discount in discounts:
-                        logging.info(f"Code: {discount.Code}, Percentage: {discount.DiscountPercentage}%")
-                else:
-                    logging.info("No discount codes found.")
+                show_discount_codes()
                 code = input("Enter discount code to delete: ").strip()
-                cursor.execute("DELETE FROM Discounts WHERE Code = ?", (code,))
-                conn.commit()
-                logging.info(f"Discount code '{code}' deleted successfully.")
-            elif choice == "4":
-                cursor.execute("SELECT Code, DiscountPercentage FROM Discounts")
-                discounts = cursor.fetchall()
-                if discounts:
-                    logging.info("Current Discount Codes:")
-                    for discount in discounts:
-                        logging.info(f"Code: {discount.Code}, Percentage: {discount.DiscountPercentage}%")
+                with metrics_registry.operation('discounts.delete'):
+                    deleted = discounts.delete(code)
+                if deleted:
+                    events.emit('discount.deleted', code=code)
+                    logging.info(f"Discount code '{code}' deleted successfully.")
                 else:
-                    logging.info("No discount codes found.")
+                    logging.info("Discount code not found.")
+            elif choice == "4":
+                show_discount_codes()
             elif choice == "5":
                 break
             else:
                 logging.info("Invalid choice. Please try again.")
     except Exception as e:
         logging.error(f"Error managing discount codes: {e}")
-    finally:
-        conn.close()
 def reset_user_password():
 
     logging.info("List of Users:")
@@ -1167,12 +1456,10 @@ def reset_user_password():
         logging.info("Database connection failed.")
         return
     try:
-        cursor = conn.cursor()
         username = input("Enter the username to reset password: ").strip()
-        cursor.execute("SELECT Username FROM Users WHERE Username = ?", (username,))
-        if cursor.fetchone():
+        if statements.run(conn, 'users.get', username):
             new_password = input("Enter new password: ").strip()
-            cursor.execute("UPDATE Users SET Password = ? WHERE Username = ?", (new_password, username))
+            statements.run(conn, 'users.set_password', new_password, username)
             conn.commit()
             logging.info(f"Password for user '{username}' has been reset successfully.")
         else:
@@ -1203,9 +1490,9 @@ def luhn_check(card_number):
 
 def process_credit_card(total_amount):
     """Simulate credit card processing with tax."""
-    total_amount = float(total_amount)
+    total_amount = money(total_amount)
     # Calculate the tax amount
-    tax_amount = total_amount * TAX_RATE
+    tax_amount = money(total_amount * TAX_RATE)
     total_with_tax = total_amount + tax_amount
 
     logging.info(f"Processing credit card payment of ${total_with_tax:.2f}...")
@@ -1233,6 +1520,11 @@ def process_credit_card(total_amount):
         return False
     return True
 
+def void_credit_card(total_amount):
+    """Simulate reversing a payment taken by process_credit_card for an order that was not placed."""
+    total_amount = money(total_amount)
+    logging.info(f"Your payment of ${total_amount + money(total_amount * TAX_RATE):.2f} has been reversed.")
+
 def validate_expiration_date(expiration_date):
 
     """Validate if the credit card expiration date is valid and not expired."""
@@ -1265,14 +1557,15 @@ def check_in():
     """Handle customer check-in using validate_room and display amenities."""
     room_number, first_name = validate_room()  # Assume validate_room returns (room_number, first_name)
     if room_number and first_name:
+        events.emit('guest.checked_in', room=room_number)
         logging.info("Checking in...")
-        time.sleep(2)
+        pacer.pause('check_in.checking')
         logging.info("Verifying Identity...")
-        time.sleep(2)
+        pacer.pause('check_in.verify_identity')
         logging.info("Finalizing check-in...")
-        time.sleep(1)
+        pacer.pause('check_in.finalize')
         logging.info("Room number and key card are being prepared...")
-        time.sleep(2)
+        pacer.pause('check_in.key_card')
         logging.info(f"Your room number is {room_number}.")
         logging.info("Your key card is ready for use.")
         logging.info(f"Check-in successful! Welcome to {HOTEL_NAME}, {first_name.capitalize()}!")
@@ -1293,27 +1586,24 @@ def check_in():
         logging.info("Error:  0x0201 Invalid room number or last name.")
         logging.info("Please wait while we redirect you to the front desk.")
         logging.info("Redirecting...")
-        time.sleep(2)  # Simulate a delay for redirection
+        pacer.pause('check_in.redirect')
         logging.info("You have been redirected to the front desk.")
         logging.info("Please provide your ID and credit card for verification.")
         id = input("Please enter your ID: ").strip()
         credit_card = input("Please enter your credit card number: ").strip()
         logging.info(f"ID: {id}, Credit Card: {credit_card}")
         logging.info("Verifying ID and credit card...")
-        time.sleep(2)  # Simulate a delay for verification
+        pacer.pause('check_in.verify_id')
         logging.info("Thank you for your patience.")
         logging.info("Your room number is being verified.")
         logging.info("Please wait...")
-        time.sleep(2)  # Simulate a delay for verification
+        pacer.pause('check_in.verify_room')
         logging.info("Verification unsuccessful!")
         logging.info("You reservation is not in our system. Possible fraud and/or spam detected. Please ask the front desk for assistance.")
         check=input("Please enter the master password: ")
         try:
             conn = create_connection()
-            cursor=conn.cursor()
-            cursor.execute("SELECT Password FROM Users WHERE Username = ?", ('master'))
-            masterpwd_tuple = cursor.fetchone()
-            masterpwd=masterpwd_tuple[0]
+            masterpwd = statements.run(conn, 'users.password', 'master')
             if masterpwd == check:
                 logging.info("Account unlocked successfully!")
                 logging.info("Please try again.")
@@ -1325,49 +1615,34 @@ def check_in():
 def billing_creator():
     logging.info("\n--- Billing Creator ---")
     logging.info("Enter your charges. Type 'done' for description to finish.")
-    items = []
-    total = 0.0
+    folio = Folio(TAX_RATE)
     while True:
         description = input("Enter charge description (or 'done' to finish): ").strip()
         if description.lower() == 'done' or description == '':
             break
         try:
-            amount = float(input("Enter amount for this charge: ").strip())
-        except ValueError:
+            amount = money(input("Enter amount for this charge: ").strip())
+        except ArithmeticError:
             logging.info("Invalid amount. Please try again.")
             continue
-        items.append((description, amount))
-        total += amount
-    receipt = "\n----- Receipt -----\n"
-    for desc, amt in items:
-        receipt += f"{desc}: ${amt:.2f}\n"
-    receipt += f"Subtotal: ${total:.2f}\n"
-    tax = total * TAX_RATE
-    final_total = total + tax
-    receipt += f"Tax (Tax Rate: {TAX_RATE*100:.0f}%): ${tax:.2f}\n"
-    receipt += f"Total Amount: ${final_total:.2f}\n"
-    receipt += "-------------------\n"
-    logging.info(receipt)
+        folio.charge(description, amount)
+    logging.info("\n" + folio.render_text())
+@metrics_registry.instrument()
+def find_guest(last_name, room_number):
+    """Return the guest's first name if a reservation under last_name is for room_number, else None."""
+    for reservation in find_reservations_by_last_name(last_name):
+        if reservation.room_number == room_number:
+            return reservation.first_name
+    return None
+
 def check_out():
     """Handle customer check-out without deleting the reservation."""
     try:
         last_name = input("Please enter your last name: ").strip()
         room_number = input("Please enter your room number (floor + 3-digit code): ").strip()
-        conn = create_connection()
-        if conn is None:
-            return
-        cursor = conn.cursor()
-        cursor.execute("SELECT RoomNumber, FirstName FROM Reservations WHERE LastName = ?", (last_name,))
-        reservations = cursor.fetchall()
-        matched = False
-        first_name = ""
-        if reservations:
-            for reservation in reservations:
-                if reservation.RoomNumber == room_number:
-                    matched = True
-                    first_name = reservation.FirstName
-                    break
-        if matched:
+        first_name = find_guest(last_name, room_number)
+        if first_name is not None:
+            events.emit('guest.checked_out', room=room_number, last_name=last_name)
             logging.info(f"Check-out successful for room {room_number}. Thanks for visting {HOTEL_NAME}, {first_name.capitalize()}! We hope to see you again soon!")
             bill_choice = input("Would you like to generate your bill? (Y/N): ").strip().lower()
             if bill_choice == 'y':
@@ -1376,20 +1651,36 @@ def check_out():
             logging.info("No matching reservation found for check-out.")
     except Exception as e:
         logging.error(f"Error during check-out: {e}")
-    finally:
-        conn.close()
+@metrics_registry.instrument()
+def price_order(lines):
+    """Price [(item_id, quantity), ...] with one query.
+
+    Returns ([(item_id, quantity, unit_price, redemption_code), ...], total).
+    """
+    prices = pricing_engine.price_many([item_id for item_id, _ in lines])
+    unknown = [item_id for item_id, _ in lines if item_id not in prices]
+    if unknown:
+        raise ValueError(f"Item(s) not found: {', '.join(str(item_id) for item_id in unknown)}")
+    priced = []
+    total = money(0)
+    for item_id, quantity in lines:
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive number.")
+        unit_price = money(prices[item_id])
+        total += unit_price * quantity
+        priced.append((item_id, quantity, unit_price, generate_code()))
+    return priced, total
+
 def order_item():
     logging.info("Welcome to the ordering system!")
 # Existing ordering code starts here
-    total = 0.0  # Initialize total as a float
-    redemption_codes = []
-
     room_number, first_name = validate_room()
     if room_number is None or first_name is None:
         logging.info("Invalid room number or last name. Please try again.")
         return  # Return to main menu if validation fails
 
     logging.info(f"Welcome, {first_name.capitalize()}! Room {room_number} validated successfully.")
+    cart = OrderCart(room_number)
 
     while True:
         item_choice = get_item_choice()
@@ -1397,51 +1688,54 @@ def order_item():
             continue  # Return to item choice if error occurs
 
         quantity = get_quantity()
-        conn = create_connection()
-        if conn is None:
-            logging.info("Connection failed. Returning to main menu.")
-            return
 
         try:
-            item_id_str, price = item_choice
+            item_id, name, price = item_choice
             logging.debug(f"Item Choice: {item_choice}")
-            item_id = int(item_id_str)  # Convert item ID to integer
-
-           
-            price = get_dynamic_price(item_id)
-
-            if price:
-                if isinstance(price, Decimal):
-                    price = float(price)
-                total += price * quantity
-                code = generate_code()
-                redemption_codes.append((item_id, code))
-                logging.info(f"Total so far: ${total:.2f}")
-                logging.info(f"Redemption code for item {item_id}: {code}")
-            else:
-                logging.info("Item not found. Please try again.")
+            cart.add(item_id, name, price, quantity, generate_code())
+            logging.info(f"Total so far: ${cart.subtotal:.2f}")
         except Exception as e:
             logging.error(f"Error during item processing: {e}")
-        finally:
-            conn.close()
 
         if not get_another_item():
             break  # Exit the item ordering loop
+    if not cart:
+        logging.info("No items ordered.")
+        return
     discount = input("Do you have a discount code? (Y/N): ").strip().lower()
     if discount == 'y':
-        total = apply_discount(total)  # Apply discount if applicable
+        apply_discount(cart)  # Apply discount if applicable
     logging.info("End of transaction")
-    logging.info(f"Your total is ${total:.2f} and will be delivered to room {room_number}")
-    logging.info("Your redemption codes are:")
-    for item, code in redemption_codes:
-        logging.info(f"Item ID {item}: {code}")
-    while True:
-        if process_credit_card(total):
-            logging.info("Thank you for your order!")
-            logging.info("Your order will be delivered shortly.")
-            break
-        else:
-            logging.info("Payment failed. Please try again.")
+    try:
+        with metrics_registry.operation('order_store.check_stock'):
+            order_store.check_stock(cart)
+    except OutOfStock as e:
+        logging.info(f"Sorry, we could not place your order. {e}")
+        return
+    except Exception as e:
+        logging.error(f"Error checking stock: {e}")
+        logging.info("Sorry, your order was not recorded. Please contact the front desk.")
+        return
+    logging.info(f"Your total is ${cart.total:.2f} and will be delivered to room {room_number}")
+    while not process_credit_card(cart.total):
+        logging.info("Payment failed. Please try again.")
+    try:
+        with metrics_registry.operation('order_store.place'):
+            order_id = order_store.place(cart, TAX_RATE)
+    except OutOfStock as e:
+        void_credit_card(cart.total)
+        logging.info(f"Sorry, we could not place your order. {e}")
+        return
+    except Exception as e:
+        logging.error(f"Error saving order: {e}")
+        void_credit_card(cart.total)
+        logging.info("Sorry, your order was not recorded. Please contact the front desk.")
+        return
+    logging.info(f"Thank you for your order! Your order ID is {order_id}.")
+    logging.info("Your redemption codes are:\n" + "\n".join(
+        f"Item ID {item_id} ({name} x{quantity}): {code}"
+        for item_id, (name, quantity, _, code) in cart.lines.items()))
+    logging.info("Your order will be delivered shortly.")
 def view_amenities():
     """Display a full list of hotel amenities for customers."""
     logging.info("\nHotel Amenities:")
@@ -1479,7 +1773,7 @@ def track_order_status():
     logging.info("\nTrack Order Status")
     order_id = input("Enter your order ID: ").strip()
     logging.info(f"Checking status for Order ID {order_id}...")
-    time.sleep(3)
+    pacer.pause('track_order_status')
     delivery_array=["Preparing", "Ready for pickup", "Out for delivery", "Delivered", "Cancelled", 
          "Awaiting confirmation", "In transit", "Failed delivery", "Completed"]
     delivery_status = random.choice(delivery_array)  # Randomly select a status from the list
@@ -1511,7 +1805,7 @@ def contact_concierge():
     logging.info("\nContact Concierge")
     message = input("Enter your message for our concierge: ").strip()
     logging.info("Sending your message...")
-    time.sleep(2)
+    pacer.pause('contact_concierge')
     logging.info("Your message has been sent. A concierge will get back to you shortly.")
     logging.info("For immediate assistance, please call the front desk at 123-456-7890.")
     logging.info("Your message: " + message)
@@ -1536,7 +1830,7 @@ def it_support_panel():
             choice = input("Do you want to run diagnostics and test the network? (Y/N): ").strip().lower()
             if choice == 'y':
                 logging.info("Beginning Network Diagnostics and Test...")
-                time.sleep(2)
+                pacer.pause('it_support.network_test')
                 logging.info(f"Network Name: {network_name}")
                 logging.info(f"IP Address: {ip_address}")
                 logging.info(f"Subnet Mask: {subnet_mask}")
@@ -1574,7 +1868,7 @@ def it_support_panel():
                 except ValueError:
                     logging.info("Invalid input. Please enter a number.")
             logging.info(f"Running diagnostics on {system}...")
-            time.sleep(2)
+            pacer.pause('it_support.diagnostics')
             logging.info(f"Diagnostics for {system} completed. No issues found.")
         elif choice == '4':
             logging.info("\n--- IT Support: Software Installation ---")
@@ -1607,7 +1901,7 @@ def it_support_panel():
                 except ValueError:
                     logging.info("Invalid input. Please enter a number.")
             logging.info(f"Installing {software} on {system}...")
-            time.sleep(2)
+            pacer.pause('it_support.install')
             logging.info(f"{software} installed successfully on {system}.")
         elif choice == '5':
             logging.info("Exiting IT Support Panel.")
@@ -1615,41 +1909,43 @@ def it_support_panel():
         else:
             logging.info("Invalid choice. Please try again.")
 
+@metrics_registry.instrument()
+def valet_check_in(license_plate, owner_name, parking_spot=None):
+    """Park a vehicle and return its spot; a blank spot gets the nearest free one.
+
+    Raises ValetConflict when the spot is taken or unknown, the lot is full, or the car is already parked.
+    """
+    return valet.check_in(license_plate, owner_name, parking_spot or None)
+
+@metrics_registry.instrument()
+def valet_check_out(license_plate, owner_name):
+    """Mark a parked vehicle as checked out. Returns False when no matching vehicle is parked."""
+    return valet.check_out(license_plate, owner_name) is not None
+
 def valet_vehicle_management():
     """Valet: Manage vehicle check-in/check-out with database integration."""
     logging.info("\n--- Valet: Vehicle Management ---")
     action = input("Enter action: CI (Check In) / CO (Check Out)").strip().lower()
     license_plate = input("Enter vehicle license plate: ").strip()
     owner_name = input("Enter owner's name: ").strip()
-    conn = create_connection()
-    if conn is None:
-        logging.info("Database connection failed.")
-        return
-    cursor = conn.cursor()
     try:
-        if action == "check-in":
-            parking_spot = input("Enter assigned parking spot: ").strip()
-            check_in_time = datetime.now()
-            cursor.execute(
-                "INSERT INTO ValetVehicles (LicensePlate, OwnerName, ParkingSpot, Status, CheckInTime) VALUES (?, ?, ?, ?, ?)",
-                (license_plate, owner_name, parking_spot, "Checked-In", check_in_time)
-            )
-            conn.commit()
+        if action in ("ci", "check-in"):
+            parking_spot = input("Enter parking spot (leave blank to assign the nearest free spot): ").strip()
+            try:
+                parking_spot = valet_check_in(license_plate, owner_name, parking_spot)
+            except ValetConflict as e:
+                logging.info(str(e))
+                return
             logging.info(f"Vehicle {license_plate} checked in for {owner_name} at spot {parking_spot}.")
-        elif action == "check-out":
-            check_out_time = datetime.now()
-            cursor.execute(
-                "UPDATE ValetVehicles SET Status = ?, CheckOutTime = ? WHERE LicensePlate = ? AND OwnerName = ? AND Status = 'Checked-In'",
-                ("Checked-Out", check_out_time, license_plate, owner_name)
-            )
-            conn.commit()
-            logging.info(f"Vehicle {license_plate} checked out for {owner_name}.")
+        elif action in ("co", "check-out"):
+            if valet_check_out(license_plate, owner_name):
+                logging.info(f"Vehicle {license_plate} checked out for {owner_name}.")
+            else:
+                logging.info(f"No parked vehicle {license_plate} found for {owner_name}.")
         else:
-            logging.info("Invalid action. Please enter 'check-in' or 'check-out'.")
+            logging.info("Invalid action. Please enter 'CI' or 'CO'.")
     except Exception as e:
         logging.error(f"Error managing valet vehicle: {e}")
-    finally:
-        conn.close()
 
    
 def cutomer_panel():
@@ -1692,6 +1988,10 @@ def cutomer_panel():
 # Main Entry Point
 ## =========================
 def main():
+    events.start_from_config(config)
+    if metrics_registry.enabled and METRICS_PATH:
+        metrics_registry.start_writer(METRICS_PATH, METRICS_INTERVAL)
+    lockouts.start(LOCKOUT_FLUSH_INTERVAL)
     while True:
         os.system('cls')
         logging.info(f"Welcome to {HOTEL_NAME}!")
@@ -1706,7 +2006,17 @@ def main():
             admin_panel()
         elif choice == '3':
             logging.info("Exiting Program")
-            time.sleep(2)
+            pacer.pause('exit')
+            paced = pacer.stats()
+            logging.info(f"Simulated delays this session: {paced['waited_seconds']:.2f}s "
+                         f"over {sum(step['count'] for step in paced['steps'].values())} pause(s).")
+            logging.debug(f"Catalog cache stats: {catalog_cache.stats()}")
+            logging.debug(f"Pacing stats: {paced}")
+            logging.debug(f"Order stats: {order_store.metrics.stats()}")
+            logging.debug(f"Discount stats: {discounts.stats()}")
+            metrics_registry.stop_writer(METRICS_PATH)
+            lockouts.stop()
+            close_pool()
             sys.exit(1)
         else:
             logging.info("Invalid choice. Please try again.")
@@ -0,0 +1,335 @@
+"""Per-operation latency histograms, DB round trips, rows fetched and error counts.
+
+Wrap a function with @registry.instrument() or a block with `with registry.operation(name):`.
+Connections passed through registry.track() charge their statements and fetched rows to every
+operation active on the calling thread, so a flow and the helpers it calls are each accounted.
+"""
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+
+# Upper bounds in seconds; Prometheus adds +Inf.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class OperationStats:
+    __slots__ = ('calls', 'errors', 'round_trips', 'rows', 'seconds', 'max_seconds', 'buckets')
+
+    def __init__(self, bucket_count):
+        self.calls = self.errors = self.round_trips = self.rows = 0
+        self.seconds = self.max_seconds = 0.0
+        self.buckets = [0] * (bucket_count + 1)  # last slot is +Inf
+
+    def percentile(self, bounds, pct):
+        """Upper bound of the bucket holding the pct-th percentile call (None past the last bound)."""
+        if not self.calls:
+            return None
+        rank = max(1, -(-self.calls * pct // 100))
+        seen = 0
+        for bound, count in zip(bounds + (None,), self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class _Frame:
+    __slots__ = ('stats', 'round_trips', 'rows')
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.round_trips = self.rows = 0
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS, enabled=True):
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self._operations = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = None
+        self._stop = threading.Event()
+
+    def _stats(self, name):
+        stats = self._operations.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._operations.setdefault(name, OperationStats(len(self.buckets)))
+        return stats
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def operation(self, name):
+        """Context manager timing one call of the named operation."""
+        return _Operation(self, name)
+
+    def instrument(self, name=None):
+        """Decorator form of operation(); the name defaults to the function name."""
+        def decorate(func):
+            op_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Operation(self, op_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _enter(self, name):
+        frame = _Frame(self._stats(name))
+        self._stack().append(frame)
+        return frame
+
+    def _exit(self, frame, elapsed, failed):
+        stack = self._stack()
+        stack.pop()
+        stats = frame.stats
+        index = bisect.bisect_left(self.buckets, elapsed)
+        with self._lock:
+            stats.calls += 1
+            stats.errors += failed
+            stats.round_trips += frame.round_trips
+            stats.rows += frame.rows
+            stats.seconds += elapsed
+            if elapsed > stats.max_seconds:
+                stats.max_seconds = elapsed
+            stats.buckets[index] += 1
+
+    def record_round_trip(self):
+        for frame in getattr(self._local, 'stack', ()):
+            frame.round_trips += 1
+
+    def record_rows(self, count):
+        for frame in getattr(self._local, 'stack', ()):
+            frame.rows += count
+
+    def record_error(self):
+        """Charge an error to the innermost active operation (used for errors that are logged, not raised)."""
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            with self._lock:
+                stack[-1].stats.errors += 1
+
+    def track(self, connection):
+        """Wrap a DB-API connection so its statements and rows are counted."""
+        if not self.enabled:
+            return connection
+        return _TrackedConnection(self, connection)
+
+    def register_gauge(self, name, help_text, func):
+        """Expose func() (a number, or a {label_value: number} dict) as a gauge."""
+        self._gauges[name] = (help_text, func)
+
+    def snapshot(self):
+        """{operation: {...}} summary sorted by total time spent."""
+        with self._lock:
+            items = [(name, stats) for name, stats in self._operations.items() if stats.calls]
+            result = {}
+            for name, stats in sorted(items, key=lambda item: -item[1].seconds):
+                result[name] = {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'mean_ms': stats.seconds / stats.calls * 1000,
+                    'p50_ms': _ms(stats.percentile(self.buckets, 50)),
+                    'p95_ms': _ms(stats.percentile(self.buckets, 95)),
+                    'max_ms': stats.max_seconds * 1000,
+                    'round_trips_per_call': stats.round_trips / stats.calls,
+                    'rows_per_call': stats.rows / stats.calls,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+    def render_prometheus(self):
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            operations = sorted(self._operations.items())
+            lines += ["# HELP hotel_operation_duration_seconds Wall time per operation.",
+                      "# TYPE hotel_operation_duration_seconds histogram"]
+            for name, stats in operations:
+                label = _label(name)
+                cumulative = 0
+                for bound, count in zip(self.buckets, stats.buckets):
+                    cumulative += count
+                    lines.append(f'hotel_operation_duration_seconds_bucket{{operation="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'hotel_operation_duration_seconds_bucket{{operation="{label}",le="+Inf"}} {stats.calls}')
+                lines.append(f'hotel_operation_duration_seconds_sum{{operation="{label}"}} {stats.seconds:.6f}')
+                lines.append(f'hotel_operation_duration_seconds_count{{operation="{label}"}} {stats.calls}')
+            for metric, attribute, help_text in (
+                    ('hotel_operation_errors_total', 'errors', "Errors raised or logged during the operation."),
+                    ('hotel_operation_db_round_trips_total', 'round_trips', "Statements sent to the database."),
+                    ('hotel_operation_db_rows_total', 'rows', "Rows fetched from the database.")):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                lines += [f'{metric}{{operation="{_label(name)}"}} {getattr(stats, attribute)}' for name, stats in operations]
+        for name, (help_text, func) in sorted(self._gauges.items()):
+            try:
+                value = func()
+            except Exception as e:
+                logging.debug(f"Gauge {name} failed: {e}")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            if isinstance(value, dict):
+                lines += [f'{name}{{name="{_label(key)}"}} {number}' for key, number in sorted(value.items())]
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically replace path with the current metrics, for node_exporter's textfile collector."""
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(temporary, path)
+
+    def start_writer(self, path, interval=15):
+        """Rewrite the Prometheus file every interval seconds on a daemon thread."""
+        if self._writer is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.write_prometheus(path)
+                except OSError as e:
+                    logging.debug(f"Could not write metrics to {path}: {e}")
+
+        self._stop.clear()
+        self._writer = threading.Thread(target=loop, name='metrics-writer', daemon=True)
+        self._writer.start()
+
+    def stop_writer(self, path=None):
+        if self._writer is None:
+            return
+        self._stop.set()
+        self._writer.join()
+        self._writer = None
+        if path:
+            self.write_prometheus(path)
+
+
+class _Operation:
+    __slots__ = ('registry', 'name', 'frame', 'started')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.frame = self.registry._enter(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._exit(self.frame, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+
+class _TrackedConnection:
+    __slots__ = ('_registry', '_raw')
+
+    def __init__(self, registry, raw):
+        self._registry = registry
+        self._raw = raw
+
+    def cursor(self):
+        return _TrackedCursor(self._registry, self._raw.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class _TrackedCursor:
+    __slots__ = ('_registry', '_raw')
+
+    def __init__(self, registry, raw):
+        self._registry = registry
+        self._raw = raw
+
+    def execute(self, *args):
+        self._registry.record_round_trip()
+        self._raw.execute(*args)
+        return self
+
+    def executemany(self, *args):
+        self._registry.record_round_trip()
+        self._raw.executemany(*args)
+        return self
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None:
+            self._registry.record_rows(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._raw.fetchmany(*args)
+        self._registry.record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._registry.record_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        count = 0
+        try:
+            for row in self._raw:
+                count += 1
+                yield row
+        finally:
+            self._registry.record_rows(count)
+
+    def __setattr__(self, name, value):
+        if name in _TrackedCursor.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)  # e.g. fast_executemany
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class ErrorCounter(logging.Handler):
+    """Counts errors the application logs instead of raising against the active operation."""
+
+    def __init__(self, registry):
+        super().__init__(level=logging.ERROR)
+        self.registry = registry
+
+    def emit(self, record):
+        self.registry.record_error()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def format_snapshot(snapshot):
+    """Plain-text table for the admin Performance screen."""
+    if not snapshot:
+        return "No operations recorded yet."
+    lines = [f"{'operation':34} {'calls':>7} {'errors':>6} {'mean ms':>9} {'p95 ms':>8} {'max ms':>9} {'trips':>6} {'rows':>8}"]
+    for name, s in snapshot.items():
+        p95 = f"<{s['p95_ms']:g}" if s['p95_ms'] is not None else "slow"
+        lines.append(f"{name[:34]:34} {s['calls']:>7} {s['errors']:>6} {s['mean_ms']:>9.2f} {p95:>8} "
+                     f"{s['max_ms']:>9.2f} {s['round_trips_per_call']:>6.1f} {s['rows_per_call']:>8.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,398 @@
+"""Versioned schema migrations that bring a database to the schema main.py expects."""
+import argparse
+import configparser
+import logging
+import os
+
+from storage import SqliteBackend, backend_from_config
+
+VERSION_TABLE = 'SchemaMigrations'
+
+
+def _add_missing_columns(backend, cursor, table, definitions):
+    """ALTER TABLE statements for every column in definitions that the table lacks."""
+    existing = set(backend.table_columns(cursor, table))
+    keyword = 'ADD COLUMN' if backend.name == 'sqlite' else 'ADD'
+    return [f"ALTER TABLE {table} {keyword} {name} {ddl}" for name, ddl in definitions if name not in existing]
+
+
+def _rebuild_sqlite_table(backend, cursor, table, create_statement, copy_columns):
+    """SQLite cannot relax NOT NULL in place, so copy the rows into a fresh table."""
+    existing = backend.table_columns(cursor, table)
+    targets = [target for target, source in copy_columns if source in existing]
+    sources = [source for target, source in copy_columns if source in existing]
+    return [
+        backend.translate_ddl(create_statement.replace(f"CREATE TABLE {table} ", f"CREATE TABLE {table}_new ", 1)),
+        f"INSERT INTO {table}_new ({', '.join(targets)}) SELECT {', '.join(sources)} FROM {table}",
+        f"DROP TABLE {table}",
+        f"ALTER TABLE {table}_new RENAME TO {table}",
+    ]
+
+
+def _create_missing_indexes(backend, cursor, indexes):
+    return [
+        backend.create_index(name, table, columns, include)
+        for name, table, columns, include in indexes
+        if not backend.index_exists(cursor, table, name)
+    ]
+
+
+def items_menu_columns(backend, cursor):
+    """Items.Name and Items.PricingRule; ItemName and Quantity become optional for add_item()."""
+    columns = backend.table_columns(cursor, 'Items')
+    if backend.name == 'sqlite':
+        if 'Name' in columns and 'PricingRule' in columns:
+            return []
+        return _rebuild_sqlite_table(backend, cursor, 'Items', """
+            CREATE TABLE Items (
+                ItemID INT IDENTITY(1,1) PRIMARY KEY,
+                Name NVARCHAR(100),
+                ItemName NVARCHAR(100),
+                Quantity INT NOT NULL DEFAULT 0,
+                Price DECIMAL(10,2) NOT NULL,
+                PricingRule NVARCHAR(20),
+                Description NVARCHAR(255),
+                CreatedAt DATETIME DEFAULT GETDATE()
+            )""", [('ItemID', 'ItemID'), ('Name', 'Name' if 'Name' in columns else 'ItemName'),
+                   ('ItemName', 'ItemName'), ('Quantity', 'Quantity'), ('Price', 'Price'),
+                   ('PricingRule', 'PricingRule'), ('Description', 'Description'), ('CreatedAt', 'CreatedAt')])
+    statements = _add_missing_columns(backend, cursor, 'Items', [
+        ('Name', 'NVARCHAR(100) NULL'),
+        ('PricingRule', 'NVARCHAR(20) NULL'),
+    ])
+    if 'ItemName' in columns:
+        statements.append("UPDATE Items SET Name = ItemName WHERE Name IS NULL")
+        statements.append("ALTER TABLE Items ALTER COLUMN ItemName NVARCHAR(100) NULL")
+    if 'Quantity' in columns:
+        statements.append("ALTER TABLE Items ALTER COLUMN Quantity INT NULL")
+    return statements
+
+
+def users_login_columns(backend, cursor):
+    """Users.Password, FailedAttempts and LockoutTime used by admin_login(); PasswordHash becomes optional."""
+    columns = backend.table_columns(cursor, 'Users')
+    if backend.name == 'sqlite':
+        if {'Password', 'FailedAttempts', 'LockoutTime'} <= set(columns):
+            return []
+        return _rebuild_sqlite_table(backend, cursor, 'Users', """
+            CREATE TABLE Users (
+                UserID INT IDENTITY(1,1) PRIMARY KEY,
+                Username NVARCHAR(50) NOT NULL UNIQUE,
+                Password NVARCHAR(255),
+                PasswordHash NVARCHAR(255),
+                Role NVARCHAR(20) NOT NULL,
+                FailedAttempts INT NOT NULL DEFAULT 0,
+                LockoutTime DATETIME NULL,
+                CreatedAt DATETIME DEFAULT GETDATE()
+            )""", [('UserID', 'UserID'), ('Username', 'Username'), ('Password', 'Password'),
+                   ('PasswordHash', 'PasswordHash'), ('Role', 'Role'), ('FailedAttempts', 'FailedAttempts'),
+                   ('LockoutTime', 'LockoutTime'), ('CreatedAt', 'CreatedAt')])
+    statements = _add_missing_columns(backend, cursor, 'Users', [
+        ('Password', 'NVARCHAR(255) NULL'),
+        ('FailedAttempts', 'INT NOT NULL CONSTRAINT DF_Users_FailedAttempts DEFAULT 0'),
+        ('LockoutTime', 'DATETIME NULL'),
+    ])
+    if 'PasswordHash' in columns:
+        statements.append("ALTER TABLE Users ALTER COLUMN PasswordHash NVARCHAR(255) NULL")
+    return statements
+
+
+def transactions_and_inventory(backend, cursor):
+    """Tables written by record_transaction() and the inventory screens."""
+    statements = []
+    if not backend.table_exists(cursor, 'Transactions'):
+        statements.append("""
+            CREATE TABLE Transactions (
+                TransactionID INT IDENTITY(1,1) PRIMARY KEY,
+                ItemID INT NOT NULL,
+                Quantity INT NOT NULL,
+                CreatedAt DATETIME DEFAULT GETDATE()
+            )""")
+    if not backend.table_exists(cursor, 'Inventory'):
+        statements.append("""
+            CREATE TABLE Inventory (
+                ItemID INT IDENTITY(1,1) PRIMARY KEY,
+                Name NVARCHAR(100) NOT NULL,
+                Quantity INT NOT NULL DEFAULT 0,
+                Location NVARCHAR(100),
+                CreatedAt DATETIME DEFAULT GETDATE()
+            )""")
+    return [backend.translate_ddl(statement) for statement in statements]
+
+
+def hot_path_indexes(backend, cursor):
+    """Covering indexes for the guest, room, valet and login lookups."""
+    return _create_missing_indexes(backend, cursor, [
+        # validate_room / check_out / search by last name
+        ('IX_Reservations_LastName', 'Reservations', ['LastName'], ['RoomNumber', 'FirstName']),
+        # room lookups and the keyset-paginated listing
+        ('IX_Reservations_RoomNumber', 'Reservations', ['RoomNumber', 'ReservationID'],
+         ['Floor', 'LastName', 'FirstName', 'Status']),
+        # listing filtered by status
+        ('IX_Reservations_Status', 'Reservations', ['Status', 'RoomNumber', 'ReservationID'], ['Floor']),
+        # valet check-out by plate
+        ('IX_ValetVehicles_Plate_Status', 'ValetVehicles', ['LicensePlate', 'Status'], ['OwnerName', 'ParkingSpot']),
+        # admin_login
+        ('IX_Users_Username', 'Users', ['Username'], ['Password', 'FailedAttempts', 'LockoutTime', 'Role']),
+    ])
+
+
+def orders(backend, cursor):
+    """Orders header table; Transactions rows link to it and keep their unit price and redemption code."""
+    statements = []
+    if not backend.table_exists(cursor, 'Orders'):
+        statements.append(backend.translate_ddl("""
+            CREATE TABLE Orders (
+                OrderID INT IDENTITY(1,1) PRIMARY KEY,
+                RoomNumber NVARCHAR(10) NOT NULL,
+                LastName NVARCHAR(50),
+                Subtotal DECIMAL(10,2) NOT NULL,
+                DiscountCode VARCHAR(50),
+                DiscountPercentage DECIMAL(5,2),
+                Tax DECIMAL(10,2) NOT NULL DEFAULT 0,
+                Total DECIMAL(10,2) NOT NULL,
+                CreatedAt DATETIME DEFAULT GETDATE()
+            )"""))
+    statements += _add_missing_columns(backend, cursor, 'Transactions', [
+        ('OrderID', 'INT NULL'),
+        ('UnitPrice', 'DECIMAL(10,2) NULL'),
+        ('RedemptionCode', 'NVARCHAR(10) NULL'),
+    ])
+    return statements + _create_missing_indexes(backend, cursor, [
+        ('IX_Transactions_OrderID', 'Transactions', ['OrderID'], []),
+        ('IX_Orders_RoomNumber', 'Orders', ['RoomNumber', 'OrderID'], []),
+    ])
+
+
+def discount_created_index(backend, cursor):
+    """Index for the newest-code lookup on the discount management screen."""
+    return _create_missing_indexes(backend, cursor, [
+        ('IX_Discounts_CreatedAt', 'Discounts', ['CreatedAt', 'Code'], []),
+    ])
+
+
+def valet_status_index(backend, cursor):
+    """Covering index for rebuilding the valet lot from the vehicles still checked in."""
+    return _create_missing_indexes(backend, cursor, [
+        ('IX_ValetVehicles_Status', 'ValetVehicles', ['Status'], ['LicensePlate', 'OwnerName', 'ParkingSpot']),
+    ])
+
+
+def daily_rollup(backend, cursor):
+    """DailyRollup table written by the night audit, and the indexes its set-based statements seek on."""
+    statements = []
+    if not backend.table_exists(cursor, 'DailyRollup'):
+        statements.append(backend.translate_ddl("""
+            CREATE TABLE DailyRollup (
+                BusinessDate DATE PRIMARY KEY,
+                TotalRooms INT NULL,
+                OccupiedRooms INT NOT NULL,
+                Arrivals INT NOT NULL,
+                Departures INT NOT NULL,
+                CheckedOut INT NOT NULL,
+                ValetClosed INT NOT NULL,
+                Orders INT NOT NULL,
+                RoomServiceRevenue DECIMAL(12,2) NOT NULL,
+                RoomServiceTax DECIMAL(12,2) NOT NULL,
+                DiscountedOrders INT NOT NULL,
+                DiscountAmount DECIMAL(12,2) NOT NULL,
+                CreatedAt DATETIME DEFAULT GETDATE()
+            )"""))
+    return statements + _create_missing_indexes(backend, cursor, [
+        # departed stays still open, and occupancy / arrivals for the business date
+        ('IX_Reservations_Status_CheckOutDate', 'Reservations', ['Status', 'CheckOutDate'], []),
+        ('IX_Reservations_CheckOutDate', 'Reservations', ['CheckOutDate', 'CheckInDate'], ['RoomNumber']),
+        # the day's room-service orders
+        ('IX_Orders_CreatedAt', 'Orders', ['CreatedAt'], ['Subtotal', 'DiscountCode', 'Tax', 'Total']),
+    ])
+
+
+def archive_tables(backend, cursor):
+    """Archive tables that archive.py moves old checked-out stays and valet tickets into."""
+    statements = []
+    if not backend.table_exists(cursor, 'ReservationsArchive'):
+        statements.append(backend.translate_ddl("""
+            CREATE TABLE ReservationsArchive (
+                ReservationID INT PRIMARY KEY,
+                RoomNumber NVARCHAR(10) NOT NULL,
+                Floor INT,
+                LastName NVARCHAR(50),
+                FirstName NVARCHAR(50),
+                CheckInDate DATE,
+                CheckOutDate DATE,
+                Status NVARCHAR(20),
+                CreatedAt DATETIME,
+                ArchivedAt DATETIME DEFAULT GETDATE()
+            )"""))
+    if not backend.table_exists(cursor, 'ValetVehiclesArchive'):
+        statements.append(backend.translate_ddl("""
+            CREATE TABLE ValetVehiclesArchive (
+                ValetID INT PRIMARY KEY,
+                LicensePlate NVARCHAR(20) NOT NULL,
+                OwnerName NVARCHAR(100) NOT NULL,
+                ParkingSpot NVARCHAR(20),
+                Status NVARCHAR(20),
+                CheckInTime DATETIME,
+                CheckOutTime DATETIME,
+                CreatedAt DATETIME,
+                ArchivedAt DATETIME DEFAULT GETDATE()
+            )"""))
+    return statements + _create_missing_indexes(backend, cursor, [
+        # archive search by last name or room
+        ('IX_ReservationsArchive_LastName', 'ReservationsArchive', ['LastName'], ['RoomNumber', 'FirstName']),
+        ('IX_ReservationsArchive_RoomNumber', 'ReservationsArchive', ['RoomNumber', 'ReservationID'], []),
+        ('IX_ValetVehiclesArchive_Plate', 'ValetVehiclesArchive', ['LicensePlate'], []),
+        # picking the next batch of checked-out tickets to move
+        ('IX_ValetVehicles_Status_CheckOutTime', 'ValetVehicles', ['Status', 'CheckOutTime'], []),
+    ])
+
+
+def pricing_rules(backend, cursor):
+    """Items.Category and the PricingRules table, seeded with the old fixed Peak/OffPeak multipliers."""
+    statements = _add_missing_columns(backend, cursor, 'Items', [('Category', 'NVARCHAR(50) NULL')])
+    if not backend.table_exists(cursor, 'PricingRules'):
+        statements += [
+            backend.translate_ddl("""
+                CREATE TABLE PricingRules (
+                    RuleID INT IDENTITY(1,1) PRIMARY KEY,
+                    Name NVARCHAR(100) NOT NULL,
+                    Category NVARCHAR(50) NULL,
+                    PricingRule NVARCHAR(20) NULL,
+                    DaysOfWeek VARCHAR(7) NULL,
+                    StartHour INT NULL,
+                    EndHour INT NULL,
+                    MinOccupancy DECIMAL(5,2) NULL,
+                    MaxOccupancy DECIMAL(5,2) NULL,
+                    Multiplier DECIMAL(6,4) NOT NULL,
+                    Active BIT NOT NULL DEFAULT 1,
+                    CreatedAt DATETIME DEFAULT GETDATE()
+                )"""),
+            "INSERT INTO PricingRules (Name, PricingRule, Multiplier, Active) VALUES ('Peak items', 'Peak', 1.20, 1)",
+            "INSERT INTO PricingRules (Name, PricingRule, Multiplier, Active) VALUES ('Off-peak items', 'OffPeak', 0.90, 1)",
+        ]
+    return statements
+
+
+def inventory_stock(backend, cursor):
+    """Inventory.LowStockThreshold, and Items.InventoryID naming the stock a menu item draws on."""
+    return (_add_missing_columns(backend, cursor, 'Inventory', [('LowStockThreshold', 'INT NULL')])
+            + _add_missing_columns(backend, cursor, 'Items', [('InventoryID', 'INT NULL')]))
+
+
+# (version, name, function returning the statements to run). Append only; never renumber.
+MIGRATIONS = [
+    (1, 'items_menu_columns', items_menu_columns),
+    (2, 'users_login_columns', users_login_columns),
+    (3, 'transactions_and_inventory', transactions_and_inventory),
+    (4, 'hot_path_indexes', hot_path_indexes),
+    (5, 'orders', orders),
+    (6, 'discount_created_index', discount_created_index),
+    (7, 'valet_status_index', valet_status_index),
+    (8, 'daily_rollup', daily_rollup),
+    (9, 'archive_tables', archive_tables),
+    (10, 'pricing_rules', pricing_rules),
+    (11, 'inventory_stock', inventory_stock),
+]
+
+
+def _ensure_version_table(backend, conn):
+    cursor = conn.cursor()
+    if not backend.table_exists(cursor, VERSION_TABLE):
+        cursor.execute(backend.translate_ddl(f"""
+            CREATE TABLE {VERSION_TABLE} (
+                Version INT PRIMARY KEY,
+                Name NVARCHAR(100) NOT NULL,
+                AppliedAt DATETIME DEFAULT GETDATE()
+            )"""))
+        conn.commit()
+
+
+def applied_migrations(backend, conn):
+    """{version: (name, applied_at)} for every migration already run."""
+    _ensure_version_table(backend, conn)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT Version, Name, AppliedAt FROM {VERSION_TABLE}")
+    return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+
+def pending_migrations(backend):
+    """[(version, name), ...] not yet applied to the database."""
+    conn = backend.connect()
+    try:
+        applied = applied_migrations(backend, conn)
+    finally:
+        conn.close()
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(backend, target=None):
+    """Apply pending migrations in order, each in its own transaction. Returns the versions applied."""
+    conn = backend.connect()
+    done = []
+    try:
+        applied = applied_migrations(backend, conn)
+        for version, name, migration in MIGRATIONS:
+            if version in applied or (target is not None and version > target):
+                continue
+            cursor = conn.cursor()
+            try:
+                backend.begin(cursor)
+                for statement in migration(backend, cursor):
+                    cursor.execute(statement)
+                cursor.execute(f"INSERT INTO {VERSION_TABLE} (Version, Name) VALUES (?, ?)", (version, name))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logging.error(f"Migration {version} ({name}) failed; rolled back.")
+                raise
+            logging.info(f"Applied migration {version}: {name}")
+            done.append(version)
+    finally:
+        conn.close()
+    return done
+
+
+def prepare_database(backend):
+    """Create the base tables from database.sql and apply every migration."""
+    backend.bootstrap_schema()
+    return upgrade(backend)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations.")
+    parser.add_argument('command', choices=['status', 'upgrade'],
+                        help="status: list applied and pending migrations; upgrade: apply pending ones")
+    parser.add_argument('--to', type=int, metavar='VERSION', help="upgrade no further than this version")
+    parser.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.sqlite:
+        backend = SqliteBackend(args.sqlite)
+    else:
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        backend = backend_from_config(config)
+
+    if args.command == 'upgrade':
+        backend.bootstrap_schema()
+        applied = upgrade(backend, args.to)
+        print(f"Applied {len(applied)} migration(s)." if applied else "Database is up to date.")
+        return 0
+
+    conn = backend.connect()
+    try:
+        applied = applied_migrations(backend, conn)
+    finally:
+        conn.close()
+    for version, name, _ in MIGRATIONS:
+        state = f"applied {applied[version][1]}" if version in applied else "pending"
+        print(f"{version:04d} {name:32} {state}")
+    pending = sum(1 for version, _, _ in MIGRATIONS if version not in applied)
+    print(f"{pending} pending migration(s).")
+    return 1 if pending else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
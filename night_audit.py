@@ -0,0 +1,142 @@
+"""End-of-day audit: close departed stays and stale valet tickets, then roll the day up into DailyRollup."""
+import argparse
+import configparser
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from statements import COUNT, declare
+from storage import SqliteBackend, backend_from_config
+
+DEFAULT_VALET_STALE_HOURS = 72
+
+ROLLUP_COLUMNS = ('BusinessDate', 'TotalRooms', 'OccupiedRooms', 'Arrivals', 'Departures', 'CheckedOut',
+                  'ValetClosed', 'Orders', 'RoomServiceRevenue', 'RoomServiceTax', 'DiscountedOrders',
+                  'DiscountAmount')
+
+CHECK_OUT_DEPARTED = declare(
+    'audit.check_out_departed',
+    "UPDATE Reservations SET Status = 'CheckedOut' "
+    "WHERE (Status = 'Active' OR Status IS NULL) AND CheckOutDate <= ?", ('business_date',), COUNT)
+
+CLOSE_STALE_VALET = declare(
+    'audit.close_stale_valet',
+    "UPDATE ValetVehicles SET Status = 'Checked-Out', CheckOutTime = ? "
+    "WHERE Status = 'Checked-In' AND CheckInTime < ?", ('check_out_time', 'checked_in_before'), COUNT)
+
+CLEAR_ROLLUP = declare('audit.clear_rollup', "DELETE FROM DailyRollup WHERE BusinessDate = ?", ('business_date',),
+                       COUNT)
+
+# Occupancy counts the rooms sold for the night starting on the business date; stays are [check_in, check_out).
+INSERT_ROLLUP = declare(
+    'audit.insert_rollup',
+    f"INSERT INTO DailyRollup ({', '.join(ROLLUP_COLUMNS)}) "
+    "SELECT ?, ?, "
+    "(SELECT COUNT(DISTINCT RoomNumber) FROM Reservations WHERE CheckOutDate > ? AND CheckInDate <= ?), "
+    "(SELECT COUNT(*) FROM Reservations WHERE CheckOutDate > ? AND CheckInDate = ?), "
+    "(SELECT COUNT(*) FROM Reservations WHERE CheckOutDate = ?), "
+    "?, ?, o.Orders, o.Revenue, o.Tax, o.DiscountedOrders, o.DiscountAmount "
+    "FROM (SELECT COUNT(*) AS Orders, "
+    "COALESCE(ROUND(SUM(Total - Tax), 2), 0) AS Revenue, "
+    "COALESCE(ROUND(SUM(Tax), 2), 0) AS Tax, "
+    "COUNT(DiscountCode) AS DiscountedOrders, "
+    "COALESCE(ROUND(SUM(Subtotal - (Total - Tax)), 2), 0) AS DiscountAmount "
+    "FROM Orders WHERE CreatedAt >= ? AND CreatedAt < ?) o",
+    ('business_date', 'total_rooms', 'business_date', 'business_date', 'business_date', 'business_date',
+     'business_date', 'checked_out', 'valet_closed', 'day_start', 'day_end'), COUNT)
+
+ROLLUPS = declare('audit.rollups', f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM DailyRollup "
+                  "WHERE BusinessDate >= ? AND BusinessDate <= ? ORDER BY BusinessDate", ('start', 'end'))
+
+
+def run_night_audit(backend, business_date=None, total_rooms=None, valet_stale_hours=DEFAULT_VALET_STALE_HOURS):
+    """Audit business_date (default: today) in one transaction and return its DailyRollup row as a dict.
+
+    Re-running the audit for a date replaces that date's rollup.
+    """
+    business_date = business_date or date.today()
+    day_start = datetime.combine(business_date, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    started = time.perf_counter()
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        backend.begin(cursor)
+        checked_out = max(CHECK_OUT_DEPARTED.execute(cursor, backend, business_date).rowcount, 0)
+        valet_closed = max(CLOSE_STALE_VALET.execute(
+            cursor, backend, datetime.now(), day_end - timedelta(hours=valet_stale_hours)).rowcount, 0)
+        CLEAR_ROLLUP.execute(cursor, backend, business_date)
+        INSERT_ROLLUP.execute(
+            cursor, backend,
+            business_date, total_rooms or None,
+            business_date, business_date,
+            business_date, business_date,
+            business_date,
+            checked_out, valet_closed,
+            day_start, day_end)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    rollup = load_rollups(backend, business_date, business_date)[0]
+    logging.info(f"Night audit for {business_date} finished in {time.perf_counter() - started:.2f}s: "
+                 f"{checked_out} stays checked out, {valet_closed} valet tickets closed.")
+    return rollup
+
+
+def load_rollups(backend, start, end):
+    """DailyRollup rows for start..end inclusive, oldest first, as dicts."""
+    conn = backend.connect()
+    try:
+        cursor = ROLLUPS.execute(conn.cursor(), backend, start, end)
+        return [dict(zip(ROLLUP_COLUMNS, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def format_rollups(rollups):
+    """Plain-text table of rollups for the terminal."""
+    if not rollups:
+        return "No rollups recorded for that period."
+    lines = [f"{'date':10} {'occupied':>9} {'occ %':>6} {'arr':>5} {'dep':>5} {'orders':>7} "
+             f"{'revenue':>11} {'tax':>9} {'disc':>5} {'discount $':>11}"]
+    for r in rollups:
+        occupancy = f"{r['OccupiedRooms'] / r['TotalRooms']:.0%}" if r['TotalRooms'] else "-"
+        lines.append(f"{str(r['BusinessDate']):10} {r['OccupiedRooms']:>9} {occupancy:>6} {r['Arrivals']:>5} "
+                     f"{r['Departures']:>5} {r['Orders']:>7} {r['RoomServiceRevenue']:>11.2f} "
+                     f"{r['RoomServiceTax']:>9.2f} {r['DiscountedOrders']:>5} {r['DiscountAmount']:>11.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the night audit or show past daily rollups.")
+    parser.add_argument('command', choices=['run', 'report'],
+                        help="run: close the business date and write its rollup; report: print recent rollups")
+    parser.add_argument('--date', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="business date to audit, or last date to report (default: today)")
+    parser.add_argument('--days', type=int, default=7, help="days to include in the report")
+    parser.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+    business_date = args.date or date.today()
+    if args.command == 'run':
+        total_rooms = (config.getint('availability', 'floors', fallback=0)
+                       * config.getint('availability', 'rooms_per_floor', fallback=0))
+        rollup = run_night_audit(backend, business_date, total_rooms,
+                                 config.getint('audit', 'valet_stale_hours', fallback=DEFAULT_VALET_STALE_HOURS))
+        print(format_rollups([rollup]))
+        return 0
+    print(format_rollups(load_rollups(backend, business_date - timedelta(days=max(args.days, 1) - 1), business_date)))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+"""Order cart: collect and price line items in memory, then persist the order in one transaction."""
+import threading
+import time
+
+import events
+from billing import money, percent_of, to_decimal
+from statements import COUNT, ROW, declare
+
+INSERT_ORDER = declare(
+    'orders.insert',
+    "INSERT INTO Orders (RoomNumber, LastName, Subtotal, DiscountCode, DiscountPercentage, Tax, Total) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+    ('room_number', 'last_name', 'subtotal', 'discount_code', 'discount_percentage', 'tax', 'total'), ROW,
+    returning='OrderID')
+INSERT_LINE = declare(
+    'orders.insert_line',
+    "INSERT INTO Transactions (OrderID, ItemID, Quantity, UnitPrice, RedemptionCode) VALUES (?, ?, ?, ?, ?)",
+    ('order_id', 'item_id', 'quantity', 'unit_price', 'redemption_code'), COUNT)
+
+
+class OrderCart:
+    """Line items for one room's order, priced once when they are added. Amounts are Decimal."""
+
+    def __init__(self, room_number, last_name=None):
+        self.room_number = room_number
+        self.last_name = last_name
+        self.lines = {}  # item_id -> [name, quantity, unit_price, redemption_code]
+        self.discount_code = None
+        self.discount_percentage = None
+
+    def add(self, item_id, name, unit_price, quantity, redemption_code):
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive number.")
+        line = self.lines.get(item_id)
+        if line:
+            line[1] += quantity  # same item again: one line, one redemption code
+        else:
+            self.lines[item_id] = [name, quantity, money(unit_price), redemption_code]
+        return self.lines[item_id]
+
+    def remove(self, item_id):
+        return self.lines.pop(item_id, None) is not None
+
+    def apply_discount(self, code, percentage):
+        self.discount_code = code
+        self.discount_percentage = percentage
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def subtotal(self):
+        return sum((quantity * price for _, quantity, price, _ in self.lines.values()), money(0))
+
+    @property
+    def total(self):
+        """Subtotal after any discount, before tax."""
+        if self.discount_percentage is None:
+            return self.subtotal
+        return self.subtotal - percent_of(self.subtotal, self.discount_percentage)
+
+    def tax(self, rate):
+        return money(self.total * to_decimal(rate))
+
+
+class OrderMetrics:
+    """Latency of persisted orders, kept as a bounded window of recent samples."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = []
+        self.orders = 0
+        self.lines = 0
+        self.failures = 0
+
+    def record(self, seconds, lines):
+        with self._lock:
+            self.orders += 1
+            self.lines += lines
+            self._samples.append(seconds * 1000)
+            if len(self._samples) > self._window:
+                del self._samples[0]
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        result = {'orders': self.orders, 'lines': self.lines, 'failures': self.failures}
+        if samples:
+            result.update({
+                'mean_ms': round(sum(samples) / len(samples), 3),
+                'p50_ms': round(samples[(len(samples) - 1) // 2], 3),
+                'p95_ms': round(samples[max(0, -(-len(samples) * 95 // 100) - 1)], 3),
+                'max_ms': round(samples[-1], 3),
+            })
+        return result
+
+
+class OrderStore:
+    """Writes an order header and all of its Transactions rows in a single transaction.
+
+    With an InventoryService, the stock for every line is taken in the same transaction, so
+    an order is either placed with its stock or not at all.
+    """
+
+    def __init__(self, connection_factory, backend_factory, metrics=None, inventory=None):
+        self._connect = connection_factory
+        self._backend = backend_factory
+        self.metrics = metrics or OrderMetrics()
+        self.inventory = inventory
+
+    def _needs(self, cart):
+        if self.inventory is None:
+            return {}
+        return self.inventory.requirements((item_id, line[1]) for item_id, line in cart.lines.items())
+
+    def check_stock(self, cart):
+        """Raise OutOfStock if the cart needs more than is on hand now. Call before taking payment."""
+        needs = self._needs(cart)
+        if needs:
+            self.inventory.check(needs)
+
+    def place(self, cart, tax_rate=0):
+        """Persist a paid cart and return its OrderID. Nothing is written if any statement fails."""
+        if not cart.lines:
+            raise ValueError("The order has no items.")
+        started = time.perf_counter()
+        total = cart.total
+        tax = cart.tax(tax_rate)
+        needs = self._needs(cart)
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            backend = self._backend()
+            stock = self.inventory.reserve(cursor, needs) if needs else {}
+            INSERT_ORDER.execute(cursor, backend, cart.room_number, cart.last_name, cart.subtotal,
+                                 cart.discount_code, cart.discount_percentage, tax, total + tax)
+            order_id = cursor.fetchone()[0]
+            if hasattr(cursor, 'fast_executemany'):
+                cursor.fast_executemany = True
+            INSERT_LINE.executemany(
+                cursor, backend,
+                [(order_id, item_id, quantity, price, code)
+                 for item_id, (_, quantity, price, code) in cart.lines.items()])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self.metrics.failed()
+            raise
+        finally:
+            conn.close()
+        elapsed = time.perf_counter() - started
+        self.metrics.record(elapsed, len(cart.lines))
+        if stock:
+            self.inventory.observe(stock)
+        events.emit('order.placed', order_id=order_id, room=cart.room_number, lines=len(cart.lines),
+                    total=total + tax, latency_ms=round(elapsed * 1000, 3))
+        return order_id
@@ -0,0 +1,88 @@
+"""Named, configurable simulated delays for the guest-facing flows."""
+import threading
+import time
+
+# step name -> seconds. The defaults reproduce the pauses the kiosk has always shown.
+DEFAULT_DELAYS = {
+    'validate_room': 2,
+    'check_in.checking': 2,
+    'check_in.verify_identity': 2,
+    'check_in.finalize': 1,
+    'check_in.key_card': 2,
+    'check_in.redirect': 2,
+    'check_in.verify_id': 2,
+    'check_in.verify_room': 2,
+    'security.between_lines': 4,
+    'security.typing': 2,
+    'track_order_status': 3,
+    'contact_concierge': 2,
+    'it_support.network_test': 2,
+    'it_support.diagnostics': 2,
+    'it_support.install': 2,
+    'exit': 2,
+}
+MODES = ('realtime', 'off')
+
+
+class Pacer:
+    """Sleeps for named steps and keeps track of the time spent doing so.
+
+    mode 'off' skips every wait, for batch runs, benchmarks and scripted sessions.
+    scale multiplies every delay, e.g. 0.1 for a fast demo.
+    """
+
+    def __init__(self, delays=None, mode='realtime', scale=1.0, sleep=time.sleep):
+        if mode not in MODES:
+            raise ValueError(f"Unknown pacing mode {mode!r}; expected one of {', '.join(MODES)}.")
+        self.delays = dict(DEFAULT_DELAYS, **(delays or {}))
+        self.mode = mode
+        self.scale = scale
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._waited = 0.0
+        self._counts = {}
+        self._seconds = {}
+
+    @classmethod
+    def from_config(cls, config, section='pacing'):
+        """Build from a [pacing] section: mode, scale, and optional per-step overrides in seconds."""
+        if not config.has_section(section):
+            return cls()
+        delays = {name: config.getfloat(section, name) for name in config.options(section)
+                  if name in DEFAULT_DELAYS}
+        return cls(delays, mode=config.get(section, 'mode', fallback='realtime').strip().lower(),
+                   scale=config.getfloat(section, 'scale', fallback=1.0))
+
+    def delay_for(self, step):
+        if self.mode == 'off':
+            return 0.0
+        return self.delays[step] * self.scale
+
+    def pause(self, step):
+        """Wait for the configured delay of step and return the seconds actually spent."""
+        seconds = self.delay_for(step)
+        started = time.perf_counter()
+        if seconds > 0:
+            self._sleep(seconds)
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._waited += waited
+            self._counts[step] = self._counts.get(step, 0) + 1
+            self._seconds[step] = self._seconds.get(step, 0.0) + waited
+        return waited
+
+    def reset(self):
+        with self._lock:
+            self._waited = 0.0
+            self._counts.clear()
+            self._seconds.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'scale': self.scale,
+                'waited_seconds': round(self._waited, 3),
+                'steps': {step: {'count': self._counts[step], 'seconds': round(self._seconds[step], 3)}
+                          for step in sorted(self._counts)},
+            }
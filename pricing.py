@@ -0,0 +1,359 @@
+"""Room-service pricing: PricingRules compiled once into multiplier tables, applied to a whole menu in one pass."""
+import argparse
+import configparser
+import logging
+import os
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+
+from billing import money, to_decimal
+from statements import COUNT, ROW, declare
+from storage import SqliteBackend, backend_from_config
+
+# Stay well under the bind-parameter limits of SQL Server (2100) and SQLite (999).
+MAX_IN_PARAMS = 500
+ONE = Decimal(1)
+_BELOW = object()  # occupancy band under the lowest breakpoint
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# One active PricingRules row. days is a string of weekday digits (Monday = 0), hours run
+# [start_hour, end_hour) and may wrap past midnight, occupancy is a percent range [min, max), except
+# that a max of 100 or more also covers a full house.
+# Unset conditions match everything; the multipliers of every matching rule are multiplied together.
+Rule = namedtuple('Rule', 'rule_id name category tag days start_hour end_hour min_occupancy max_occupancy multiplier')
+
+RULE_COLUMNS = ('RuleID', 'Name', 'Category', 'PricingRule', 'DaysOfWeek', 'StartHour', 'EndHour',
+                'MinOccupancy', 'MaxOccupancy', 'Multiplier')
+
+ACTIVE_RULES = declare('pricing.rules',
+                       f"SELECT {', '.join(RULE_COLUMNS)} FROM PricingRules WHERE Active = 1 ORDER BY RuleID")
+INSERT_RULE = declare('pricing.insert_rule',
+                      "INSERT INTO PricingRules (Name, Category, PricingRule, DaysOfWeek, StartHour, EndHour, "
+                      "MinOccupancy, MaxOccupancy, Multiplier, Active) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)",
+                      ('name', 'category', 'tag', 'days', 'start_hour', 'end_hour', 'min_occupancy',
+                       'max_occupancy', 'multiplier'), ROW, returning='RuleID')
+RETIRE_RULE = declare('pricing.retire_rule', "UPDATE PricingRules SET Active = 0 WHERE RuleID = ?", ('rule_id',),
+                      COUNT)
+ITEM_ROWS = declare('pricing.items', "SELECT ItemID, Name, Price, PricingRule, Category FROM Items ORDER BY ItemID")
+ITEM_ROWS_BY_ID = declare('pricing.items_by_id',
+                          lambda count: "SELECT ItemID, Name, Price, PricingRule, Category FROM Items "
+                                        f"WHERE ItemID IN ({', '.join('?' * count)})", ('item_ids',))
+
+
+def _matches_hour(rule, hour):
+    if rule.start_hour is None or rule.end_hour is None:
+        return True
+    if rule.start_hour <= rule.end_hour:
+        return rule.start_hour <= hour < rule.end_hour
+    return hour >= rule.start_hour or hour < rule.end_hour
+
+
+def _matches_band(rule, low):
+    """low is the bottom of an occupancy band, _BELOW under the first breakpoint, or None when occupancy is unknown."""
+    if rule.min_occupancy is None and rule.max_occupancy is None:
+        return True
+    if low is None:
+        return False
+    if low is _BELOW:
+        return rule.min_occupancy is None
+    if rule.min_occupancy is not None and low < rule.min_occupancy:
+        return False
+    return rule.max_occupancy is None or low < rule.max_occupancy or rule.max_occupancy >= 100
+
+
+class MultiplierTable:
+    """The rules in force for one (weekday, hour, occupancy band), pre-multiplied.
+
+    base applies to every item; by_category, by_tag and by_pair to items of a category,
+    a PricingRule tag, or both. multiplier() memoizes per (category, tag), so after the
+    first item of each kind pricing is one dict lookup however many rules there are.
+    """
+
+    def __init__(self, rules):
+        self.rule_ids = tuple(rule.rule_id for rule in rules)
+        self.base = ONE
+        self.by_category, self.by_tag, self.by_pair = {}, {}, {}
+        for rule in rules:
+            if rule.category is None and rule.tag is None:
+                self.base *= rule.multiplier
+            elif rule.tag is None:
+                self.by_category[rule.category] = self.by_category.get(rule.category, ONE) * rule.multiplier
+            elif rule.category is None:
+                self.by_tag[rule.tag] = self.by_tag.get(rule.tag, ONE) * rule.multiplier
+            else:
+                key = (rule.category, rule.tag)
+                self.by_pair[key] = self.by_pair.get(key, ONE) * rule.multiplier
+        self._memo = {}
+
+    def multiplier(self, category, tag):
+        key = (category, tag)
+        value = self._memo.get(key)
+        if value is None:
+            value = (self.base * self.by_category.get(category, ONE) * self.by_tag.get(tag, ONE)
+                     * self.by_pair.get(key, ONE))
+            self._memo[key] = value
+        return value
+
+
+class CompiledRules:
+    """Every (weekday, hour, occupancy band) mapped to its MultiplierTable, built once per rule set.
+
+    Occupancy bands are cut at the distinct MinOccupancy/MaxOccupancy values of the rules, so a
+    lookup is a bisect over a handful of breakpoints plus one list index. Slots with the same
+    matching rules share one table.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.breakpoints = sorted({bound for rule in self.rules for bound in (rule.min_occupancy, rule.max_occupancy)
+                                   if bound is not None})
+        lows = [None, _BELOW] + self.breakpoints  # unknown occupancy, below the first breakpoint, then each band
+        shared = {}
+        self._slots = []
+        for day in range(7):
+            for hour in range(24):
+                in_slot = [rule for rule in self.rules if (not rule.days or str(day) in rule.days)
+                           and _matches_hour(rule, hour)]
+                bands = []
+                for low in lows:
+                    matching = [rule for rule in in_slot if _matches_band(rule, low)]
+                    key = tuple(rule.rule_id for rule in matching)
+                    if key not in shared:
+                        shared[key] = MultiplierTable(matching)
+                    bands.append(shared[key])
+                self._slots.append(bands)
+        self.tables = len(shared)
+
+    def table(self, moment, occupancy=None):
+        """MultiplierTable for a datetime and an occupancy percent (None when unknown)."""
+        bands = self._slots[moment.weekday() * 24 + moment.hour]
+        if occupancy is None:
+            return bands[0]
+        return bands[1 + bisect_right(self.breakpoints, occupancy)]
+
+    def price_rows(self, rows, moment, occupancy=None):
+        """[(item_id, name, price), ...] for (ItemID, Name, Price, PricingRule, Category) rows, in one pass."""
+        multiplier = self.table(moment, occupancy).multiplier
+        return [(item_id, name, money(to_decimal(price) * multiplier(category, tag)))
+                for item_id, name, price, tag, category in rows]
+
+
+def load_rules(cursor, backend):
+    """Active PricingRules rows as Rules, oldest first."""
+    ACTIVE_RULES.execute(cursor, backend)
+    return [Rule(rule_id, name, category or None, tag or None, days or None, start_hour, end_hour,
+                 None if min_occupancy is None else to_decimal(min_occupancy),
+                 None if max_occupancy is None else to_decimal(max_occupancy), to_decimal(multiplier))
+            for (rule_id, name, category, tag, days, start_hour, end_hour, min_occupancy, max_occupancy,
+                 multiplier) in cursor.fetchall()]
+
+
+class PricingEngine:
+    """Prices Items through the compiled PricingRules.
+
+    The raw item rows and the compiled rules are what get cached (in the CatalogCache when one
+    is supplied), never the prices, since those change with the hour and the occupancy.
+    occupancy is a callable returning the current occupancy percent, or None when unknown.
+    """
+
+    def __init__(self, connection_factory, backend_factory, cache=None, occupancy=None, clock=datetime.now):
+        self._connect = connection_factory
+        self._backend = backend_factory
+        self.cache = cache
+        self.occupancy = occupancy
+        self.clock = clock
+        self._compiled = None  # used when there is no cache
+
+    def _conditions(self, at, occupancy):
+        if occupancy is None and self.occupancy is not None:
+            occupancy = self.occupancy()
+        return at or self.clock(), None if occupancy is None else to_decimal(occupancy)
+
+    def compiled(self):
+        """The active rules compiled into multiplier tables, loaded once per cache lifetime."""
+        if self.cache is not None:
+            return self.cache.get_or_load('pricing.rules', self._compile)
+        if self._compiled is None:
+            self._compiled = self._compile()
+        return self._compiled
+
+    def invalidate(self):
+        self._compiled = None
+        if self.cache is not None:
+            self.cache.invalidate('pricing.rules')
+
+    def _compile(self):
+        conn = self._connect()
+        try:
+            rules = load_rules(conn.cursor(), self._backend())
+        finally:
+            conn.close()
+        compiled = CompiledRules(rules)
+        logging.debug(f"Compiled {len(rules)} pricing rule(s) into {compiled.tables} multiplier table(s).")
+        return compiled
+
+    def menu(self, at=None, occupancy=None):
+        """Return [(item_id, name, price), ...] for every item, priced for the given (default: current) conditions."""
+        rows = self._load_items() if self.cache is None else self.cache.get_or_load('pricing.items', self._load_items)
+        return self.compiled().price_rows(rows, *self._conditions(at, occupancy))
+
+    def _load_items(self):
+        conn = self._connect()
+        try:
+            return [tuple(row) for row in ITEM_ROWS.execute(conn.cursor(), self._backend()).fetchall()]
+        finally:
+            conn.close()
+
+    def price_many(self, item_ids, at=None, occupancy=None):
+        """Return {item_id: price} for the requested items; unknown IDs are left out."""
+        ids = list(dict.fromkeys(item_ids))
+        rows = []
+        if self.cache is not None:
+            for item_id in ids:
+                row = self.cache.get(('pricing.item', item_id))
+                if row is not None:
+                    rows.append(row)
+            cached = {row[0] for row in rows}
+            ids = [item_id for item_id in ids if item_id not in cached]
+        if ids:
+            found = []
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                backend = self._backend()
+                for start in range(0, len(ids), MAX_IN_PARAMS):
+                    chunk = ids[start:start + MAX_IN_PARAMS]
+                    ITEM_ROWS_BY_ID.execute(cursor, backend, *chunk, count=len(chunk))
+                    found += [tuple(row) for row in cursor.fetchall()]
+            finally:
+                conn.close()
+            if self.cache is not None:
+                for row in found:
+                    self.cache.put(('pricing.item', row[0]), row)
+            if len(found) < len(ids):
+                logging.debug(f"{len(ids) - len(found)} item(s) not found while pricing.")
+            rows += found
+        if not rows:
+            return {}
+        return {item_id: price for item_id, _, price in
+                self.compiled().price_rows(rows, *self._conditions(at, occupancy))}
+
+
+def describe(rule):
+    """One line for a rule: its conditions and multiplier."""
+    conditions = []
+    if rule.category:
+        conditions.append(f"category {rule.category}")
+    if rule.tag:
+        conditions.append(f"tag {rule.tag}")
+    if rule.days:
+        conditions.append("on " + ",".join(DAY_NAMES[int(day)] for day in rule.days))
+    if rule.start_hour is not None and rule.end_hour is not None:
+        conditions.append(f"{rule.start_hour:02d}:00-{rule.end_hour:02d}:00")
+    if rule.min_occupancy is not None or rule.max_occupancy is not None:
+        conditions.append(f"occupancy {rule.min_occupancy or 0:g}-{rule.max_occupancy or 100:g}%")
+    return f"{rule.rule_id}. {rule.name}: x{rule.multiplier} {' '.join(conditions) or 'always'}"
+
+
+def _days(value):
+    days = "".join(sorted(set(value.replace(',', '').strip())))
+    if not days or any(day not in '0123456' for day in days):
+        raise argparse.ArgumentTypeError(f"expected weekday digits 0-6 (Monday = 0), got {value!r}")
+    return days
+
+
+def _range(value):
+    low, _, high = value.partition('-')
+    try:
+        return to_decimal(low) if low.strip() else None, to_decimal(high) if high.strip() else None
+    except ArithmeticError:
+        raise argparse.ArgumentTypeError(f"expected LOW-HIGH, got {value!r}") from None
+
+
+def add_rule(backend, name, multiplier, category=None, tag=None, days=None, hours=(None, None),
+             occupancy=(None, None)):
+    """Insert an active rule and return its RuleID."""
+    conn = backend.connect()
+    try:
+        cursor = INSERT_RULE.execute(
+            conn.cursor(), backend, name, category, tag, days, None if hours[0] is None else int(hours[0]),
+            None if hours[1] is None else int(hours[1]), occupancy[0], occupancy[1], to_decimal(multiplier))
+        rule_id = cursor.fetchone()[0]
+        conn.commit()
+        return rule_id
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List, add, remove and preview room-service pricing rules.")
+    parser.add_argument('command', choices=['list', 'add', 'remove', 'preview'],
+                        help="preview prints the menu priced for --at and --occupancy, and the time it took")
+    parser.add_argument('--name', help="rule name (add)")
+    parser.add_argument('--multiplier', help="price multiplier, e.g. 1.15 (add)")
+    parser.add_argument('--category', help="only items in this category")
+    parser.add_argument('--tag', help="only items with this Items.PricingRule tag")
+    parser.add_argument('--days', type=_days, help="weekday digits, Monday = 0, e.g. 56 for weekends")
+    parser.add_argument('--hours', type=_range, default=(None, None), metavar='START-END',
+                        help="hours of the day, e.g. 22-6 wraps past midnight")
+    parser.add_argument('--occupancy', type=_range, default=(None, None), metavar='MIN-MAX',
+                        help="occupancy percent range (add), or the single percent to preview with")
+    parser.add_argument('--rule-id', type=int, help="rule to deactivate (remove)")
+    parser.add_argument('--at', type=datetime.fromisoformat, metavar='YYYY-MM-DDTHH:MM',
+                        help="moment to preview (default: now)")
+    parser.add_argument('--sqlite', metavar='PATH', help="use this SQLite file instead of the configured backend")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = SqliteBackend(args.sqlite) if args.sqlite else backend_from_config(config)
+    if args.command == 'add' and not (args.name and args.multiplier):
+        parser.error("add needs --name and --multiplier")
+    if args.command == 'remove' and args.rule_id is None:
+        parser.error("remove needs --rule-id")
+    if args.command == 'add':
+        rule_id = add_rule(backend, args.name, args.multiplier, args.category, args.tag, args.days, args.hours,
+                           args.occupancy)
+        logging.info(f"Added pricing rule {rule_id}.")
+        return 0
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        if args.command == 'remove':
+            removed = RETIRE_RULE.execute(cursor, backend, args.rule_id).rowcount
+            conn.commit()
+            logging.info(f"Deactivated pricing rule {args.rule_id}." if removed else f"No rule {args.rule_id}.")
+            return 0 if removed else 1
+        rules = load_rules(cursor, backend)
+    finally:
+        conn.close()
+    if args.command == 'list':
+        print("\n".join(describe(rule) for rule in rules) or "No active pricing rules.")
+        return 0
+    engine = PricingEngine(backend.connect, lambda: backend)
+    at, occupancy = args.at or datetime.now(), args.occupancy[0]
+    started = time.perf_counter()
+    compiled = engine.compiled()
+    compile_ms = (time.perf_counter() - started) * 1000
+    rows = engine._load_items()
+    started = time.perf_counter()
+    menu = compiled.price_rows(rows, at, occupancy)
+    price_ms = (time.perf_counter() - started) * 1000
+    table = compiled.table(at, occupancy)
+    print(f"{DAY_NAMES[at.weekday()]} {at:%Y-%m-%d %H:%M}, occupancy "
+          f"{'unknown' if occupancy is None else f'{occupancy:g}%'}; rules in force: "
+          f"{', '.join(str(rule_id) for rule_id in table.rule_ids) or 'none'}")
+    for item_id, name, price in menu:
+        print(f"{item_id}. {name} ${price:.2f}")
+    print(f"Compiled {len(compiled.rules)} rule(s) into {compiled.tables} table(s) in {compile_ms:.2f} ms; "
+          f"priced {len(menu)} item(s) in {price_ms:.3f} ms.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
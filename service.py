@@ -0,0 +1,306 @@
+"""Headless JSON-over-HTTP service so many lobby kiosks can share one process.
+
+Every operation is a POST to /api/<operation> with a JSON object body, for example:
+
+    curl -X POST localhost:8080/api/check_in -d '{"last_name": "Doe", "room_number": "1101"}'
+
+Database work runs on a bounded thread pool, so the event loop keeps serving other
+terminals while a query is in flight. GET /health reports pool and executor state, and
+GET /metrics serves the operation metrics in the Prometheus text format.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import events
+import main as app
+from billing import money
+from inventory import OutOfStock
+from orders import OrderCart
+from storage import SqliteBackend
+from valet import ValetConflict
+
+MAX_BODY_BYTES = 64 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ServiceError(Exception):
+    """An error reported to the client with a specific HTTP status."""
+
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def _require(params, *names):
+    missing = [name for name in names if params.get(name) in (None, '')]
+    if missing:
+        raise ServiceError(400, f"Missing field(s): {', '.join(missing)}")
+    return [params[name] for name in names]
+
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ServiceError(400, f"{field} must be a YYYY-MM-DD date.") from None
+
+
+def _amount(value):
+    """Cents-exact Decimal amount as a JSON number."""
+    return float(money(value))
+
+
+def op_check_in(params):
+    last_name, room_number = _require(params, 'last_name', 'room_number')
+    first_name = app.find_guest(last_name.strip(), room_number.strip())
+    if first_name is None:
+        raise ServiceError(404, "Invalid room number or last name.")
+    return {'room_number': room_number, 'first_name': first_name, 'hotel': app.HOTEL_NAME}
+
+
+def op_check_out(params):
+    last_name, room_number = _require(params, 'last_name', 'room_number')
+    first_name = app.find_guest(last_name.strip(), room_number.strip())
+    if first_name is None:
+        raise ServiceError(404, "No matching reservation found for check-out.")
+    return {'room_number': room_number, 'first_name': first_name}
+
+
+def op_add_reservation(params):
+    room_number, last_name, first_name, check_in, check_out = _require(
+        params, 'room_number', 'last_name', 'first_name', 'check_in', 'check_out')
+    check_in = _parse_date(check_in, 'check_in')
+    check_out = _parse_date(check_out, 'check_out')
+    reservation_id = app.book_reservation(room_number.strip(), last_name.strip(), first_name.strip(),
+                                          check_in, check_out)
+    if reservation_id is None:
+        raise ServiceError(409, f"Room {room_number} is not available from {check_in} to {check_out}.",
+                           free_rooms=app.get_availability().free_rooms(check_in, check_out)[:20])
+    return {'reservation_id': reservation_id, 'room_number': room_number,
+            'check_in': check_in, 'check_out': check_out}
+
+
+def op_order_item(params):
+    last_name, room_number, items = _require(params, 'last_name', 'room_number', 'items')
+    if app.find_guest(last_name.strip(), room_number.strip()) is None:
+        raise ServiceError(404, "Invalid room number or last name.")
+    try:
+        lines = [(int(item['item_id']), int(item.get('quantity', 1))) for item in items]
+    except (TypeError, KeyError, ValueError):
+        raise ServiceError(400, "items must be a list of {\"item_id\": int, \"quantity\": int}.") from None
+    priced, _ = app.price_order(lines)
+    cart = OrderCart(room_number.strip(), last_name.strip())
+    for item_id, quantity, price, code in priced:
+        cart.add(item_id, None, price, quantity, code)
+    discount_percentage = None
+    if params.get('discount_code'):
+        code = params['discount_code'].strip()
+        discount_percentage = app.lookup_discount(code)
+        if discount_percentage is None:
+            raise ServiceError(404, "Invalid discount code.")
+        cart.apply_discount(code, discount_percentage)
+    try:
+        order_id = app.order_store.place(cart, app.TAX_RATE)
+    except OutOfStock as e:
+        raise ServiceError(409, str(e), out_of_stock=[
+            {'inventory_id': inventory_id, 'name': name, 'requested': requested, 'available': available or 0}
+            for inventory_id, name, requested, available in e.shortages]) from None
+    total, tax = cart.total, cart.tax(app.TAX_RATE)
+    return {
+        'order_id': order_id,
+        'room_number': room_number,
+        'lines': [{'item_id': item_id, 'quantity': quantity, 'unit_price': _amount(price), 'redemption_code': code}
+                  for item_id, quantity, price, code in priced],
+        'discount_percentage': discount_percentage,
+        'total': _amount(total),
+        'tax': _amount(tax),
+        'total_with_tax': _amount(total + tax),
+    }
+
+
+def op_apply_discount(params):
+    code, total = _require(params, 'code', 'total')
+    discount_percentage = app.lookup_discount(code.strip())
+    if discount_percentage is None:
+        raise ServiceError(404, "Invalid discount code.")
+    try:
+        total = money(total)
+    except ArithmeticError:
+        raise ServiceError(400, "total must be a number.") from None
+    return {'discount_percentage': discount_percentage, 'total': _amount(app.discounted_total(total, discount_percentage))}
+
+
+def op_valet_check_in(params):
+    license_plate, owner_name = _require(params, 'license_plate', 'owner_name')
+    try:
+        parking_spot = app.valet_check_in(license_plate.strip(), owner_name.strip(),
+                                          (params.get('parking_spot') or '').strip())
+    except ValetConflict as e:
+        raise ServiceError(409, str(e)) from None
+    return {'license_plate': license_plate, 'parking_spot': parking_spot, 'status': 'Checked-In'}
+
+
+def op_valet_check_out(params):
+    license_plate, owner_name = _require(params, 'license_plate', 'owner_name')
+    if not app.valet_check_out(license_plate.strip(), owner_name.strip()):
+        raise ServiceError(404, f"No parked vehicle {license_plate} found for {owner_name}.")
+    return {'license_plate': license_plate, 'status': 'Checked-Out'}
+
+
+OPERATIONS = {
+    'check_in': op_check_in,
+    'check_out': op_check_out,
+    'add_reservation': op_add_reservation,
+    'order_item': op_order_item,
+    'apply_discount': op_apply_discount,
+    'valet_check_in': op_valet_check_in,
+    'valet_check_out': op_valet_check_out,
+}
+
+
+def _run_operation(operation, params):
+    try:
+        with app.metrics_registry.operation(f"service.{operation.__name__[len('op_'):]}"):
+            return operation(params)
+    except SystemExit:
+        # create_connection() exits the interactive program when the database is down;
+        # a shared service must keep running and report it instead.
+        raise ServiceError(503, "Database unavailable.") from None
+
+
+class HotelService:
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hotel-db')
+        self.in_flight = 0
+        self.served = 0
+
+    async def dispatch(self, method, path, body):
+        if path == '/health':
+            if method != 'GET':
+                return 405, {'error': "Use GET."}
+            # get_pool() may open the first connection, so keep it off the event loop.
+            pool = await asyncio.get_running_loop().run_in_executor(self.executor, lambda: app.get_pool().stats())
+            return 200, {'status': 'ok', 'in_flight': self.in_flight, 'served': self.served,
+                         'workers': self.workers, 'pool': pool}
+        if path == '/metrics':
+            if method != 'GET':
+                return 405, {'error': "Use GET."}
+            return 200, app.metrics_registry.render_prometheus()  # Prometheus text format
+        if not path.startswith('/api/'):
+            return 404, {'error': f"Unknown path {path}."}
+        operation = OPERATIONS.get(path[len('/api/'):])
+        if operation is None:
+            return 404, {'error': f"Unknown operation. Available: {', '.join(sorted(OPERATIONS))}."}
+        if method != 'POST':
+            return 405, {'error': "Use POST."}
+        try:
+            params = json.loads(body or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError
+        except ValueError:
+            return 400, {'error': "Body must be a JSON object."}
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self.executor, _run_operation, operation, params)
+            return 200, result
+        except ServiceError as e:
+            return e.status, dict({'error': str(e)}, **e.details)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            logging.error(f"Error in {path}: {e}")
+            return 500, {'error': "Internal error."}
+        finally:
+            self.in_flight -= 1
+            self.served += 1
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, honouring keep-alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, payload = 400, {'error': "Invalid Content-Length."}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.dispatch(method.upper(), path.split('?', 1)[0], body)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if isinstance(payload, str):
+                    data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+                else:
+                    data, content_type = json.dumps(payload, default=str).encode('utf-8'), 'application/json'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        logging.info(f"Hotel service listening on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        app.close_pool()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the headless hotel service.")
+    parser.add_argument('--host', default=app.config.get('service', 'host', fallback='127.0.0.1'))
+    parser.add_argument('--port', type=int, default=app.config.getint('service', 'port', fallback=8080))
+    parser.add_argument('--workers', type=int, default=app.config.getint('service', 'workers', fallback=8),
+                        help="threads available for database calls; keep at or below [pool] max_size")
+    parser.add_argument('--sqlite', metavar='PATH', help="serve this SQLite file instead of the configured backend")
+    args = parser.parse_args(argv)
+    if args.sqlite:
+        app.set_backend(SqliteBackend(args.sqlite))
+    events.start_from_config(app.config)
+    service = HotelService(workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logging.info("Shutting down.")
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
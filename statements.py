@@ -0,0 +1,373 @@
+"""Every SQL statement the application runs, declared once with its parameters and result shape.
+
+Run one with runner.run(conn, 'users.password', username). On a pooled connection the
+runner keeps one cursor per statement and hands it back on the next call, so the driver
+re-executes an already prepared statement (pyodbc skips SQLPrepare when a cursor runs the
+same text again; sqlite3 finds it in the connection's statement cache).
+
+The subsystem modules listed in SECTIONS declare their own statements on import and run
+them on their own cursors with Statement.execute(), inside their own transactions.
+
+    python statements.py list
+    python statements.py check --sqlite :memory:
+"""
+import argparse
+import configparser
+import importlib
+import itertools
+import logging
+import os
+import threading
+import time
+
+from storage import SqliteBackend, backend_from_config
+
+# Result shapes
+ROWS = 'rows'        # list of rows
+ROW = 'row'          # first row or None
+SCALAR = 'scalar'    # first column of the first row, or None
+COUNT = 'count'      # rows affected by a write
+CURSOR = 'cursor'    # the cursor itself, for fetchmany() streaming; never cached
+
+# Modules that declare a section of the catalog when imported.
+SECTIONS = ('archive', 'discounts', 'inventory', 'lockout', 'night_audit', 'orders', 'pricing', 'valet')
+
+# Active reservations in the same room whose nights overlap [check_in, check_out).
+# Undated legacy reservations block their room entirely. Statements that write behind this
+# check declare guarded='Reservations' so it holds its locks until commit on SQL Server.
+OVERLAPPING_STAY = ("SELECT 1 FROM Reservations WHERE RoomNumber = ? AND ReservationID <> ? "
+                    "AND (Status <> 'CheckedOut' OR Status IS NULL) "
+                    "AND (CheckInDate IS NULL OR CheckOutDate IS NULL OR (CheckInDate < ? AND CheckOutDate > ?))")
+OVERLAP_PARAMS = ('room_number', 'ignore_reservation_id', 'check_out', 'check_in')
+
+RESERVATION_COLUMNS = "ReservationID, RoomNumber, Floor, LastName, FirstName, CheckInDate, CheckOutDate, Status"
+
+
+class Statement:
+    __slots__ = ('name', 'sql', 'params', 'shape', 'returning', 'limit', 'guarded', '_texts')
+
+    def __init__(self, name, sql, params=(), shape=ROWS, returning=None, limit=None, guarded=None):
+        self.name = name
+        self.sql = sql
+        self.params = tuple(params)
+        self.shape = shape
+        self.returning = returning  # column an INSERT hands back, e.g. the new identity
+        self.limit = limit          # row cap applied through backend.limit()
+        self.guarded = guarded      # table whose NOT EXISTS read must hold its locks, via backend.guard()
+        self._texts = {}
+
+    @property
+    def variadic(self):
+        """True when sql is a function of the number of items in a list parameter, e.g. an IN list."""
+        return callable(self.sql)
+
+    @property
+    def writes(self):
+        sql = self.sql(1) if self.variadic else self.sql
+        return sql.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+
+    def text(self, backend, limit=None, count=None):
+        """The SQL as sent to backend, rendered once per backend, row cap and list length."""
+        limit = self.limit if limit is None else limit
+        key = (backend.name, limit, count)
+        text = self._texts.get(key)
+        if text is None:
+            text = self.sql(count) if self.variadic else self.sql
+            if self.guarded:
+                text = text.replace(f"FROM {self.guarded} ", f"FROM {backend.guard(self.guarded)} ")
+            if self.returning:
+                text = backend.returning(text, self.returning)
+            if limit is not None:
+                text = backend.limit(text, limit)
+            self._texts[key] = text
+        return text
+
+    def execute(self, cursor, backend, *params, limit=None, count=None):
+        """Run on a cursor the caller owns, inside its transaction. Returns the cursor for fetching."""
+        if not self.variadic and len(params) != len(self.params):
+            raise TypeError(f"{self.name} takes {len(self.params)} parameter(s) "
+                            f"({', '.join(self.params)}), got {len(params)}.")
+        cursor.execute(self.text(backend, limit, count), params)
+        return cursor
+
+    def executemany(self, cursor, backend, rows):
+        cursor.executemany(self.text(backend), rows)
+        return cursor
+
+
+CATALOG = {}
+
+
+def declare(name, sql, params=(), shape=ROWS, returning=None, limit=None, guarded=None):
+    if name in CATALOG:
+        raise ValueError(f"Statement {name} is declared twice.")
+    CATALOG[name] = Statement(name, sql, params, shape, returning, limit, guarded)
+    return CATALOG[name]
+
+
+# Items and transactions
+declare('items.menu', "SELECT ItemID, Name, Price, PricingRule, Category FROM Items")
+declare('items.insert', "INSERT INTO Items (ItemID, Name, Price) VALUES (?, ?, ?)",
+        ('item_id', 'name', 'price'), COUNT)
+declare('items.update', "UPDATE Items SET Name = ?, Price = ? WHERE ItemID = ?",
+        ('name', 'price', 'item_id'), COUNT)
+declare('items.delete', "DELETE FROM Items WHERE ItemID = ?", ('item_id',), COUNT)
+declare('transactions.insert', "INSERT INTO Transactions (ItemID, Quantity) VALUES (?, ?)",
+        ('item_id', 'quantity'), COUNT)
+
+# Reservations
+declare('reservations.active_stays',
+        "SELECT ReservationID, RoomNumber, CheckInDate, CheckOutDate FROM Reservations "
+        "WHERE Status <> 'CheckedOut' OR Status IS NULL", shape=CURSOR)
+declare('reservations.active_guests',
+        "SELECT ReservationID, RoomNumber, LastName, FirstName FROM Reservations "
+        "WHERE Status <> 'CheckedOut' OR Status IS NULL", shape=CURSOR)
+declare('reservations.active_in_room',
+        "SELECT ReservationID, RoomNumber, Floor, LastName, FirstName, CheckInDate, CheckOutDate "
+        "FROM Reservations WHERE RoomNumber = ? AND (Status <> 'CheckedOut' OR Status IS NULL) "
+        "ORDER BY CheckInDate", ('room_number',))
+declare('reservations.book',
+        "INSERT INTO Reservations (RoomNumber, Floor, LastName, FirstName, CheckInDate, CheckOutDate) "
+        "SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (" + OVERLAPPING_STAY + ")",
+        ('room_number', 'floor', 'last_name', 'first_name', 'check_in', 'check_out') + OVERLAP_PARAMS,
+        ROW, returning='ReservationID', guarded='Reservations')
+declare('reservations.move',
+        "UPDATE Reservations SET RoomNumber = ?, LastName = ?, FirstName = ?, Floor = ?, CheckInDate = ?, CheckOutDate = ? "
+        "WHERE ReservationID = ? AND NOT EXISTS (" + OVERLAPPING_STAY + ")",
+        ('room_number', 'last_name', 'first_name', 'floor', 'check_in', 'check_out', 'reservation_id') + OVERLAP_PARAMS,
+        COUNT, guarded='Reservations')
+declare('reservations.delete', "DELETE FROM Reservations WHERE ReservationID = ?", ('reservation_id',), COUNT)
+declare('reservations.by_room', f"SELECT {RESERVATION_COLUMNS} FROM Reservations WHERE RoomNumber = ?",
+        ('room_number',))
+declare('reservations.by_last_name', f"SELECT {RESERVATION_COLUMNS} FROM Reservations WHERE LastName = ?",
+        ('last_name',))
+declare('archive.reservations.by_room',
+        f"SELECT {RESERVATION_COLUMNS} FROM ReservationsArchive WHERE RoomNumber = ?", ('room_number',))
+declare('archive.reservations.by_last_name',
+        f"SELECT {RESERVATION_COLUMNS} FROM ReservationsArchive WHERE LastName = ?", ('last_name',))
+declare('reservations.room_occupied', "SELECT RoomNumber FROM Reservations WHERE RoomNumber = ?",
+        ('room_number',), ROW, limit=1)
+
+# Keyset pages for view_reservations(): one statement per combination of filters.
+PAGE_FILTERS = (('status', "Status = ?", ('status',)),
+                ('floor', "Floor = ?", ('floor',)),
+                ('after', "(RoomNumber > ? OR (RoomNumber = ? AND ReservationID > ?))",
+                 ('after_room', 'after_room', 'after_id')))
+
+
+def page_statement_name(status=False, floor=False, after=False):
+    used = [name for name, flag in zip(('status', 'floor', 'after'), (status, floor, after)) if flag]
+    return 'reservations.page' + ''.join(f".{name}" for name in used)
+
+
+for _flags in itertools.product((False, True), repeat=len(PAGE_FILTERS)):
+    _used = [entry for entry, flag in zip(PAGE_FILTERS, _flags) if flag]
+    declare(page_statement_name(*_flags),
+            "SELECT ReservationID, RoomNumber, Floor, LastName, FirstName, Status FROM Reservations"
+            + (" WHERE " + " AND ".join(condition for _, condition, _ in _used) if _used else "")
+            + " ORDER BY RoomNumber, ReservationID",
+            [param for _, _, params in _used for param in params])
+
+# Users
+declare('users.login', "SELECT Password, FailedAttempts, LockoutTime, Role FROM Users WHERE Username = ?",
+        ('username',), ROW)
+declare('users.password', "SELECT Password FROM Users WHERE Username = ?", ('username',), SCALAR)
+declare('users.get', "SELECT Username, Password, Role FROM Users WHERE Username = ?", ('username',), ROW)
+declare('users.list', "SELECT Username, Password, Role FROM Users")
+declare('users.insert',
+        "INSERT INTO Users (Username, Password, Role) SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM Users WHERE Username = ?)",
+        ('username', 'password', 'role', 'username'), COUNT)
+declare('users.update', "UPDATE Users SET Username = ?, Password = ? WHERE Username = ?",
+        ('new_username', 'password', 'username'), COUNT)
+declare('users.set_password', "UPDATE Users SET Password = ? WHERE Username = ?", ('password', 'username'), COUNT)
+declare('users.delete', "DELETE FROM Users WHERE Username = ?", ('username',), COUNT)
+
+# Inventory
+declare('inventory.list', "SELECT ItemID, Name, Quantity, Location, LowStockThreshold FROM Inventory")
+declare('inventory.get', "SELECT ItemID, Name, Quantity, Location, LowStockThreshold FROM Inventory WHERE ItemID = ?",
+        ('item_id',), ROW)
+declare('inventory.insert', "INSERT INTO Inventory (Name, Quantity, Location, LowStockThreshold) VALUES (?, ?, ?, ?)",
+        ('name', 'quantity', 'location', 'low_stock_threshold'), COUNT)
+# Conditional on the quantity that was read, so a concurrent order's decrement is never overwritten.
+declare('inventory.update', "UPDATE Inventory SET Name = ?, Quantity = ?, Location = ?, LowStockThreshold = ? "
+        "WHERE ItemID = ? AND Quantity = ?",
+        ('name', 'quantity', 'location', 'low_stock_threshold', 'item_id', 'expected_quantity'), COUNT)
+declare('inventory.delete', "DELETE FROM Inventory WHERE ItemID = ?", ('item_id',), COUNT)
+
+
+class StatementStats:
+    __slots__ = ('calls', 'errors', 'prepares', 'rows', 'seconds', 'max_seconds')
+
+    def __init__(self):
+        self.calls = self.errors = self.prepares = self.rows = 0
+        self.seconds = self.max_seconds = 0.0
+
+
+class StatementRunner:
+    """Runs catalog statements, reusing one cursor per statement on each pooled connection."""
+
+    def __init__(self, backend_factory, catalog=None):
+        self._backend = backend_factory
+        self.catalog = CATALOG if catalog is None else catalog
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _handle(self, conn, statement):
+        """(cursor, newly_created). Connections outside the pool get a fresh cursor each time."""
+        handles = getattr(conn, 'statement_handles', None)
+        if handles is None or statement.shape == CURSOR:
+            return conn.cursor(), True
+        cursor = handles.get(statement.name)
+        if cursor is None:
+            cursor = handles[statement.name] = conn.cursor()
+            return cursor, True
+        return cursor, False
+
+    def run(self, conn, name, *params, limit=None):
+        statement = self.catalog[name]
+        if len(params) != len(statement.params):
+            raise TypeError(f"{name} takes {len(statement.params)} parameter(s) "
+                            f"({', '.join(statement.params)}), got {len(params)}.")
+        text = statement.text(self._backend(), limit)
+        cursor, created = self._handle(conn, statement)
+        started = time.perf_counter()
+        rows = 0
+        try:
+            cursor.execute(text, params)
+            if statement.shape == CURSOR:
+                result = cursor
+            elif statement.shape == COUNT:
+                result = cursor.rowcount
+            else:
+                # Drain the result set so the cached cursor leaves no pending results behind.
+                fetched = cursor.fetchall()
+                rows = len(fetched)
+                if statement.shape == ROWS:
+                    result = fetched
+                elif statement.shape == ROW:
+                    result = fetched[0] if fetched else None
+                else:
+                    result = fetched[0][0] if fetched else None
+        except Exception:
+            handles = getattr(conn, 'statement_handles', None)
+            if handles is not None:
+                handles.pop(name, None)  # a failed handle is not worth keeping
+            self._record(name, time.perf_counter() - started, created, rows, failed=True)
+            raise
+        self._record(name, time.perf_counter() - started, created, rows)
+        return result
+
+    def _record(self, name, elapsed, created, rows, failed=False):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = StatementStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.prepares += created
+            stats.rows += rows
+            stats.seconds += elapsed
+            if elapsed > stats.max_seconds:
+                stats.max_seconds = elapsed
+
+    def stats(self):
+        """{statement: {...}} sorted by total time spent."""
+        with self._lock:
+            return {
+                name: {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'reuse_ratio': 1 - stats.prepares / stats.calls,
+                    'mean_ms': stats.seconds / stats.calls * 1000,
+                    'max_ms': stats.max_seconds * 1000,
+                    'rows_per_call': stats.rows / stats.calls,
+                }
+                for name, stats in sorted(self._stats.items(), key=lambda item: -item[1].seconds)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def format_stats(stats):
+    """Plain-text table for the admin Performance screen."""
+    if not stats:
+        return "No statements run yet."
+    lines = [f"{'statement':40} {'calls':>7} {'errors':>6} {'mean ms':>9} {'max ms':>9} {'reused':>7} {'rows':>8}"]
+    for name, s in stats.items():
+        lines.append(f"{name[:40]:40} {s['calls']:>7} {s['errors']:>6} {s['mean_ms']:>9.3f} {s['max_ms']:>9.3f} "
+                     f"{s['reuse_ratio']:>7.0%} {s['rows_per_call']:>8.1f}")
+    return "\n".join(lines)
+
+
+def load_sections():
+    """Import every module in SECTIONS so its statements are in CATALOG."""
+    for module in SECTIONS:
+        importlib.import_module(module)
+
+
+def check(backend, catalog=None):
+    """Compile every statement against backend's schema without running it. Returns [(name, error)].
+
+    Variadic statements are compiled for a two-item list.
+    """
+    if catalog is None:
+        load_sections()
+    failures = []
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        for name, statement in sorted((CATALOG if catalog is None else catalog).items()):
+            try:
+                if statement.variadic:
+                    text = statement.text(backend, count=2)
+                    backend.compile_statement(cursor, text, text.count('?'))
+                else:
+                    backend.compile_statement(cursor, statement.text(backend), len(statement.params))
+            except Exception as e:
+                failures.append((name, str(e)))
+    finally:
+        conn.rollback()
+        conn.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the SQL statement catalog.")
+    parser.add_argument('command', choices=['list', 'check'],
+                        help="list: print every statement; check: compile every statement against the schema")
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help="use this SQLite file instead of the configured backend "
+                             "(':memory:' builds a scratch database from database.sql and the migrations)")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.command == 'list':
+        load_sections()
+        for name, statement in sorted(CATALOG.items()):
+            sql = statement.sql(1) if statement.variadic else statement.sql
+            print(f"{name:40} {statement.shape:7} ({', '.join(statement.params)})\n    {sql}")
+        return 0
+
+    if args.sqlite:
+        backend = SqliteBackend(args.sqlite)
+        if args.sqlite == ':memory:':
+            import migrations
+            migrations.prepare_database(backend)
+    else:
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        backend = backend_from_config(config)
+    failures = check(backend)
+    for name, error in failures:
+        logging.error(f"{name}: {error}")
+    print(f"{backend.name}: {len(CATALOG) - len(failures)} of {len(CATALOG)} statements compiled.")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    # Run as the importable module so the sections declare into the same CATALOG.
+    import statements
+    raise SystemExit(statements.main())
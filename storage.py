@@ -0,0 +1,311 @@
+"""Storage backends: SQL Server for production, SQLite for local runs and benchmarking."""
+import argparse
+import configparser
+import logging
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'database.sql')
+
+
+def read_schema(path=SCHEMA_PATH):
+    """Split a schema script into individual statements, dropping comments."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    text = re.sub(r'--[^\n]*', '', text)
+    return [statement.strip() for statement in text.split(';') if statement.strip()]
+
+
+class StorageBackend:
+    """Base class for a database engine the application can run against."""
+
+    name = None
+
+    def connect(self):
+        """Open a new DB-API connection using '?' parameter markers."""
+        raise NotImplementedError
+
+    def translate_ddl(self, statement):
+        """Rewrite a T-SQL DDL statement into this engine's dialect."""
+        return statement
+
+    def limit(self, query, count):
+        """Restrict a SELECT statement to its first count rows."""
+        raise NotImplementedError
+
+    def returning(self, statement, column):
+        """Make an INSERT or UPDATE return the named column(s) of each row it touched (e.g. its identity)."""
+        raise NotImplementedError
+
+    def as_date(self, expression):
+        """SQL expression for the calendar date of a DATETIME expression."""
+        raise NotImplementedError
+
+    def guard(self, table):
+        """Table reference for the NOT EXISTS read that guards a conditional write.
+
+        Locks taken by the read must last until commit, or two sessions can both pass the
+        check and both write. SQLite needs nothing: a write statement takes the database
+        write lock before it reads.
+        """
+        return table
+
+    def table_exists(self, cursor, table):
+        raise NotImplementedError
+
+    def index_exists(self, cursor, table, index):
+        raise NotImplementedError
+
+    def table_columns(self, cursor, table):
+        """Column names of a table, read from an empty result set so it works on any engine."""
+        cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+        columns = [column[0] for column in cursor.description]
+        cursor.fetchall()
+        return columns
+
+    def create_index(self, name, table, columns, include=()):
+        """CREATE INDEX statement; include lists non-key columns that make the index covering."""
+        raise NotImplementedError
+
+    def begin(self, cursor):
+        """Start an explicit transaction so DDL and DML commit or roll back together."""
+
+    def compile_statement(self, cursor, statement, param_count):
+        """Have the engine parse and bind statement against the schema without running it."""
+        raise NotImplementedError
+
+    def bootstrap_schema(self, path=SCHEMA_PATH):
+        """Create every table from database.sql that does not exist yet."""
+        conn = self.connect()
+        created = []
+        try:
+            cursor = conn.cursor()
+            for statement in read_schema(path):
+                match = re.match(r'CREATE\s+TABLE\s+(\w+)', statement, re.IGNORECASE)
+                if match and self.table_exists(cursor, match.group(1)):
+                    continue
+                cursor.execute(self.translate_ddl(statement))
+                if match:
+                    created.append(match.group(1))
+            conn.commit()
+        finally:
+            conn.close()
+        logging.debug(f"{self.name} schema bootstrap created: {created or 'nothing'}")
+        return created
+
+
+class SqlServerBackend(StorageBackend):
+    """SQL Server through pyodbc. The driver is imported only when a connection is opened."""
+
+    name = 'sqlserver'
+
+    def __init__(self, server, database, username, password, driver='ODBC Driver 17 for SQL Server'):
+        self.server = server
+        self.database = database
+        self.username = username
+        self.password = password
+        self.driver = driver
+
+    def connect(self):
+        import pyodbc
+        connection_string = (
+            'DRIVER={' + self.driver + '};'
+            'SERVER=' + self.server + ';'
+            'DATABASE=' + self.database + ';'
+            'UID=' + self.username + ';'
+            'PWD=' + self.password
+        )
+        return pyodbc.connect(connection_string)
+
+    def limit(self, query, count):
+        return re.sub(r'^\s*SELECT\s', f"SELECT TOP {int(count)} ", query, count=1, flags=re.IGNORECASE)
+
+    def returning(self, statement, column):
+        output = "OUTPUT " + ", ".join(f"INSERTED.{name.strip()}" for name in column.split(','))
+        if statement.lstrip().upper().startswith('UPDATE'):
+            return re.sub(r'\s+WHERE\b', f" {output} WHERE", statement, count=1, flags=re.IGNORECASE)
+        return re.sub(r'\)\s*(SELECT|VALUES)\b', f") {output} \\1", statement, count=1, flags=re.IGNORECASE)
+
+    def as_date(self, expression):
+        return f"CAST({expression} AS DATE)"
+
+    def guard(self, table):
+        # READ COMMITTED drops shared locks as soon as a row is read; UPDLOCK, HOLDLOCK keeps
+        # the key range locked, so a second session blocks until the first one commits.
+        return f"{table} WITH (UPDLOCK, HOLDLOCK)"
+
+    def table_exists(self, cursor, table):
+        cursor.execute("SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = ?", (table,))
+        return cursor.fetchone() is not None
+
+    def index_exists(self, cursor, table, index):
+        cursor.execute("SELECT 1 FROM sys.indexes WHERE name = ? AND object_id = OBJECT_ID(?)", (index, table))
+        return cursor.fetchone() is not None
+
+    def create_index(self, name, table, columns, include=()):
+        statement = f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+        if include:
+            statement += f" INCLUDE ({', '.join(include)})"
+        return statement
+
+    def compile_statement(self, cursor, statement, param_count):
+        # NOEXEC compiles and resolves names without running; callers still roll back afterwards.
+        cursor.execute("SET NOEXEC ON")
+        try:
+            cursor.execute(statement, (None,) * param_count)
+        finally:
+            cursor.execute("SET NOEXEC OFF")
+
+
+class Row(tuple):
+    """SQLite row that, like pyodbc.Row, supports both index and attribute access."""
+
+    __slots__ = ()
+    _columns = {}
+
+    def __getattr__(self, name):
+        try:
+            return self[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+_row_classes = {}
+
+
+def _row_factory(cursor, values):
+    names = tuple(column[0] for column in cursor.description)
+    cls = _row_classes.get(names)
+    if cls is None:
+        cls = type('Row', (Row,), {'__slots__': (), '_columns': {n: i for i, n in enumerate(names)}})
+        _row_classes[names] = cls
+    return cls(values)
+
+
+def _convert_datetime(value):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_date(value):
+    text = value.decode()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+# Hand values back with the same Python types pyodbc uses for the schema's column types.
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()))
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('DATE', _convert_date)
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite file (or shared in-memory) database with a T-SQL DDL translation layer."""
+
+    name = 'sqlite'
+
+    _DDL_REWRITES = [
+        (re.compile(r'\bINT\s+IDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)\s+PRIMARY\s+KEY', re.IGNORECASE),
+         'INTEGER PRIMARY KEY AUTOINCREMENT'),
+        (re.compile(r'\bGETDATE\s*\(\s*\)', re.IGNORECASE), 'CURRENT_TIMESTAMP'),
+    ]
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._anchor = None
+        if path == ':memory:':
+            # Every pooled connection must see the same database, so use a named shared-cache
+            # in-memory database and hold one connection open to keep it alive.
+            import uuid  # pulls in platform and socket; only scratch databases need it
+            self._uri = f"file:hotel-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self._anchor = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        else:
+            self._uri = None
+
+    def connect(self):
+        if self._uri:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = _row_factory
+        return conn
+
+    def translate_ddl(self, statement):
+        for pattern, replacement in self._DDL_REWRITES:
+            statement = pattern.sub(replacement, statement)
+        return statement
+
+    def limit(self, query, count):
+        return f"{query} LIMIT {int(count)}"
+
+    def returning(self, statement, column):
+        return f"{statement} RETURNING {column}"
+
+    def as_date(self, expression):
+        return f"date({expression})"
+
+    def table_exists(self, cursor, table):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+
+    def index_exists(self, cursor, table, index):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?", (table, index))
+        return cursor.fetchone() is not None
+
+    def create_index(self, name, table, columns, include=()):
+        # SQLite has no INCLUDE; trailing key columns make the index covering instead.
+        return f"CREATE INDEX {name} ON {table} ({', '.join(list(columns) + list(include))})"
+
+    def begin(self, cursor):
+        # The sqlite3 module does not open a transaction before DDL on its own.
+        cursor.execute("BEGIN")
+
+    def compile_statement(self, cursor, statement, param_count):
+        cursor.execute(f"EXPLAIN {statement}", (None,) * param_count)
+        cursor.fetchall()
+
+
+def backend_from_config(config):
+    """Build the backend selected by [database] backend in config.ini (default: sqlserver)."""
+    kind = config.get('database', 'backend', fallback='sqlserver').strip().lower() or 'sqlserver'
+    if kind == 'sqlite':
+        return SqliteBackend(config.get('database', 'sqlite_path', fallback='hotel.db').strip() or 'hotel.db')
+    if kind == 'sqlserver':
+        return SqlServerBackend(
+            config.get('database', 'server', fallback=''),
+            config.get('database', 'database', fallback=''),
+            config.get('database', 'username', fallback=''),
+            config.get('database', 'password', fallback=''),
+            driver=config.get('database', 'driver', fallback='ODBC Driver 17 for SQL Server').strip()
+            or 'ODBC Driver 17 for SQL Server',
+        )
+    raise ValueError(f"Unknown storage backend '{kind}'. Use 'sqlserver' or 'sqlite'.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Storage backend utilities.")
+    parser.add_argument('command', choices=['bootstrap'], help="bootstrap: create missing tables from database.sql")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(__file__), 'config.ini'))
+    args = parser.parse_args(argv)
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    backend = backend_from_config(config)
+    created = backend.bootstrap_schema()
+    print(f"{backend.name}: created {', '.join(created) if created else 'no tables (schema already present)'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guest_search import GuestIndex
+
+
+def _index():
+    index = GuestIndex()
+    index.load([(1, '101', 'Smith', 'Anna'), (2, '102', 'Johnson', 'Ben'), (3, '103', 'Garcia', 'Carl')])
+    return index
+
+
+def test_exact_match():
+    assert [m.reservation_id for m in _index().search('smith')] == [1]
+
+
+def test_typo_substitution():
+    assert [m.reservation_id for m in _index().search('smyth')] == [1]
+
+
+def test_typo_adjacent_swap():
+    assert [m.reservation_id for m in _index().search('msith')] == [1]
+    assert [m.reservation_id for m in _index().search('ojhnson')] == [2]
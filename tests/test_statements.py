@@ -0,0 +1,37 @@
+import configparser
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+import statements
+from storage import SqliteBackend, SqlServerBackend, backend_from_config
+
+
+def test_catalog_compiles_against_migrated_schema():
+    backend = SqliteBackend(':memory:')
+    migrations.prepare_database(backend)
+    assert statements.check(backend) == []
+
+
+def _sqlserver_backend():
+    """The SQL Server configured in config.ini, or a skip when there is no driver or server to reach."""
+    pyodbc = pytest.importorskip('pyodbc')
+    config = configparser.ConfigParser()
+    config.read(os.path.join(ROOT, 'config.ini'))
+    backend = backend_from_config(config)
+    if not isinstance(backend, SqlServerBackend) or not (backend.server.strip() and backend.database.strip()):
+        pytest.skip("no SQL Server configured in config.ini [database]")
+    if backend.driver not in pyodbc.drivers():
+        pytest.skip(f"ODBC driver '{backend.driver}' is not installed")
+    return backend
+
+
+def test_catalog_compiles_against_sqlserver():
+    # Compiles against the configured database as it is; run migrations.py upgrade on it first.
+    backend = _sqlserver_backend()
+    assert statements.check(backend) == []
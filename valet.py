@@ -0,0 +1,252 @@
+"""Valet lot layout, free-spot allocation and an index of parked vehicles by plate."""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+
+import events
+from statements import COUNT, ROW, declare
+
+_SPOT = re.compile(r'^([A-Za-z]+)(\d+)$')
+
+PARKED = declare('valet.parked', "SELECT ValetID, LicensePlate, OwnerName, ParkingSpot FROM ValetVehicles "
+                 "WHERE Status = 'Checked-In'")
+CHECK_IN = declare('valet.check_in',
+                   "INSERT INTO ValetVehicles (LicensePlate, OwnerName, ParkingSpot, Status, CheckInTime) "
+                   "SELECT ?, ?, ?, 'Checked-In', ? WHERE NOT EXISTS (SELECT 1 FROM ValetVehicles "
+                   "WHERE Status = 'Checked-In' AND (ParkingSpot = ? OR LicensePlate = ?))",
+                   ('license_plate', 'owner_name', 'spot', 'check_in_time', 'spot', 'license_plate'), ROW,
+                   returning='ValetID', guarded='ValetVehicles')
+STILL_PARKED = declare('valet.still_parked',
+                       "SELECT 1 FROM ValetVehicles WHERE ValetID = ? AND Status = 'Checked-In'", ('valet_id',), ROW)
+PARKED_PLATE = declare('valet.parked_plate', "SELECT ValetID, OwnerName, ParkingSpot FROM ValetVehicles "
+                       "WHERE LicensePlate = ? AND Status = 'Checked-In'", ('license_plate',), ROW)
+CHECK_OUT = declare('valet.check_out', "UPDATE ValetVehicles SET Status = 'Checked-Out', CheckOutTime = ? "
+                    "WHERE ValetID = ? AND Status = 'Checked-In'", ('check_out_time', 'valet_id'), COUNT)
+
+
+class ValetConflict(ValueError):
+    """The spot is taken or unknown, the lot is full, or the plate is already parked."""
+
+
+def parse_layout(value):
+    """'A:120, B:80' -> [('A', 120), ('B', 80)]; zones are listed nearest to the entrance first."""
+    layout = []
+    for part in value.split(','):
+        if part.strip():
+            zone, _, size = part.partition(':')
+            layout.append((zone.strip().upper(), int(size)))
+    return layout
+
+
+class ParkingLot:
+    """Free spots per zone kept as an int bitset: bit n set means spot n+1 is free.
+
+    The nearest free spot in a zone is the lowest set bit, found with one x & -x, so
+    assignment does not scan occupied spots however full the lot is.
+    """
+
+    def __init__(self, layout):
+        self.layout = list(layout)
+        self._sizes = dict(self.layout)
+        self._free = {zone: (1 << size) - 1 for zone, size in self.layout}
+
+    def _locate(self, spot):
+        match = _SPOT.match(spot or '')
+        if not match:
+            return None
+        zone, number = match.group(1).upper(), int(match.group(2))
+        if not 1 <= number <= self._sizes.get(zone, 0):
+            return None
+        return zone, number - 1
+
+    def normalize(self, spot):
+        """Canonical spot name ('a7' -> 'A7'), or None when it is not part of the lot."""
+        location = self._locate(spot)
+        return None if location is None else f"{location[0]}{location[1] + 1}"
+
+    def is_free(self, spot):
+        location = self._locate(spot)
+        return location is not None and bool(self._free[location[0]] >> location[1] & 1)
+
+    def allocate(self, zone=None):
+        """Take the nearest free spot, in the given zone or in the first zone with room."""
+        zones = [zone.upper()] if zone else [name for name, _ in self.layout]
+        for name in zones:
+            free = self._free.get(name, 0)
+            if free:
+                bit = (free & -free).bit_length() - 1
+                self._free[name] = free & ~(1 << bit)
+                return f"{name}{bit + 1}"
+        return None
+
+    def occupy(self, spot):
+        """Mark a specific spot taken. Returns False when it is unknown or already taken."""
+        location = self._locate(spot)
+        if location is None or not self._free[location[0]] >> location[1] & 1:
+            return False
+        self._free[location[0]] &= ~(1 << location[1])
+        return True
+
+    def release(self, spot):
+        location = self._locate(spot)
+        if location is not None:
+            self._free[location[0]] |= 1 << location[1]
+
+    def free_counts(self):
+        return {zone: bin(self._free[zone]).count('1') for zone, _ in self.layout}
+
+
+class ValetService:
+    """Check-in and check-out answered from memory, rebuilt from ValetVehicles on first use
+    and every refresh_interval seconds.
+
+    Parked vehicles are indexed by plate, so check-out needs no search and its UPDATE goes
+    straight to the row's ValetID; a plate missing from the index (parked from another
+    terminal since the last rebuild) is looked up in the table. Check-in inserts only if the
+    spot and plate are still free in the table, and rebuilds and retries once if not. Rows
+    whose ParkingSpot is outside the configured layout (e.g. typed in before the layout
+    existed) stay in the plate index but occupy no spot.
+    """
+
+    def __init__(self, connection_factory, backend_factory, layout, refresh_interval=60):
+        self._connect = connection_factory
+        self._backend = backend_factory
+        self.layout = list(layout)
+        self.refresh_interval = refresh_interval
+        self._lot = None
+        self._loaded_at = 0.0
+        self._parked = {}  # normalized plate -> (valet_id, owner_name, spot)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(plate):
+        return plate.strip().upper()
+
+    def _state(self):
+        with self._lock:
+            if self._lot is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+                self.rebuild()
+            return self._lot
+
+    def rebuild(self):
+        """Reload the lot and the plate index from the vehicles currently checked in."""
+        lot, parked = ParkingLot(self.layout), {}
+        conn = self._connect()
+        try:
+            cursor = PARKED.execute(conn.cursor(), self._backend())
+            for valet_id, plate, owner_name, spot in cursor.fetchall():
+                parked[self._key(plate)] = (valet_id, owner_name, spot)
+                if not lot.occupy(spot):
+                    logging.debug(f"Valet spot {spot!r} for {plate} is outside the lot layout or shared.")
+        finally:
+            conn.close()
+        with self._lock:
+            self._lot, self._parked = lot, parked
+            self._loaded_at = time.monotonic()
+        return len(parked)
+
+    def invalidate(self):
+        with self._lock:
+            self._lot = None
+            self._parked = {}
+
+    def check_in(self, license_plate, owner_name, parking_spot=None, zone=None):
+        """Park a vehicle and return its spot: the one requested, or the nearest free one."""
+        with self._lock:
+            for _ in range(2):
+                lot = self._state()
+                key = self._key(license_plate)
+                if key in self._parked and not self._still_parked(self._parked[key][0]):
+                    # Checked out from another terminal since the last rebuild.
+                    lot.release(self._parked.pop(key)[2])
+                if key in self._parked:
+                    raise ValetConflict(f"Vehicle {license_plate} is already parked at {self._parked[key][2]}.")
+                if parking_spot:
+                    spot = lot.normalize(parking_spot)
+                    if spot is None:
+                        raise ValetConflict(f"Parking spot {parking_spot} is not part of the lot.")
+                    if not lot.occupy(spot):
+                        raise ValetConflict(f"Parking spot {spot} is already taken.")
+                else:
+                    spot = lot.allocate(zone)
+                    if spot is None:
+                        raise ValetConflict(f"No free parking spots{f' in zone {zone}' if zone else ''}.")
+                try:
+                    valet_id = self._insert(license_plate, owner_name, spot)
+                except BaseException:
+                    lot.release(spot)
+                    raise
+                if valet_id is not None:
+                    self._parked[key] = (valet_id, owner_name, spot)
+                    break
+                # Another terminal took the spot or parked this car since the last rebuild.
+                self.rebuild()
+            else:
+                raise ValetConflict("The lot changed on another terminal; please try again.")
+        events.emit('valet.checked_in', plate=license_plate, owner=owner_name, spot=spot)
+        return spot
+
+    def _insert(self, license_plate, owner_name, spot):
+        """Insert the ticket unless the spot or the plate is checked in already. Returns its ValetID or None."""
+        conn = self._connect()
+        try:
+            row = CHECK_IN.execute(conn.cursor(), self._backend(), license_plate, owner_name, spot, datetime.now(),
+                                   spot, license_plate).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        return None if row is None else row[0]
+
+    def _still_parked(self, valet_id):
+        conn = self._connect()
+        try:
+            return STILL_PARKED.execute(conn.cursor(), self._backend(), valet_id).fetchone() is not None
+        finally:
+            conn.close()
+
+    def _lookup(self, license_plate):
+        """(valet_id, owner_name, spot) for a plate checked in according to the table, or None."""
+        conn = self._connect()
+        try:
+            row = PARKED_PLATE.execute(conn.cursor(), self._backend(), license_plate).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else tuple(row)
+
+    def check_out(self, license_plate, owner_name):
+        """Mark a parked vehicle as checked out and free its spot. Returns the spot, or None when not parked."""
+        with self._lock:
+            self._state()
+            key = self._key(license_plate)
+            entry = self._parked.get(key) or self._lookup(license_plate.strip())
+            if entry is None or entry[1].strip().casefold() != owner_name.strip().casefold():
+                return None
+            valet_id, _, spot = entry
+            conn = self._connect()
+            try:
+                updated = CHECK_OUT.execute(conn.cursor(), self._backend(), datetime.now(), valet_id).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            self._parked.pop(key, None)
+            self._lot.release(spot)
+        if not updated:
+            return None  # already checked out from another terminal
+        events.emit('valet.checked_out', plate=license_plate, owner=owner_name, spot=spot)
+        return spot
+
+    def find(self, license_plate):
+        """(owner_name, spot) for a parked vehicle, or None."""
+        with self._lock:
+            self._state()
+            entry = self._parked.get(self._key(license_plate))
+            return None if entry is None else (entry[1], entry[2])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'parked': len(self._parked),
+                'free': self._lot.free_counts() if self._lot is not None else {},
+            }